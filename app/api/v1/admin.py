@@ -2,14 +2,17 @@
 管理员API路由
 """
 import json
+from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete, func, desc, and_, or_
 
 from app.core.database import get_db
 from app.core.admin_auth import get_admin_user, log_admin_action
 from app.models import User, Resource, SystemConfig, AdminLog, PointTransaction
+from app.services import gc_service, reconcile_service
+from app.services.config_service import config_service
 from app.schemas.admin import (
     SystemConfigResponse, SystemConfigUpdate, SystemConfigCreate,
     AdminLogResponse, UserManageResponse, ResourceManageResponse,
@@ -80,7 +83,10 @@ async def init_system_configs(
             db.add(config)
             created_count += 1
 
+    if created_count:
+        await config_service.bump_version(db)
     await db.commit()
+    await config_service.load()
 
     return {
         "message": f"系统初始化完成，创建了 {created_count} 个配置项",
@@ -152,8 +158,10 @@ async def create_system_config(
     )
 
     db.add(config)
+    await config_service.bump_version(db)
     await db.commit()
     await db.refresh(config)
+    await config_service.load()
 
     # 记录操作日志
     await log_admin_action(
@@ -217,8 +225,11 @@ async def update_system_config(
     if "description" in update_data:
         config.description = update_data["description"]
 
+    # 递增配置版本号，其他进程在下次刷新时加载新配置
+    await config_service.bump_version(db)
     await db.commit()
     await db.refresh(config)
+    await config_service.load()
 
     # 记录操作日志
     await log_admin_action(
@@ -416,6 +427,16 @@ async def update_resource(
     
     # 更新资源信息
     update_data = resource_data.dict(exclude_unset=True)
+    if update_data.get("is_active") and not resource.is_active:
+        # 文件已被垃圾回收清理的资源不能恢复
+        if resource.storage_tier == "purged":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="资源文件已被清理，无法恢复"
+            )
+        resource.deleted_at = None
+    elif update_data.get("is_active") is False and resource.is_active:
+        resource.deleted_at = datetime.utcnow()
     for field, value in update_data.items():
         setattr(resource, field, value)
     
@@ -457,8 +478,9 @@ async def delete_resource(
             detail="资源不存在"
         )
     
-    # 软删除
+    # 软删除（文件在保留期满后由垃圾回收任务清理）
     resource.is_active = False
+    resource.deleted_at = datetime.utcnow()
     await db.commit()
     
     # 记录操作日志
@@ -477,6 +499,90 @@ async def delete_resource(
     return {"message": "资源删除成功"}
 
 
+# ==================== 存储维护 ====================
+
+@router.post("/storage/gc", summary="执行存储垃圾回收")
+async def run_storage_gc(
+    background_tasks: BackgroundTasks,
+    request: Request,
+    dry_run: bool = Query(True, description="只统计可回收的文件，不实际删除"),
+    admin_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """在后台执行一次存储垃圾回收，结果通过 GET /admin/storage/gc 查看"""
+    background_tasks.add_task(gc_service.collect_garbage, dry_run)
+    
+    # 记录操作日志
+    await log_admin_action(
+        admin_phone=admin_user.phone,
+        action_type="storage_gc",
+        action_description=f"执行存储垃圾回收{'（试运行）' if dry_run else ''}",
+        target_type="storage",
+        target_id=None,
+        old_data=None,
+        new_data={"dry_run": dry_run},
+        request=request,
+        db=db
+    )
+    
+    return {"message": "垃圾回收已开始执行"}
+
+
+@router.get("/storage/gc", summary="获取最近一次垃圾回收报告")
+async def get_storage_gc_report(
+    admin_user: User = Depends(get_admin_user)
+):
+    """获取最近一次垃圾回收报告"""
+    if gc_service.last_report is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="暂无垃圾回收记录"
+        )
+    return gc_service.last_report
+
+
+# ==================== 积分对账 ====================
+
+@router.post("/ledger/reconcile", summary="执行积分对账")
+async def run_ledger_reconcile(
+    background_tasks: BackgroundTasks,
+    request: Request,
+    fix: bool = Query(False, description="为不一致的用户写入调整流水（以用户余额为准）"),
+    admin_user: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """在后台执行一次积分对账，结果通过 GET /admin/ledger/reconcile 查看"""
+    background_tasks.add_task(reconcile_service.reconcile_ledger, fix)
+    
+    # 记录操作日志
+    await log_admin_action(
+        admin_phone=admin_user.phone,
+        action_type="ledger_reconcile",
+        action_description=f"执行积分对账{'并写入调整流水' if fix else ''}",
+        target_type="ledger",
+        target_id=None,
+        old_data=None,
+        new_data={"fix": fix},
+        request=request,
+        db=db
+    )
+    
+    return {"message": "积分对账已开始执行"}
+
+
+@router.get("/ledger/reconcile", summary="获取最近一次积分对账报告")
+async def get_ledger_reconcile_report(
+    admin_user: User = Depends(get_admin_user)
+):
+    """获取最近一次积分对账报告"""
+    if reconcile_service.last_report is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="暂无积分对账记录"
+        )
+    return reconcile_service.last_report
+
+
 # ==================== 操作日志 ====================
 
 @router.get("/logs", response_model=List[AdminLogResponse], summary="获取操作日志")
@@ -18,6 +18,7 @@ from app.schemas.auth import UserRegister, UserLogin, Token
 from app.schemas.user import UserResponse
 from app.crud.user import get_user_by_phone, create_user
 from app.services.point_service import add_points
+from app.services.config_service import config_service
 from app.services.sms_service import sms_service
 from app.services.grade_service import grade_service
 
@@ -53,7 +54,7 @@ async def register(
     await add_points(
         db=db,
         user_id=user.id,
-        points=settings.POINTS_CONFIG["register"],
+        points=config_service.points["register"],
         transaction_type="register",
         description="新用户注册奖励"
     )
@@ -3,17 +3,25 @@
 """
 from datetime import datetime, timedelta
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks, Header
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, update, and_, func
 
 from app.core.database import get_db
 from app.core.security import get_current_user
-from app.core.config import settings
-from app.models.bounty import Bounty, BountyResponse
+from app.models.bounty import Bounty, BountyResponse, BountyMatch
 from app.models.resource import Resource
+from app.models.user import User
 from app.schemas.bounty import BountyCreate, BountyResponse as BountyResponseSchema, BountyList
-from app.services.point_service import deduct_points, transfer_points
+from app.services.point_service import deduct_points
+from app.services.config_service import config_service
+from app.services.user_stats_service import bump_stats
+from app.services.bounty_service import match_bounty, award_bounty
+from app.services.notification_service import notify_new_bounty, notify_bounty_response, notify_bounty_selected
+from app.services.listing_service import (
+    BOUNTY_CARD_COLUMNS, BOUNTY_CREATOR_COLUMNS, RESOURCE_CARD_COLUMNS, bounty_cards, resource_cards,
+    page_response, cursor_response, decode_cursor
+)
 
 
 router = APIRouter()
@@ -26,13 +34,19 @@ async def get_bounties(
     subject: Optional[str] = Query(None, description="科目筛选"),
     page: int = Query(1, ge=1, description="页码"),
     size: int = Query(20, ge=1, le=100, description="每页数量"),
+    cursor: Optional[str] = Query(None, description="翻页游标（传空字符串获取第一页，之后传上一页返回的next_cursor）"),
     db: AsyncSession = Depends(get_db)
 ):
-    """获取悬赏列表"""
+    """
+    获取悬赏列表（含响应数和发布者信息）
+    
+    传cursor时按ID游标翻页（ID随创建时间递增，与按创建时间倒序一致），不统计总数；否则按页码分页
+    """
     # 构建查询条件
     conditions = []
     
     if status_filter:
+        # 到期的悬赏由定时任务改为expired，列表只按状态筛选（走 (status, id) 索引）
         conditions.append(Bounty.status == status_filter)
     
     if grade:
@@ -41,12 +55,27 @@ async def get_bounties(
     if subject:
         conditions.append(Bounty.subject == subject)
     
-    # 构建查询
-    query = select(Bounty)
+    # 构建查询（只查询列表卡片需要的列，发布者信息连接查询）
+    query = (
+        select(*BOUNTY_CARD_COLUMNS, *BOUNTY_CREATOR_COLUMNS)
+        .join(User, Bounty.creator_id == User.id)
+    )
     if conditions:
         query = query.where(and_(*conditions))
     
-    query = query.order_by(Bounty.created_at.desc())
+    query = query.order_by(Bounty.id.desc())
+    
+    if cursor is not None:
+        # 游标翻页：从上一页最后一行之后开始读取
+        if cursor:
+            query = query.where(Bounty.id < decode_cursor(cursor))
+        result = await db.execute(query.limit(size + 1))
+        rows = result.all()
+        items = bounty_cards(rows[:size])
+        next_cursor = None
+        if len(rows) > size:
+            next_cursor = str(items[-1]["id"])
+        return cursor_response(items, size, next_cursor)
     
     # 分页
     offset = (page - 1) * size
@@ -54,27 +83,22 @@ async def get_bounties(
     
     # 执行查询
     result = await db.execute(query)
-    bounties = result.scalars().all()
+    items = bounty_cards(result.all())
     
     # 获取总数
-    count_query = select(Bounty)
+    count_query = select(func.count(Bounty.id))
     if conditions:
         count_query = count_query.where(and_(*conditions))
     count_result = await db.execute(count_query)
-    total = len(count_result.scalars().all())
+    total = count_result.scalar()
     
-    return {
-        "items": bounties,
-        "total": total,
-        "page": page,
-        "size": size,
-        "pages": (total + size - 1) // size
-    }
+    return page_response(items, total, page, size)
 
 
 @router.post("/", response_model=BountyResponseSchema, summary="创建悬赏")
 async def create_bounty(
     bounty_data: BountyCreate,
+    background_tasks: BackgroundTasks,
     current_user = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -87,10 +111,11 @@ async def create_bounty(
         )
     
     # 检查最低悬赏积分
-    if bounty_data.points_reward < settings.POINTS_CONFIG["min_bounty"]:
+    min_bounty = config_service.points["min_bounty"]
+    if bounty_data.points_reward < min_bounty:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"悬赏积分不能少于{settings.POINTS_CONFIG['min_bounty']}积分"
+            detail=f"悬赏积分不能少于{min_bounty}积分"
         )
     
     try:
@@ -115,9 +140,14 @@ async def create_bounty(
         )
         
         db.add(bounty)
+        await bump_stats(db, current_user.id, bounties_created=1)
         await db.commit()
         await db.refresh(bounty)
         
+        # 后台匹配已有资源、通知可能响应的用户，不影响创建耗时
+        background_tasks.add_task(match_bounty, bounty.id)
+        background_tasks.add_task(notify_new_bounty, bounty.id)
+        
         return bounty
         
     except Exception as e:
@@ -146,10 +176,39 @@ async def get_bounty(
     return bounty
 
 
+@router.get("/{bounty_id}/matches", summary="获取悬赏的推荐资源")
+async def get_bounty_matches(
+    bounty_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """获取系统自动匹配的候选资源（按匹配得分排序）"""
+    result = await db.execute(select(Bounty.id).where(Bounty.id == bounty_id))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="悬赏不存在"
+        )
+    
+    result = await db.execute(
+        select(*RESOURCE_CARD_COLUMNS, BountyMatch.score.label("match_score"))
+        .join(Resource, BountyMatch.resource_id == Resource.id)
+        .where(BountyMatch.bounty_id == bounty_id, Resource.is_active == True)
+        .order_by(BountyMatch.score.desc(), BountyMatch.id.desc())
+    )
+    items = resource_cards(result.all())
+    
+    return {
+        "bounty_id": bounty_id,
+        "items": items,
+        "total": len(items)
+    }
+
+
 @router.post("/{bounty_id}/respond", summary="响应悬赏")
 async def respond_to_bounty(
     bounty_id: int,
     resource_id: int,
+    background_tasks: BackgroundTasks,
     message: Optional[str] = None,
     current_user = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
@@ -222,8 +281,18 @@ async def respond_to_bounty(
     )
     
     db.add(response)
+    # 响应数与响应记录同一事务提交
+    await db.execute(
+        update(Bounty)
+        .where(Bounty.id == bounty_id)
+        .values(response_count=Bounty.response_count + 1)
+        .execution_options(synchronize_session=False)
+    )
     await db.commit()
     
+    # 通知悬赏发布者
+    background_tasks.add_task(notify_bounty_response, response.id)
+    
     return {"message": "响应成功，等待悬赏发布者确认"}
 
 
@@ -231,76 +300,23 @@ async def respond_to_bounty(
 async def select_bounty_response(
     bounty_id: int,
     response_id: int,
+    background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None, max_length=64, description="幂等键，重试时携带同一个值"),
     current_user = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """选择悬赏响应（悬赏发布者操作）"""
-    # 检查悬赏是否存在且属于当前用户
-    bounty_result = await db.execute(
-        select(Bounty).where(
-            Bounty.id == bounty_id,
-            Bounty.creator_id == current_user.id
-        )
-    )
-    bounty = bounty_result.scalar_one_or_none()
+    """
+    选择悬赏响应（悬赏发布者操作）
     
-    if not bounty:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="悬赏不存在或不属于您"
-        )
-    
-    if bounty.status != "active":
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="悬赏已结束"
-        )
+    悬赏积分已在创建时托管，采纳后发给响应者；并发或重复提交只会结算一次
+    """
+    awarded = await award_bounty(db, current_user, bounty_id, response_id, idempotency_key)
     
-    # 检查响应是否存在
-    response_result = await db.execute(
-        select(BountyResponse).where(
-            BountyResponse.id == response_id,
-            BountyResponse.bounty_id == bounty_id
-        )
-    )
-    response = response_result.scalar_one_or_none()
+    if awarded:
+        # 通知被采纳的响应者
+        background_tasks.add_task(notify_bounty_selected, bounty_id)
     
-    if not response:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="响应不存在"
-        )
-    
-    try:
-        # 标记响应为选中
-        response.is_selected = True
-        
-        # 更新悬赏状态
-        bounty.status = "completed"
-        bounty.winner_id = response.responder_id
-        bounty.winning_resource_id = response.resource_id
-        
-        # 将积分转移给响应者（积分已在创建悬赏时扣除，这里是从系统转移给响应者）
-        await transfer_points(
-            db=db,
-            from_user_id=current_user.id,  # 实际上积分已经扣除，这里只是记录
-            to_user_id=response.responder_id,
-            points=bounty.points_reward,
-            transaction_type="bounty_reward",
-            description=f"悬赏奖励: {bounty.title}",
-            related_bounty_id=bounty_id
-        )
-        
-        await db.commit()
-        
-        return {"message": "悬赏完成，积分已转移给响应者"}
-        
-    except Exception as e:
-        await db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="操作失败"
-        )
+    return {"message": "悬赏完成，积分已转移给响应者"}
 
 
 @router.get("/{bounty_id}/responses", summary="获取悬赏响应列表")
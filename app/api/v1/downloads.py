@@ -1,23 +1,75 @@
 """
 下载相关API
 """
-import os
+from urllib.parse import quote
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.core.database import get_db
 from app.core.security import get_current_user
-from app.core.config import settings
 from app.models.resource import Resource, Download
-from app.services.point_service import deduct_points, add_points, check_daily_download_limit, increment_daily_downloads
-from app.services.file_service import get_file_mime_type
+from app.services.entitlement_service import entitlement_service
+from app.services.file_service import get_file_mime_type, iter_zip_stream, build_archive_name
+from app.services.purchase_service import settle_purchases, charge_resources
+from app.services.storage_service import storage
+from app.services.tiering_service import ensure_hot, find_missing_files
+from app.schemas.download import BatchDownloadRequest, BatchPurchaseResponse
 
 
 router = APIRouter()
 
 
+@router.post("/batch", response_model=BatchPurchaseResponse, summary="批量购买资源")
+async def purchase_resources(
+    request: BatchDownloadRequest,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """批量购买资源：一次检查配额和积分，在一个事务内完成全部结算"""
+    resources, items = await settle_purchases(db, current_user, request.resource_ids)
+    await ensure_hot(resources)
+    
+    resources_by_id = {resource.id: resource for resource in resources}
+    for item in items:
+        resource = resources_by_id.get(item["resource_id"])
+        if resource is not None:
+            item["download_url"] = storage.presigned_url(resource.file_path, filename=resource.file_name)
+    
+    return {
+        "items": items,
+        "total_cost": sum(item["points_cost"] for item in items),
+        "points_remaining": current_user.points
+    }
+
+
+@router.post("/zip", summary="批量下载资源（ZIP打包）")
+async def download_resources_zip(
+    request: BatchDownloadRequest,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """批量下载资源：一次结算所有积分，再把文件流式打包为ZIP返回"""
+    resources, items = await settle_purchases(
+        db, current_user, request.resource_ids, require_all=True
+    )
+    await ensure_hot(resources)
+    
+    used_names = set()
+    entries = [
+        (resource.file_path, build_archive_name(resource.title, resource.file_type, used_names))
+        for resource in resources
+    ]
+    
+    archive_name = quote("资料合集.zip")
+    return StreamingResponse(
+        iter_zip_stream(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename*=utf-8''{archive_name}"}
+    )
+
+
 @router.post("/{resource_id}", summary="下载资源")
 async def download_resource(
     resource_id: int,
@@ -42,96 +94,41 @@ async def download_resource(
     
     # 检查是否是自己上传的资源（自己的资源免费下载）
     if resource.uploader_id == current_user.id:
-        download_url = f"/uploads/resources/{os.path.basename(resource.file_path)}"
+        await ensure_hot([resource])
+        download_url = storage.presigned_url(resource.file_path, filename=resource.file_name)
         return {
             "message": "下载成功（自己的资源免费）",
             "download_url": download_url
         }
     
     # 检查是否已经下载过（避免重复扣积分）
-    existing_download = await db.execute(
-        select(Download).where(
-            Download.user_id == current_user.id,
-            Download.resource_id == resource_id
-        )
-    )
-    
-    if existing_download.scalar_one_or_none():
-        download_url = f"/uploads/resources/{os.path.basename(resource.file_path)}"
+    if await entitlement_service.has_purchased(db, current_user.id, resource_id):
+        await ensure_hot([resource])
+        download_url = storage.presigned_url(resource.file_path, filename=resource.file_name)
         return {
             "message": "下载成功（已购买过的资源）",
             "download_url": download_url
         }
     
-    # 检查每日下载限制
-    if not await check_daily_download_limit(db, current_user):
-        level_config = settings.USER_LEVELS.get(current_user.level, {})
-        daily_limit = level_config.get("daily_downloads", 5)
+    # 文件缺失时不扣分
+    if await find_missing_files([resource]):
         raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail=f"已达到每日下载限制（{daily_limit}次），请明天再试或提升用户等级"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="文件不存在"
         )
     
-    # 检查积分是否足够
-    download_cost = settings.POINTS_CONFIG["download"]
-    if current_user.points < download_cost:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"积分不足，需要{download_cost}积分"
-        )
+    # 扣分、奖励上传者、记录下载在一个事务内完成
+    download_cost, _ = await charge_resources(db, current_user, [resource])
+    await ensure_hot([resource])
     
-    try:
-        # 扣除下载积分
-        await deduct_points(
-            db=db,
-            user_id=current_user.id,
-            points=download_cost,
-            transaction_type="download",
-            description=f"下载资源: {resource.title}",
-            related_resource_id=resource_id
-        )
-        
-        # 给上传者奖励积分
-        await add_points(
-            db=db,
-            user_id=resource.uploader_id,
-            points=settings.POINTS_CONFIG["download_reward"],
-            transaction_type="download_reward",
-            description=f"资源被下载: {resource.title}",
-            related_resource_id=resource_id
-        )
-        
-        # 创建下载记录
-        download_record = Download(
-            user_id=current_user.id,
-            resource_id=resource_id,
-            points_cost=download_cost
-        )
-        db.add(download_record)
-        
-        # 增加资源下载次数
-        resource.download_count += 1
-        
-        # 增加用户每日下载次数
-        await increment_daily_downloads(db, current_user)
-        
-        await db.commit()
-        
-        # 返回下载链接
-        download_url = f"/uploads/resources/{os.path.basename(resource.file_path)}"
-        
-        return {
-            "message": "下载成功",
-            "download_url": download_url,
-            "points_cost": download_cost
-        }
-        
-    except Exception as e:
-        await db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="下载失败，请重试"
-        )
+    # 返回下载链接
+    download_url = storage.presigned_url(resource.file_path, filename=resource.file_name)
+    
+    return {
+        "message": "下载成功",
+        "download_url": download_url,
+        "points_cost": download_cost
+    }
 
 
 @router.get("/file/{resource_id}", summary="直接下载文件")
@@ -158,32 +155,28 @@ async def download_file(
     
     # 检查下载权限（是否是上传者或已购买）
     if resource.uploader_id != current_user.id:
-        existing_download = await db.execute(
-            select(Download).where(
-                Download.user_id == current_user.id,
-                Download.resource_id == resource_id
-            )
-        )
-        
-        if not existing_download.scalar_one_or_none():
+        if not await entitlement_service.has_purchased(db, current_user.id, resource_id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="无权限下载该资源，请先购买"
             )
     
+    # 归档的文件先恢复到热存储
+    await ensure_hot([resource])
+    
     # 检查文件是否存在
-    if not os.path.exists(resource.file_path):
+    if await storage.stat(resource.file_path) is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="文件不存在"
         )
     
-    # 获取文件MIME类型
-    media_type = get_file_mime_type(resource.file_path)
+    # 获取文件MIME类型（优先使用上传后识别的结果）
+    media_type = resource.mime_type or get_file_mime_type(resource.file_path)
     
-    # 返回文件
-    return FileResponse(
-        path=resource.file_path,
+    # 返回文件（对象存储时重定向到预签名地址，由存储直接提供下载）
+    return await storage.file_response(
+        resource.file_path,
         filename=resource.file_name,
         media_type=media_type
     )
@@ -0,0 +1,54 @@
+"""
+排行榜API
+"""
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db
+from app.core.security import get_optional_current_user
+from app.schemas.leaderboard import LeaderboardResponse
+from app.services.leaderboard_service import leaderboard_service, METRICS, PERIODS
+
+
+router = APIRouter()
+
+
+@router.get("/", response_model=LeaderboardResponse, summary="获取排行榜")
+async def get_leaderboard(
+    metric: str = Query("points", description="指标：points（贡献积分：上传奖励和资源被下载奖励）、uploads（上传数）"),
+    period: str = Query("week", description="周期：week（本周）、month（本月）、all（总榜）"),
+    grade: Optional[str] = Query(None, description="按孩子年级筛选"),
+    city: Optional[str] = Query(None, description="按城市筛选"),
+    limit: int = Query(20, ge=1, le=100, description="返回前N名"),
+    current_user = Depends(get_optional_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """获取排行榜前N名，登录时同时返回当前用户的名次"""
+    if metric not in METRICS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="排行指标不正确"
+        )
+    
+    if period not in PERIODS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="排行周期不正确"
+        )
+    
+    if grade and city:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="年级和城市只能选择一个筛选条件"
+        )
+    
+    return await leaderboard_service.get_board(
+        db,
+        metric=metric,
+        period=period,
+        limit=limit,
+        user_id=current_user.id if current_user else None,
+        grade=grade,
+        city=city
+    )
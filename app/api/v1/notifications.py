@@ -0,0 +1,119 @@
+"""
+站内通知API
+"""
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+
+from app.core.database import get_db
+from app.core.security import get_current_user, get_stream_user
+from app.models.notification import Notification
+from app.schemas.notification import NotificationReadRequest
+from app.services.listing_service import decode_cursor
+from app.services.notification_service import event_stream, decrement_unread, fetch_unread_count
+
+
+router = APIRouter()
+
+
+NOTIFICATION_COLUMNS = (
+    Notification.id,
+    Notification.notification_type,
+    Notification.title,
+    Notification.content,
+    Notification.related_bounty_id,
+    Notification.related_resource_id,
+    Notification.is_read,
+    Notification.created_at,
+)
+
+
+async def _mark_read(db: AsyncSession, user_id: int, conditions: list) -> int:
+    """标记通知为已读，并按实际变化的条数减少未读数"""
+    result = await db.execute(
+        update(Notification)
+        .where(Notification.user_id == user_id, Notification.is_read == False, *conditions)
+        .values(is_read=True)
+        .execution_options(synchronize_session=False)
+    )
+    changed = result.rowcount
+    if changed:
+        await decrement_unread(db, user_id, changed)
+    await db.commit()
+    return changed
+
+
+@router.get("/", summary="获取通知列表")
+async def get_notifications(
+    cursor: Optional[str] = Query(None, description="翻页游标（上一页返回的next_cursor）"),
+    size: int = Query(20, ge=1, le=100, description="每页数量"),
+    unread_only: bool = Query(False, description="只看未读"),
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """获取通知列表（按时间倒序，游标翻页）"""
+    query = select(*NOTIFICATION_COLUMNS).where(Notification.user_id == current_user.id)
+    if unread_only:
+        query = query.where(Notification.is_read == False)
+    if cursor:
+        query = query.where(Notification.id < decode_cursor(cursor))
+    
+    result = await db.execute(query.order_by(Notification.id.desc()).limit(size + 1))
+    rows = result.all()
+    items = [dict(row._mapping) for row in rows[:size]]
+    
+    return {
+        "items": items,
+        "size": size,
+        "next_cursor": str(items[-1]["id"]) if len(rows) > size else None,
+        "unread_count": await fetch_unread_count(db, current_user.id)
+    }
+
+
+@router.get("/unread-count", summary="获取未读通知数")
+async def get_unread_count(
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """获取未读通知数（读取未读计数表，不统计通知表）"""
+    return {"unread_count": await fetch_unread_count(db, current_user.id)}
+
+
+@router.post("/read", summary="标记通知已读")
+async def mark_notifications_read(
+    request: NotificationReadRequest,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """标记指定通知为已读"""
+    changed = await _mark_read(db, current_user.id, [Notification.id.in_(request.ids)])
+    return {"marked": changed, "unread_count": await fetch_unread_count(db, current_user.id)}
+
+
+@router.post("/read-all", summary="全部标记已读")
+async def mark_all_notifications_read(
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """全部标记为已读"""
+    changed = await _mark_read(db, current_user.id, [])
+    return {"marked": changed, "unread_count": await fetch_unread_count(db, current_user.id)}
+
+
+@router.get("/stream", summary="通知推送（SSE）")
+async def stream_notifications(
+    current_user = Depends(get_stream_user)
+):
+    """
+    实时接收通知（Server-Sent Events）
+    
+    连接后先收到 unread 事件（当前未读数），之后每条新通知推送一个 notification 事件；
+    浏览器EventSource无法设置请求头，可通过 ?token= 传入访问令牌
+    """
+    return StreamingResponse(
+        event_stream(current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -4,22 +4,33 @@
 import os
 import uuid
 from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, BackgroundTasks, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_
+from sqlalchemy import select, and_, or_, func
 
 from app.core.database import get_db
-from app.core.security import get_current_user
+from app.core.security import get_current_user, get_optional_current_user
 from app.core.config import settings
 from app.models.resource import Resource
 from app.schemas.resource import ResourceResponse, ResourceCreate, ResourceList
 from app.services.point_service import add_points
+from app.services.config_service import config_service
+from app.services.user_stats_service import bump_stats
 from app.services.file_service import save_uploaded_file, validate_file
+from app.services.entitlement_service import entitlement_service
+from app.services.favorite_service import favorited_among, add_favorite, remove_favorite
+from app.services.preview_service import get_thumbnail_key
+from app.services.storage_service import storage
+from app.services.resource_pipeline import process_uploaded_resource, process_uploaded_resources
+from app.services.bulk_upload_service import receive_files, create_resources_for_files, discard_rejected_files
+from app.services.listing_service import RESOURCE_CARD_COLUMNS, resource_cards, page_response
 
 
 router = APIRouter()
 
+# 缩略图内容不变，本地存储时允许客户端缓存一年（对象存储按预签名有效期缩短）
+THUMBNAIL_CACHE_SECONDS = 365 * 24 * 3600
+
 
 @router.get("/", response_model=ResourceList, summary="获取资源列表")
 async def get_resources(
@@ -31,6 +42,7 @@ async def get_resources(
     resource_type: Optional[str] = Query(None, description="资源类型筛选"),
     sort_by: str = Query("created_at", description="排序字段"),
     sort_order: str = Query("desc", description="排序方向"),
+    current_user = Depends(get_optional_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """获取资源列表"""
@@ -61,8 +73,8 @@ async def get_resources(
     if resource_type:
         conditions.append(Resource.resource_type == resource_type)
 
-    # 构建查询
-    query = select(Resource).where(and_(*conditions))
+    # 构建查询（只查询列表卡片需要的列）
+    query = select(*RESOURCE_CARD_COLUMNS).where(and_(*conditions))
     
     # 排序
     if sort_by == "download_count":
@@ -82,24 +94,28 @@ async def get_resources(
     
     # 执行查询
     result = await db.execute(query)
-    resources = result.scalars().all()
+    items = resource_cards(result.all())
 
     # 获取总数
-    count_query = select(Resource).where(and_(*conditions))
+    count_query = select(func.count(Resource.id)).where(and_(*conditions))
     count_result = await db.execute(count_query)
-    total = len(count_result.scalars().all())
+    total = count_result.scalar()
 
-    return {
-        "items": resources,
-        "total": total,
-        "page": page,
-        "size": size,
-        "pages": (total + size - 1) // size
-    }
+    # 标记当前用户已购买（读取权益缓存）和已收藏（一页一次查询）的资源
+    if current_user:
+        page_ids = [item["id"] for item in items]
+        purchased = await entitlement_service.purchased_among(db, current_user.id, page_ids)
+        favorited = await favorited_among(db, current_user.id, page_ids)
+        for item in items:
+            item["is_purchased"] = item["id"] in purchased
+            item["is_favorited"] = item["id"] in favorited
+
+    return page_response(items, total, page, size)
 
 
 @router.post("/", response_model=ResourceResponse, summary="上传资源")
 async def upload_resource(
+    background_tasks: BackgroundTasks,
     title: str = Form(..., description="资源标题"),
     resource_type: str = Form(..., description="资源类型"),
     grade: Optional[str] = Form(None, description="年级（可多选，用逗号分隔）"),
@@ -132,6 +148,7 @@ async def upload_resource(
         )
         
         db.add(resource)
+        await bump_stats(db, current_user.id, total_uploads=1)
         await db.commit()
         await db.refresh(resource)
         
@@ -139,24 +156,94 @@ async def upload_resource(
         await add_points(
             db=db,
             user_id=current_user.id,
-            points=settings.POINTS_CONFIG["upload"],
+            points=config_service.points["upload"],
             transaction_type="upload",
             description=f"上传资源: {title}",
             related_resource_id=resource.id
         )
         
+        # 后台生成缩略图、提取正文
+        background_tasks.add_task(process_uploaded_resource, resource.id, resource.file_path, resource.file_type)
+        
         return resource
         
     except Exception as e:
         # 如果数据库操作失败，删除已上传的文件
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        await storage.delete(file_path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="资源上传失败"
         )
 
 
+@router.post("/bulk", summary="批量上传资源")
+async def bulk_upload_resources(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    批量上传资源（multipart/form-data）
+    
+    表单字段：resource_type（必填）、grade、subject、description 对本次所有文件生效，
+    files 可重复多次；资源标题取文件名（不含扩展名）
+    """
+    fields, files = await receive_files(request, "resources", settings.BULK_UPLOAD_MAX_FILES)
+    
+    if not files:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="请选择要上传的文件"
+        )
+    
+    resource_type = fields.get("resource_type", "")
+    if resource_type not in settings.RESOURCE_TYPES:
+        for received in files:
+            received.reject("资源类型选择不正确")
+        await discard_rejected_files(files)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="资源类型选择不正确"
+        )
+    
+    upload_points = config_service.points["upload"]
+    resources = await create_resources_for_files(
+        db=db,
+        user=current_user,
+        files=files,
+        resource_type=resource_type,
+        grade=fields.get("grade", ""),
+        subject=fields.get("subject", ""),
+        description=fields.get("description", "")
+    )
+    
+    # 后台计算哈希、识别类型、生成缩略图、提取正文
+    if resources:
+        background_tasks.add_task(
+            process_uploaded_resources,
+            [(resource.id, resource.file_path, resource.file_type) for resource in resources]
+        )
+    
+    items = [
+        {
+            "file_name": received.original_name,
+            "status": "failed" if received.error else "created",
+            "resource_id": received.resource_id,
+            "file_size": received.file_size,
+            "detail": received.error
+        }
+        for received in files
+    ]
+    
+    return {
+        "items": items,
+        "created": len(resources),
+        "failed": len(items) - len(resources),
+        "points_earned": upload_points * len(resources)
+    }
+
+
 @router.get("/{resource_id}", response_model=ResourceResponse, summary="获取资源详情")
 async def get_resource(
     resource_id: int,
@@ -181,3 +268,57 @@ async def get_resource(
 
 
 
+
+
+@router.post("/{resource_id}/favorite", summary="收藏资源")
+async def favorite_resource(
+    resource_id: int,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """收藏资源（重复收藏不会重复计数）"""
+    return await add_favorite(db, current_user.id, resource_id)
+
+
+@router.delete("/{resource_id}/favorite", summary="取消收藏")
+async def unfavorite_resource(
+    resource_id: int,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """取消收藏"""
+    return await remove_favorite(db, current_user.id, resource_id)
+
+
+@router.get("/{resource_id}/thumbnail", summary="获取资源缩略图")
+async def get_resource_thumbnail(
+    resource_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """获取资源缩略图（内容不变，允许客户端长期缓存）"""
+    result = await db.execute(
+        select(Resource.file_path, Resource.thumbnail_status).where(
+            Resource.id == resource_id,
+            Resource.is_active == True
+        )
+    )
+    row = result.one_or_none()
+    
+    if not row or row.thumbnail_status != "ready":
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="缩略图不存在"
+        )
+    
+    thumb_key = get_thumbnail_key(row.file_path)
+    if await storage.stat(thumb_key) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="缩略图不存在"
+        )
+    
+    return await storage.file_response(
+        thumb_key,
+        media_type="image/jpeg",
+        cache_max_age=THUMBNAIL_CACHE_SECONDS
+    )
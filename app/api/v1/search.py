@@ -7,8 +7,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_, func
 
 from app.core.database import get_db
+from app.core.security import get_optional_current_user
 from app.models.resource import Resource
 from app.schemas.resource import ResourceList
+from app.services.entitlement_service import entitlement_service
+from app.services.favorite_service import favorited_among
+from app.services.extraction_service import get_text_snippets, text_match_ids
+from app.services.listing_service import RESOURCE_CARD_COLUMNS, resource_cards, page_response
 from app.core.config import settings
 
 
@@ -24,20 +29,23 @@ async def search_resources(
     sort_by: str = Query("relevance", description="排序方式：relevance, created_at, download_count"),
     page: int = Query(1, ge=1, description="页码"),
     size: int = Query(20, ge=1, le=100, description="每页数量"),
+    current_user = Depends(get_optional_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """搜索资源"""
     # 构建查询条件
     conditions = [Resource.is_active == True]
     
-    # 关键词搜索
+    # 关键词搜索（标题、描述和文件正文，正文走全文索引）
     if q:
-        conditions.append(
-            or_(
-                Resource.title.ilike(f"%{q}%"),
-                Resource.description.ilike(f"%{q}%")
-            )
-        )
+        keyword_conditions = [
+            Resource.title.ilike(f"%{q}%"),
+            Resource.description.ilike(f"%{q}%")
+        ]
+        text_ids = text_match_ids(db, q)
+        if text_ids is not None:
+            keyword_conditions.append(Resource.id.in_(text_ids))
+        conditions.append(or_(*keyword_conditions))
     
     # 筛选条件
     if grade:
@@ -49,8 +57,8 @@ async def search_resources(
     if resource_type:
         conditions.append(Resource.resource_type == resource_type)
     
-    # 构建查询
-    query = select(Resource).where(and_(*conditions))
+    # 构建查询（只查询列表卡片需要的列）
+    query = select(*RESOURCE_CARD_COLUMNS).where(and_(*conditions))
     
     # 排序
     if sort_by == "download_count":
@@ -73,20 +81,29 @@ async def search_resources(
     
     # 执行查询
     result = await db.execute(query)
-    resources = result.scalars().all()
+    items = resource_cards(result.all())
     
     # 获取总数
     count_query = select(func.count(Resource.id)).where(and_(*conditions))
     count_result = await db.execute(count_query)
     total = count_result.scalar()
     
-    return {
-        "items": resources,
-        "total": total,
-        "page": page,
-        "size": size,
-        "pages": (total + size - 1) // size
-    }
+    # 标记当前用户已购买（读取权益缓存）和已收藏（一页一次查询）的资源
+    if current_user:
+        page_ids = [item["id"] for item in items]
+        purchased = await entitlement_service.purchased_among(db, current_user.id, page_ids)
+        favorited = await favorited_among(db, current_user.id, page_ids)
+        for item in items:
+            item["is_purchased"] = item["id"] in purchased
+            item["is_favorited"] = item["id"] in favorited
+    
+    # 正文命中片段
+    if q:
+        snippets = await get_text_snippets(db, [item["id"] for item in items], q)
+        for item in items:
+            item["snippet"] = snippets.get(item["id"])
+    
+    return page_response(items, total, page, size)
 
 
 @router.get("/hot", summary="获取热门资源")
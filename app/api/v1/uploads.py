@@ -0,0 +1,122 @@
+"""
+可续传分片上传API
+流程：创建会话 -> 按偏移量上传分片（可查询偏移量断点续传）-> 完成上传生成资源
+"""
+from fastapi import APIRouter, Depends, Header, Request, Response, BackgroundTasks
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db
+from app.core.security import get_current_user
+from app.schemas.upload import UploadSessionCreate, UploadSessionInfo
+from app.schemas.resource import ResourceResponse
+from app.services.upload_service import (
+    create_upload_session, get_upload_session, append_chunk, finalize_upload, abort_upload
+)
+from app.services.point_service import add_points
+from app.services.config_service import config_service
+from app.services.resource_pipeline import process_uploaded_resource
+
+
+router = APIRouter()
+
+
+def _session_info(session) -> dict:
+    return {
+        "upload_id": session.id,
+        "file_name": session.file_name,
+        "file_size": session.file_size,
+        "offset": session.received_bytes,
+        "expires_at": session.expires_at
+    }
+
+
+@router.post("/", response_model=UploadSessionInfo, summary="创建上传会话")
+async def create_upload(
+    upload_data: UploadSessionCreate,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """创建可续传上传会话"""
+    session = await create_upload_session(db, current_user.id, upload_data)
+    return _session_info(session)
+
+
+@router.head("/{upload_id}", summary="查询上传偏移量")
+async def head_upload(
+    upload_id: str,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """查询已接收字节数（断线重连后从该偏移量继续上传）"""
+    session = await get_upload_session(db, current_user.id, upload_id)
+    return Response(headers={
+        "Upload-Offset": str(session.received_bytes),
+        "Upload-Length": str(session.file_size),
+        "Cache-Control": "no-store"
+    })
+
+
+@router.get("/{upload_id}", response_model=UploadSessionInfo, summary="获取上传会话")
+async def get_upload(
+    upload_id: str,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """获取上传会话信息"""
+    session = await get_upload_session(db, current_user.id, upload_id)
+    return _session_info(session)
+
+
+@router.put("/{upload_id}", response_model=UploadSessionInfo, summary="上传分片")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    offset: int = Header(..., alias="Upload-Offset", ge=0, description="分片起始偏移量"),
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """上传分片（请求体为原始字节，直接写入磁盘）"""
+    session = await get_upload_session(db, current_user.id, upload_id)
+    new_offset = await append_chunk(db, session, offset, request.stream())
+    response.headers["Upload-Offset"] = str(new_offset)
+    return _session_info(session)
+
+
+@router.post("/{upload_id}/complete", response_model=ResourceResponse, summary="完成上传")
+async def complete_upload(
+    upload_id: str,
+    background_tasks: BackgroundTasks,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """全部分片上传完成后生成资源"""
+    session = await get_upload_session(db, current_user.id, upload_id)
+    resource = await finalize_upload(db, session)
+    
+    # 添加上传奖励积分
+    await add_points(
+        db=db,
+        user_id=current_user.id,
+        points=config_service.points["upload"],
+        transaction_type="upload",
+        description=f"上传资源: {resource.title}",
+        related_resource_id=resource.id
+    )
+    
+    # 后台生成缩略图、提取正文
+    background_tasks.add_task(process_uploaded_resource, resource.id, resource.file_path, resource.file_type)
+    
+    return resource
+
+
+@router.delete("/{upload_id}", summary="取消上传")
+async def cancel_upload(
+    upload_id: str,
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """取消上传并删除已上传的分片"""
+    session = await get_upload_session(db, current_user.id, upload_id)
+    await abort_upload(db, session)
+    return {"message": "上传已取消"}
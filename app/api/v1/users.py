@@ -1,16 +1,24 @@
 """
 用户相关API
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, or_, and_
 from datetime import date
 
 from app.core.database import get_db
 from app.core.security import get_current_user
+from app.models.resource import Resource, Favorite, PointTransaction
 from app.schemas.user import UserResponse, UserUpdate, UserStats
+from app.schemas.resource import ResourceList
 from app.crud.user import update_user, get_user_stats
 from app.services.point_service import add_points
-from app.core.config import settings
+from app.services.config_service import config_service
+from app.services.quota_service import quota_service
+from app.services.entitlement_service import entitlement_service
+from app.services.listing_service import RESOURCE_CARD_COLUMNS, resource_cards, page_response, decode_cursor
+from app.services.ledger_archive_service import get_opening_balance
 
 
 router = APIRouter()
@@ -19,7 +27,10 @@ router = APIRouter()
 @router.get("/me", response_model=UserResponse, summary="获取当前用户信息")
 async def get_me(current_user = Depends(get_current_user)):
     """获取当前用户信息"""
-    return current_user
+    # 当日下载次数由配额服务维护，不再读取users表中的计数
+    user_info = UserResponse.model_validate(current_user)
+    user_info.daily_downloads = await quota_service.get_used(current_user.id)
+    return user_info
 
 
 @router.put("/me", response_model=UserResponse, summary="更新用户信息")
@@ -60,10 +71,11 @@ async def daily_signin(
         )
     
     # 添加签到积分
+    signin_points = config_service.points["signin"]
     await add_points(
         db=db,
         user_id=current_user.id,
-        points=settings.POINTS_CONFIG["signin"],
+        points=signin_points,
         transaction_type="signin",
         description="每日签到奖励"
     )
@@ -74,7 +86,7 @@ async def daily_signin(
     
     return {
         "message": "签到成功",
-        "points_earned": settings.POINTS_CONFIG["signin"]
+        "points_earned": signin_points
     }
 
 
@@ -86,3 +98,87 @@ async def get_user_statistics(
     """获取用户统计信息"""
     stats = await get_user_stats(db, current_user.id)
     return stats
+
+
+@router.get("/me/transactions", summary="获取积分明细")
+async def get_my_transactions(
+    cursor: Optional[str] = Query(None, description="翻页游标（上一页返回的next_cursor）"),
+    size: int = Query(20, ge=1, le=100, description="每页数量"),
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    获取积分明细（按时间倒序，游标翻页）
+    
+    只包含未归档的流水；opening_balance 为已归档流水的积分合计，archived_through 之前的明细已归档
+    """
+    query = select(
+        PointTransaction.id,
+        PointTransaction.transaction_type,
+        PointTransaction.points_change,
+        PointTransaction.description,
+        PointTransaction.related_resource_id,
+        PointTransaction.related_bounty_id,
+        PointTransaction.created_at
+    ).where(PointTransaction.user_id == current_user.id)
+    if cursor:
+        # 游标为上一页最后一条的ID，按 (created_at, id) 定位（时间取自数据库，避免时间格式差异）
+        cursor_id = decode_cursor(cursor)
+        anchor = (
+            select(PointTransaction.created_at)
+            .where(PointTransaction.id == cursor_id, PointTransaction.user_id == current_user.id)
+            .scalar_subquery()
+        )
+        query = query.where(or_(
+            PointTransaction.created_at < anchor,
+            and_(PointTransaction.created_at == anchor, PointTransaction.id < cursor_id)
+        ))
+    
+    result = await db.execute(
+        query.order_by(PointTransaction.created_at.desc(), PointTransaction.id.desc()).limit(size + 1)
+    )
+    rows = result.all()
+    items = [dict(row._mapping) for row in rows[:size]]
+    
+    return {
+        "items": items,
+        "size": size,
+        "next_cursor": str(items[-1]["id"]) if len(rows) > size else None,
+        **await get_opening_balance(db, current_user.id)
+    }
+
+
+@router.get("/me/favorites", response_model=ResourceList, summary="获取我的收藏")
+async def get_my_favorites(
+    page: int = Query(1, ge=1, description="页码"),
+    size: int = Query(20, ge=1, le=100, description="每页数量"),
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """获取我的收藏（按收藏时间倒序，已下架的资源不返回）"""
+    conditions = [Favorite.user_id == current_user.id, Resource.is_active == True]
+    
+    query = (
+        select(*RESOURCE_CARD_COLUMNS, Favorite.created_at.label("favorited_at"))
+        .join(Resource, Favorite.resource_id == Resource.id)
+        .where(*conditions)
+        .order_by(Favorite.created_at.desc(), Favorite.id.desc())
+        .offset((page - 1) * size)
+        .limit(size)
+    )
+    result = await db.execute(query)
+    items = resource_cards(result.all())
+    
+    count_result = await db.execute(
+        select(func.count(Favorite.id))
+        .join(Resource, Favorite.resource_id == Resource.id)
+        .where(*conditions)
+    )
+    total = count_result.scalar()
+    
+    purchased = await entitlement_service.purchased_among(db, current_user.id, [item["id"] for item in items])
+    for item in items:
+        item["is_favorited"] = True
+        item["is_purchased"] = item["id"] in purchased
+    
+    return page_response(items, total, page, size)
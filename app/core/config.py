@@ -23,6 +23,9 @@ class Settings(BaseSettings):
     # Redis配置
     REDIS_URL: str = "redis://localhost:6379/0"
     
+    # 每日下载配额计数存储：memory（单进程）或 redis（多进程/多节点）
+    QUOTA_BACKEND: str = "memory"
+    
     # JWT配置
     SECRET_KEY: str = "your-secret-key-here-change-in-production"
     ALGORITHM: str = "HS256"
@@ -35,11 +38,87 @@ class Settings(BaseSettings):
         "pdf", "doc", "docx", "ppt", "pptx", 
         "xls", "xlsx", "jpg", "jpeg", "png"
     ]
+    BULK_UPLOAD_MAX_FILES: int = 30  # 批量上传单次最多文件数
+    UPLOAD_CHUNK_MAX_SIZE: int = 8 * 1024 * 1024  # 可续传上传单个分片上限
+    UPLOAD_SESSION_TTL_HOURS: int = 24  # 上传会话无活动后的过期时间
+    
+    # 文件存储配置：local（本地磁盘，UPLOAD_DIR）或 s3（S3兼容对象存储，如MinIO）
+    STORAGE_BACKEND: str = "local"
+    S3_ENDPOINT_URL: str = "http://localhost:9000"
+    S3_BUCKET: str = "k12-share"
+    S3_ACCESS_KEY: str = ""
+    S3_SECRET_KEY: str = ""
+    S3_REGION: str = "us-east-1"
+    S3_PRESIGN_EXPIRES: int = 3600  # 预签名下载地址有效期（秒）
+    
+    # 冷热分层：下载次数低于阈值且长期无下载的资源压缩后移入归档存储，下载时自动恢复
+    ARCHIVE_DIR: str = "archive"  # 本地归档目录（不对外提供静态访问）
+    S3_ARCHIVE_BUCKET: str = ""  # 归档存储桶（为空时与S3_BUCKET相同）
+    ARCHIVE_COMPRESSION_LEVEL: int = 10  # zstd压缩级别（使用gzip时最高为9）
+    COLD_TIER_IDLE_DAYS: int = 90
+    COLD_TIER_MAX_DOWNLOADS: int = 20
+    COLD_TIER_BATCH_SIZE: int = 100
+    COLD_TIER_INTERVAL: int = 6 * 3600  # 归档任务执行间隔（秒）
+    COLD_TIER_GRACE_HOURS: int = 24  # 切换冷热层后旧副本的保留时间（进行中的下载和恢复仍可读取）
+    
+    # 存储垃圾回收：软删除资源的文件保留期满后清理，孤立文件和残留临时文件超过最短保留时间后清理
+    GC_SOFT_DELETE_GRACE_DAYS: int = 30
+    GC_ORPHAN_MIN_AGE_HOURS: int = 24
+    GC_BATCH_SIZE: int = 500
+    GC_MAX_DELETES_PER_SECOND: float = 20.0  # 删除限速，避免影响在线下载
+    GC_INTERVAL: int = 24 * 3600  # 垃圾回收执行间隔（秒）
+    
+    # 过期悬赏处理：标记过期并退还发布者积分
+    BOUNTY_EXPIRY_BATCH_SIZE: int = 200
+    BOUNTY_EXPIRY_INTERVAL: int = 60  # 执行间隔（秒），即到期悬赏在列表中最多多显示的时间
+    
+    # 悬赏自动匹配：每个悬赏保留的候选资源数、参与匹配的关键词数
+    BOUNTY_MATCH_LIMIT: int = 10
+    BOUNTY_MATCH_MAX_TERMS: int = 16
+    
+    # 站内通知：推送通道（memory为进程内，多进程部署请使用redis）、新悬赏最多通知的用户数
+    NOTIFICATION_BROKER: str = "memory"
+    NOTIFICATION_FANOUT_MAX_USERS: int = 2000
+    NOTIFICATION_FANOUT_BATCH_SIZE: int = 500
+    NOTIFICATION_KEEPALIVE_SECONDS: int = 25  # SSE心跳间隔
+    
+    # 积分流水归档：超过保留月数的流水按月压缩写入归档存储，热表只保留近期流水和期初余额快照
+    LEDGER_ARCHIVE_MONTHS: int = 12
+    LEDGER_ARCHIVE_BATCH_SIZE: int = 5000
+    LEDGER_ARCHIVE_INTERVAL: int = 24 * 3600  # 归档任务执行间隔（秒）
+    
+    # 积分对账：按用户分块比对余额与流水，报告中保留的不一致明细条数
+    LEDGER_RECONCILE_CHUNK_SIZE: int = 5000
+    LEDGER_RECONCILE_REPORT_LIMIT: int = 1000
+    LEDGER_RECONCILE_INTERVAL: int = 24 * 3600  # 对账任务执行间隔（秒），定时对账只报告不调整
+    
+    # 年级批量升级：每个事务处理的用户ID跨度
+    GRADE_UPGRADE_BATCH_SIZE: int = 5000
+    
+    # 排行榜：有序集合存储（memory为进程内，多进程部署请使用redis）、定期按数据库重建的间隔
+    LEADERBOARD_BACKEND: str = "memory"
+    LEADERBOARD_REBUILD_INTERVAL: int = 3600  # 重建间隔（秒），同时校正用户年级/城市变化
+    
+    # 下载次数写缓冲配置（秒 / 累计下载事件数，任一条件满足即写回数据库）
+    DOWNLOAD_COUNT_FLUSH_INTERVAL: float = 5.0
+    DOWNLOAD_COUNT_FLUSH_THRESHOLD: int = 200
+    
+    # 已购资源权益缓存的最大用户数
+    ENTITLEMENT_CACHE_USERS: int = 10000
+    
+    # 后台进程池配置（缩略图生成等CPU密集型任务）
+    PROCESS_POOL_WORKERS: int = 2
+    THUMBNAIL_SIZE: int = 320  # 缩略图最长边（像素）
+    TEXT_EXTRACT_MAX_CHARS: int = 200000  # 每个文件最多提取的字符数
+    TEXT_EXTRACT_MAX_PAGES: int = 50  # PDF最多提取的页数
     
     # CORS配置
     ALLOWED_HOSTS: List[str] = ["*"]
     
-    # 积分系统配置
+    # 运行时配置（system_configs）版本检查间隔（秒），管理员修改积分规则或等级后各进程在该时间内生效
+    CONFIG_REFRESH_INTERVAL: int = 30
+    
+    # 积分系统默认配置（system_configs 中没有对应项时使用）
     POINTS_CONFIG: dict = {
         "register": 100,      # 注册奖励
         "upload": 20,         # 上传奖励
@@ -49,7 +128,7 @@ class Settings(BaseSettings):
         "min_bounty": 50      # 最低悬赏积分
     }
     
-    # 用户等级配置
+    # 用户等级默认配置
     USER_LEVELS: dict = {
         "新手用户": {"min_points": 0, "max_points": 499, "daily_downloads": 5},
         "活跃用户": {"min_points": 500, "max_points": 1999, "daily_downloads": 15},
@@ -0,0 +1,12 @@
+"""
+JSON响应类
+安装了orjson时使用ORJSONResponse（原生支持datetime，编码速度远快于标准json模块）
+"""
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultJSONResponse
+except ImportError:
+    from fastapi.responses import JSONResponse as DefaultJSONResponse
+
+
+__all__ = ["DefaultJSONResponse"]
@@ -0,0 +1,148 @@
+"""
+数据库结构升级
+create_all 只创建缺失的表，不会修改已有表；启动时先建表，再按模型补齐已有表缺少的字段和索引，
+可重复执行。新增的统计表、计数表和计数字段在创建后按明细表回填一次，新增唯一索引前先清理重复数据；
+资源正文的全文索引（SQLite FTS5 三元组表 / PostgreSQL pg_trgm GIN 索引）不属于模型，在这里单独创建
+"""
+import logging
+
+from sqlalchemy import inspect, literal, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import Column, Table
+
+from app.core.database import Base
+import app.models  # noqa: F401  注册所有模型
+
+logger = logging.getLogger(__name__)
+
+# 新增字段补齐后执行的回填语句：(表名, 字段名) -> SQL
+COLUMN_BACKFILLS = {
+    ("resources", "favorite_count"):
+        "UPDATE resources SET favorite_count = "
+        "(SELECT COUNT(*) FROM favorites WHERE favorites.resource_id = resources.id)",
+    ("bounties", "response_count"):
+        "UPDATE bounties SET response_count = "
+        "(SELECT COUNT(*) FROM bounty_responses WHERE bounty_responses.bounty_id = bounties.id)",
+    ("user_stats", "contribution_points"):
+        "UPDATE user_stats SET contribution_points = "
+        "(SELECT COALESCE(SUM(points_change), 0) FROM point_transactions "
+        "WHERE point_transactions.user_id = user_stats.user_id "
+        "AND transaction_type IN ('upload', 'download_reward') AND points_change > 0)",
+}
+
+def _user_stats_backfill():
+    # 与 rebuild_user_stats 使用同一条分组 INSERT ... SELECT（延迟导入，避免启动时的循环依赖）
+    from app.services.user_stats_service import stats_backfill_statement
+    return stats_backfill_statement()
+
+
+# 新建的统计/计数表创建后执行的回填：表名 -> SQL 或返回语句的函数（在补齐字段之后执行）
+TABLE_BACKFILLS = {
+    "user_stats": _user_stats_backfill,
+    "notification_counters":
+        "INSERT INTO notification_counters (user_id, unread_count) "
+        "SELECT user_id, COUNT(*) FROM notifications WHERE NOT is_read GROUP BY user_id",
+}
+
+# 新增唯一索引前清理重复数据：索引名 -> SQL
+INDEX_PREPARES = {
+    "uq_downloads_user_resource":
+        "DELETE FROM downloads WHERE id NOT IN "
+        "(SELECT MIN(id) FROM downloads GROUP BY user_id, resource_id)",
+}
+
+
+# 资源正文全文索引（SQLite 为 FTS5 外部内容表，rowid 即 resource_id，由触发器与 resource_texts 同步）
+RESOURCE_TEXT_FTS = "resource_texts_fts"
+
+_SQLITE_FULLTEXT_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {RESOURCE_TEXT_FTS} USING fts5("
+    f"content, content='resource_texts', content_rowid='resource_id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS {RESOURCE_TEXT_FTS}_ai AFTER INSERT ON resource_texts BEGIN "
+    f"INSERT INTO {RESOURCE_TEXT_FTS}(rowid, content) VALUES (new.resource_id, new.content); END",
+    f"CREATE TRIGGER IF NOT EXISTS {RESOURCE_TEXT_FTS}_ad AFTER DELETE ON resource_texts BEGIN "
+    f"INSERT INTO {RESOURCE_TEXT_FTS}({RESOURCE_TEXT_FTS}, rowid, content) "
+    f"VALUES ('delete', old.resource_id, old.content); END",
+    f"CREATE TRIGGER IF NOT EXISTS {RESOURCE_TEXT_FTS}_au AFTER UPDATE ON resource_texts BEGIN "
+    f"INSERT INTO {RESOURCE_TEXT_FTS}({RESOURCE_TEXT_FTS}, rowid, content) "
+    f"VALUES ('delete', old.resource_id, old.content); "
+    f"INSERT INTO {RESOURCE_TEXT_FTS}(rowid, content) VALUES (new.resource_id, new.content); END",
+    # 按 resource_texts 现有内容重建索引
+    f"INSERT INTO {RESOURCE_TEXT_FTS}({RESOURCE_TEXT_FTS}) VALUES ('rebuild')",
+)
+
+_POSTGRESQL_FULLTEXT_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS idx_resource_texts_content_trgm "
+    "ON resource_texts USING gin (content gin_trgm_ops)",
+)
+
+
+def _create_fulltext_index(conn: Connection) -> None:
+    """创建资源正文全文索引（已存在时跳过）"""
+    if conn.dialect.name == "postgresql":
+        statements = _POSTGRESQL_FULLTEXT_DDL
+    elif conn.dialect.name == "sqlite":
+        # 同步触发器随 resource_texts 一起删除，触发器不在时（首次创建或重建过表）重新创建并重建索引
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = :name"),
+            {"name": f"{RESOURCE_TEXT_FTS}_ai"}
+        ).first()
+        if exists:
+            return
+        statements = _SQLITE_FULLTEXT_DDL
+    else:
+        return
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+def _add_column_sql(conn: Connection, table: Table, column: Column) -> str:
+    """ALTER TABLE ADD COLUMN 语句，字段有标量默认值时带上 DEFAULT（已有行取默认值）"""
+    dialect = conn.dialect
+    preparer = dialect.identifier_preparer
+    sql = (
+        f"ALTER TABLE {preparer.format_table(table)} "
+        f"ADD COLUMN {preparer.format_column(column)} {column.type.compile(dialect=dialect)}"
+    )
+    if column.default is not None and column.default.is_scalar:
+        default = literal(column.default.arg).compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+        sql += f" DEFAULT {default}"
+        if not column.nullable:
+            sql += " NOT NULL"
+    return sql
+
+
+def upgrade_schema(conn: Connection) -> None:
+    """创建缺失的表，为已有表补齐缺少的字段和索引，并创建正文全文索引（通过 conn.run_sync 调用）"""
+    existing_tables = set(inspect(conn).get_table_names())
+    Base.metadata.create_all(conn)
+
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in columns:
+                continue
+            conn.execute(text(_add_column_sql(conn, table, column)))
+            backfill = COLUMN_BACKFILLS.get((table.name, column.name))
+            if backfill:
+                conn.execute(text(backfill))
+            logger.info(f"数据库升级：{table.name} 新增字段 {column.name}")
+
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                prepare = INDEX_PREPARES.get(index.name)
+                if prepare:
+                    conn.execute(text(prepare))
+                index.create(conn)
+                logger.info(f"数据库升级：{table.name} 新增索引 {index.name}")
+
+    # 回填语句可能用到上面刚补齐的字段，放在最后执行
+    for table_name, backfill in TABLE_BACKFILLS.items():
+        if table_name not in existing_tables:
+            conn.execute(text(backfill) if isinstance(backfill, str) else backfill())
+            logger.info(f"数据库升级：{table_name} 已按明细表回填")
+
+    _create_fulltext_index(conn)
@@ -1,15 +1,14 @@
 """
 用户CRUD操作
 """
-from typing import Optional
+from typing import Optional, Iterable
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, update, case
 from sqlalchemy.orm import selectinload
 
 from app.models.user import User
-from app.models.resource import Resource, Download, PointTransaction
-from app.models.bounty import Bounty
-from app.core.config import settings
+from app.models.user_stats import UserStatistics
+from app.services.config_service import config_service
 
 
 async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
@@ -37,7 +36,7 @@ async def create_user(
         password_hash=password_hash,
         nickname=nickname,
         child_grade=child_grade,
-        points=settings.POINTS_CONFIG["register"]
+        points=0  # 注册奖励由调用方通过积分流水发放，避免余额与流水不一致
     )
     db.add(user)
     await db.commit()
@@ -68,77 +67,61 @@ async def update_user(
 
 async def update_user_level(db: AsyncSession, user: User) -> User:
     """更新用户等级"""
-    points = user.points
-    
-    for level_name, level_config in settings.USER_LEVELS.items():
-        min_points = level_config["min_points"]
-        max_points = level_config["max_points"]
-        
-        if max_points == -1:  # 无上限
-            if points >= min_points:
-                user.level = level_name
-                break
-        else:
-            if min_points <= points <= max_points:
-                user.level = level_name
-                break
+    level_name = config_service.snapshot.level_for(user.points)
+    if level_name is not None:
+        user.level = level_name
     
     await db.commit()
     await db.refresh(user)
     return user
 
 
-async def get_user_stats(db: AsyncSession, user_id: int) -> dict:
-    """获取用户统计信息"""
-    # 总上传数
-    upload_count = await db.execute(
-        select(func.count(Resource.id)).where(Resource.uploader_id == user_id)
-    )
-    total_uploads = upload_count.scalar() or 0
-    
-    # 总下载数
-    download_count = await db.execute(
-        select(func.count(Download.id)).where(Download.user_id == user_id)
-    )
-    total_downloads = download_count.scalar() or 0
-    
-    # 总获得积分
-    earned_points = await db.execute(
-        select(func.sum(PointTransaction.points_change))
-        .where(
-            PointTransaction.user_id == user_id,
-            PointTransaction.points_change > 0
-        )
-    )
-    total_points_earned = earned_points.scalar() or 0
+def user_level_case():
+    """根据积分计算等级的SQL表达式（与update_user_level规则一致）"""
+    whens = []
+    for level in config_service.snapshot.levels:
+        if level.max_points == -1:  # 无上限
+            whens.append((User.points >= level.min_points, level.name))
+        else:
+            whens.append((User.points.between(level.min_points, level.max_points), level.name))
     
-    # 总消耗积分
-    spent_points = await db.execute(
-        select(func.sum(PointTransaction.points_change))
-        .where(
-            PointTransaction.user_id == user_id,
-            PointTransaction.points_change < 0
-        )
-    )
-    total_points_spent = abs(spent_points.scalar() or 0)
+    return case(*whens, else_=User.level)
+
+
+async def refresh_user_levels(db: AsyncSession, user_ids: Iterable[int]) -> None:
+    """按当前积分批量刷新用户等级（不提交事务，由调用方提交）"""
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return
     
-    # 创建的悬赏数
-    created_bounties = await db.execute(
-        select(func.count(Bounty.id)).where(Bounty.creator_id == user_id)
+    await db.execute(
+        update(User)
+        .where(User.id.in_(user_ids))
+        .values(level=user_level_case())
+        .execution_options(synchronize_session=False)
     )
-    bounties_created = created_bounties.scalar() or 0
-    
-    # 获胜的悬赏数
-    won_bounties = await db.execute(
-        select(func.count(Bounty.id)).where(Bounty.winner_id == user_id)
+
+
+async def get_user_stats(db: AsyncSession, user_id: int) -> dict:
+    """获取用户统计信息（读取增量维护的 user_stats，按主键一次查询）"""
+    result = await db.execute(
+        select(
+            UserStatistics.total_uploads,
+            UserStatistics.total_downloads,
+            UserStatistics.total_points_earned,
+            UserStatistics.total_points_spent,
+            UserStatistics.bounties_created,
+            UserStatistics.bounties_won
+        ).where(UserStatistics.user_id == user_id)
     )
-    bounties_won = won_bounties.scalar() or 0
-    
-    return {
-        "total_uploads": total_uploads,
-        "total_downloads": total_downloads,
-        "total_points_earned": total_points_earned,
-        "total_points_spent": total_points_spent,
-        "bounties_created": bounties_created,
-        "bounties_won": bounties_won
-    }
+    row = result.one_or_none()
+    if row is None:
+        return {
+            "total_uploads": 0,
+            "total_downloads": 0,
+            "total_points_earned": 0,
+            "total_points_spent": 0,
+            "bounties_created": 0,
+            "bounties_won": 0
+        }
+    return dict(row._mapping)
@@ -1,18 +1,28 @@
 # 数据模型包
 from .user import User
-from .resource import Resource, Download, PointTransaction, Favorite
-from .bounty import Bounty, BountyResponse
+from .user_stats import UserStatistics
+from .resource import Resource, Download, PointTransaction, PointBalanceSnapshot, Favorite, ResourceText
+from .bounty import Bounty, BountyResponse, BountyMatch
 from .report import Report, UserAction, SystemConfig
 from .admin import AdminLog
+from .upload import UploadSession
+from .notification import Notification, NotificationCounter
 
 __all__ = [
     "User",
+    "UserStatistics",
     "Resource",
     "Download",
     "PointTransaction",
+    "PointBalanceSnapshot",
     "Favorite",
+    "ResourceText",
     "Bounty",
     "BountyResponse",
+    "BountyMatch",
     "Report",
-    "UserAction"
+    "UserAction",
+    "UploadSession",
+    "Notification",
+    "NotificationCounter"
 ]
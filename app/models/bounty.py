@@ -1,7 +1,7 @@
 """
 悬赏数据模型
 """
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -22,6 +22,8 @@ class Bounty(Base):
     status = Column(String(20), default="active")  # 状态：active, completed, expired
     winner_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"))
     winning_resource_id = Column(Integer, ForeignKey("resources.id", ondelete="SET NULL"))
+    response_count = Column(Integer, default=0)  # 响应数（响应时增量维护）
+    award_idempotency_key = Column(String(64))  # 采纳请求的幂等键（重试时识别已完成的采纳）
     expires_at = Column(DateTime(timezone=True), nullable=False)  # 过期时间
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -31,6 +33,13 @@ class Bounty(Base):
     winner = relationship("User", foreign_keys=[winner_id])
     winning_resource = relationship("Resource")
     responses = relationship("BountyResponse", back_populates="bounty")
+    
+    __table_args__ = (
+        # 按状态筛选并查找已过期的进行中悬赏
+        Index("idx_bounties_status_expires", "status", "expires_at"),
+        # 按状态筛选的悬赏列表按ID倒序游标翻页
+        Index("idx_bounties_status_id", "status", "id"),
+    )
 
 
 class BountyResponse(Base):
@@ -49,3 +58,24 @@ class BountyResponse(Base):
     bounty = relationship("Bounty", back_populates="responses")
     responder = relationship("User")
     resource = relationship("Resource", back_populates="bounty_responses")
+
+
+class BountyMatch(Base):
+    """悬赏候选资源模型（自动匹配的结果，按得分排序）"""
+    __tablename__ = "bounty_matches"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    bounty_id = Column(Integer, ForeignKey("bounties.id", ondelete="CASCADE"), nullable=False)
+    resource_id = Column(Integer, ForeignKey("resources.id", ondelete="CASCADE"), nullable=False)
+    score = Column(Integer, nullable=False)  # 匹配得分
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # 关系
+    bounty = relationship("Bounty")
+    resource = relationship("Resource")
+    
+    __table_args__ = (
+        UniqueConstraint("bounty_id", "resource_id", name="uq_bounty_matches_bounty_resource"),
+        # 按得分读取悬赏的候选资源
+        Index("idx_bounty_matches_bounty_score", "bounty_id", "score"),
+    )
@@ -0,0 +1,35 @@
+"""
+站内通知数据模型
+"""
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class Notification(Base):
+    """站内通知模型（收件箱）"""
+    __tablename__ = "notifications"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    notification_type = Column(String(30), nullable=False)  # 类型：bounty_new, bounty_response, bounty_selected
+    title = Column(String(200), nullable=False)
+    content = Column(String(500))
+    related_bounty_id = Column(Integer)  # 关联悬赏ID
+    related_resource_id = Column(Integer)  # 关联资源ID
+    is_read = Column(Boolean, default=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # 收件箱按ID倒序游标翻页
+        Index("idx_notifications_user_id_id", "user_id", "id"),
+    )
+
+
+class NotificationCounter(Base):
+    """未读通知计数（单独成表，通知扇出和标记已读不与用户表上的积分更新争用同一行）"""
+    __tablename__ = "notification_counters"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    unread_count = Column(Integer, nullable=False, default=0)  # 未读通知数（增量维护）
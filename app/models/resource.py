@@ -1,7 +1,7 @@
 """
 资源数据模型
 """
-from sqlalchemy import Column, Integer, String, Text, BigInteger, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, BigInteger, Boolean, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -17,14 +17,22 @@ class Resource(Base):
     title = Column(String(200), nullable=False)
     description = Column(Text)
     file_name = Column(String(255), nullable=False)
-    file_path = Column(String(500), nullable=False)
+    file_path = Column(String(500), nullable=False, index=True)  # 存储键（如 resources/xxx.pdf，旧数据为本地完整路径）
     file_size = Column(BigInteger, nullable=False)  # 文件大小（字节）
     file_type = Column(String(50), nullable=False)  # 文件类型
+    file_hash = Column(String(64))  # 文件SHA-256（后台计算）
+    mime_type = Column(String(100))  # 文件MIME类型（后台识别）
     grade = Column(String(20), nullable=False)  # 年级
     subject = Column(String(20), nullable=False)  # 科目
     resource_type = Column(String(20), nullable=False)  # 资源类型
     download_count = Column(Integer, default=0)  # 下载次数
+    favorite_count = Column(Integer, default=0)  # 收藏数（收藏/取消收藏时增量维护）
+    thumbnail_status = Column(String(20), default="pending")  # 缩略图状态：pending, ready, failed, unsupported
+    storage_tier = Column(String(10), default="hot")  # 存储层级：hot（热存储）, cold（已归档）, purged（删除后文件已清理）
+    archive_key = Column(String(500), index=True)  # 归档存储键（cold时有值，恢复后保留到宽限期结束）
+    tier_changed_at = Column(DateTime(timezone=True))  # 冷热层切换时间（旧层副本待垃圾回收清理，清理后清空）
     is_active = Column(Boolean, default=True)
+    deleted_at = Column(DateTime(timezone=True))  # 软删除时间（超过保留期后清理文件）
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
@@ -34,6 +42,13 @@ class Resource(Base):
     bounty_responses = relationship("BountyResponse", back_populates="resource")
     favorites = relationship("Favorite", back_populates="resource")
     reports = relationship("Report", back_populates="reported_resource")
+    
+    @property
+    def thumbnail_url(self):
+        """缩略图地址（未生成时为None）"""
+        if self.thumbnail_status == "ready":
+            return f"/api/v1/resources/{self.id}/thumbnail"
+        return None
 
 
 class Download(Base):
@@ -49,6 +64,13 @@ class Download(Base):
     # 关系
     user = relationship("User")
     resource = relationship("Resource", back_populates="downloads")
+    
+    __table_args__ = (
+        # 同一用户同一资源只有一条下载记录（并发购买时只结算一次）
+        Index("uq_downloads_user_resource", "user_id", "resource_id", unique=True),
+        # 按资源查询最近下载时间（冷数据归档）
+        Index("idx_downloads_resource_created", "resource_id", "created_at"),
+    )
 
 
 class PointTransaction(Base):
@@ -67,6 +89,25 @@ class PointTransaction(Base):
     # 关系
     user = relationship("User")
     related_resource = relationship("Resource")
+    
+    __table_args__ = (
+        # 积分明细按 (created_at, id) 倒序游标翻页
+        Index("idx_point_transactions_user_created", "user_id", "created_at", "id"),
+    )
+
+
+class PointBalanceSnapshot(Base):
+    """积分期初余额快照（积分流水归档后保留每个用户已归档部分的合计）"""
+    __tablename__ = "point_balance_snapshots"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    opening_balance = Column(Integer, nullable=False, default=0)  # 已归档流水的积分变化合计
+    archived_earned = Column(Integer, nullable=False, default=0)  # 已归档流水中获得的积分合计
+    archived_spent = Column(Integer, nullable=False, default=0)  # 已归档流水中消耗的积分合计
+    archived_contribution = Column(Integer, nullable=False, default=0)  # 已归档流水中的贡献积分合计
+    archived_count = Column(Integer, nullable=False, default=0)  # 已归档的流水条数
+    archived_through = Column(DateTime(timezone=True))  # 早于该时间的流水已归档
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 
 class Favorite(Base):
@@ -81,3 +122,21 @@ class Favorite(Base):
     # 关系
     user = relationship("User")
     resource = relationship("Resource", back_populates="favorites")
+    
+    __table_args__ = (
+        UniqueConstraint("user_id", "resource_id", name="uq_favorites_user_resource"),
+        # 按收藏时间分页查询用户的收藏
+        Index("idx_favorites_user_created", "user_id", "created_at"),
+    )
+
+
+class ResourceText(Base):
+    """资源文本内容模型（从上传文件中提取，用于搜索）"""
+    __tablename__ = "resource_texts"
+    
+    resource_id = Column(Integer, ForeignKey("resources.id", ondelete="CASCADE"), primary_key=True)
+    content = Column(Text)  # 规范化后的纯文本
+    status = Column(String(20), nullable=False)  # 提取状态：ready, empty, unsupported, failed
+    char_count = Column(Integer, default=0)  # 文本长度
+    truncated = Column(Boolean, default=False)  # 是否因超出上限被截断
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
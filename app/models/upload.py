@@ -0,0 +1,28 @@
+"""
+分片上传会话数据模型
+"""
+from sqlalchemy import Column, Integer, String, Text, BigInteger, DateTime, ForeignKey
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class UploadSession(Base):
+    """可续传上传会话模型"""
+    __tablename__ = "upload_sessions"
+    
+    id = Column(String(32), primary_key=True)  # 会话ID（uuid hex）
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    file_name = Column(String(255), nullable=False)  # 原始文件名
+    file_type = Column(String(50), nullable=False)  # 文件类型
+    file_size = Column(BigInteger, nullable=False)  # 文件总大小（字节）
+    received_bytes = Column(BigInteger, default=0)  # 已接收字节数（当前偏移量）
+    temp_path = Column(String(500), nullable=False)  # 临时文件路径
+    title = Column(String(200), nullable=False)
+    description = Column(Text)
+    grade = Column(String(20))
+    subject = Column(String(20))
+    resource_type = Column(String(20), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)  # 过期时间
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -18,10 +18,10 @@ class User(Base):
     nickname = Column(String(50), nullable=False)
     avatar_url = Column(String(255))
     city = Column(String(50))
-    child_grade = Column(String(20))  # 孩子年级
+    child_grade = Column(String(20), index=True)  # 孩子年级
     points = Column(Integer, default=100)  # 积分
     level = Column(String(20), default="新手用户")  # 用户等级
-    daily_downloads = Column(Integer, default=0)  # 当日下载次数
+    daily_downloads = Column(Integer, default=0)  # 当日下载次数（已弃用，由quota_service计数）
     last_download_date = Column(Date)  # 最后下载日期
     last_signin_date = Column(Date)  # 最后签到日期
     last_grade_upgrade_year = Column(Integer)  # 最后年级升级年份
@@ -0,0 +1,22 @@
+"""
+用户统计数据模型
+"""
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class UserStatistics(Base):
+    """用户统计模型（由上传、下载、积分流水和悬赏写入路径增量维护）"""
+    __tablename__ = "user_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    total_uploads = Column(Integer, nullable=False, default=0)  # 总上传数
+    total_downloads = Column(Integer, nullable=False, default=0)  # 总下载数
+    total_points_earned = Column(Integer, nullable=False, default=0)  # 总获得积分
+    total_points_spent = Column(Integer, nullable=False, default=0)  # 总消耗积分
+    contribution_points = Column(Integer, nullable=False, default=0)  # 贡献积分（上传奖励和资源被下载奖励，用于积分榜）
+    bounties_created = Column(Integer, nullable=False, default=0)  # 创建的悬赏数
+    bounties_won = Column(Integer, nullable=False, default=0)  # 获胜的悬赏数
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
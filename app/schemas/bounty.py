@@ -38,6 +38,14 @@ class BountyCreate(BountyBase):
     pass
 
 
+class BountyCreator(BaseModel):
+    """悬赏发布者摘要"""
+    id: int
+    nickname: str
+    avatar_url: Optional[str] = None
+    level: Optional[str] = None
+
+
 class BountyResponse(BountyBase):
     """悬赏响应"""
     id: int
@@ -45,6 +53,7 @@ class BountyResponse(BountyBase):
     status: str
     winner_id: Optional[int] = None
     winning_resource_id: Optional[int] = None
+    response_count: int = 0
     expires_at: datetime
     created_at: datetime
     updated_at: datetime
@@ -53,13 +62,33 @@ class BountyResponse(BountyBase):
         from_attributes = True
 
 
+class BountyCard(BaseModel):
+    """悬赏列表卡片（只含描述预览，完整描述见悬赏详情）"""
+    id: int
+    creator_id: int
+    creator: Optional[BountyCreator] = None  # 发布者信息
+    title: str
+    description_preview: str = Field("", description="描述预览（前120个字符）")
+    grade: str
+    subject: str
+    points_reward: int
+    status: str
+    winner_id: Optional[int] = None
+    winning_resource_id: Optional[int] = None
+    response_count: int = 0
+    expires_at: datetime
+    created_at: datetime
+    updated_at: datetime
+
+
 class BountyList(BaseModel):
-    """悬赏列表响应"""
-    items: List[BountyResponse]
-    total: int
-    page: int
+    """悬赏列表响应（游标翻页时只返回items、size和next_cursor）"""
+    items: List[BountyCard]
+    total: Optional[int] = None
+    page: Optional[int] = None
     size: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 class BountyResponseCreate(BaseModel):
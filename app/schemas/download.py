@@ -0,0 +1,25 @@
+"""
+下载相关数据传输对象
+"""
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class BatchDownloadRequest(BaseModel):
+    """批量下载请求"""
+    resource_ids: List[int] = Field(..., min_length=1, max_length=50, description="资源ID列表")
+
+
+class BatchPurchaseItem(BaseModel):
+    """批量购买逐项结果"""
+    resource_id: int
+    status: str = Field(..., description="purchased, already_purchased, owned, not_found, file_missing")
+    points_cost: int = 0
+    download_url: Optional[str] = None
+
+
+class BatchPurchaseResponse(BaseModel):
+    """批量购买响应"""
+    items: List[BatchPurchaseItem]
+    total_cost: int
+    points_remaining: int
@@ -0,0 +1,25 @@
+"""
+排行榜相关数据传输对象
+"""
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class LeaderboardEntry(BaseModel):
+    """榜单条目"""
+    rank: int = Field(..., description="名次")
+    user_id: int
+    nickname: Optional[str] = None
+    avatar_url: Optional[str] = None
+    level: Optional[str] = None
+    score: int = Field(..., description="贡献积分或上传数")
+
+
+class LeaderboardResponse(BaseModel):
+    """榜单响应"""
+    metric: str = Field(..., description="指标：points（贡献积分：上传奖励和资源被下载奖励）、uploads（上传数）")
+    period: str = Field(..., description="周期：week、month、all")
+    period_key: str = Field(..., description="周期标识，如 2024-W07、2024-02、all")
+    items: List[LeaderboardEntry]
+    my_rank: Optional[int] = Field(None, description="当前用户名次（未登录或未上榜为空）")
+    my_score: int = Field(0, description="当前用户在本榜的分数")
@@ -0,0 +1,10 @@
+"""
+站内通知相关数据传输对象
+"""
+from pydantic import BaseModel, Field
+from typing import List
+
+
+class NotificationReadRequest(BaseModel):
+    """标记已读请求"""
+    ids: List[int] = Field(..., min_length=1, max_length=100, description="通知ID列表")
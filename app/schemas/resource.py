@@ -69,7 +69,13 @@ class ResourceResponse(ResourceBase):
     file_size: int
     file_type: str
     download_count: int
+    favorite_count: int = 0
     is_active: bool
+    is_purchased: bool = False
+    is_favorited: bool = False
+    favorited_at: Optional[datetime] = None  # 收藏时间（仅收藏列表返回）
+    thumbnail_url: Optional[str] = None
+    snippet: Optional[str] = None  # 搜索命中的正文片段
     created_at: datetime
     updated_at: datetime
 
@@ -77,9 +83,33 @@ class ResourceResponse(ResourceBase):
         from_attributes = True
 
 
+class ResourceCard(BaseModel):
+    """资源列表卡片（只含描述预览，完整描述见资源详情）"""
+    id: int
+    uploader_id: int
+    title: str
+    description_preview: str = Field("", description="描述预览（前120个字符）")
+    grade: str
+    subject: str
+    resource_type: str
+    file_name: str
+    file_size: int
+    file_type: str
+    download_count: int
+    favorite_count: int = 0
+    is_active: bool
+    is_purchased: bool = False
+    is_favorited: bool = False
+    favorited_at: Optional[datetime] = None  # 收藏时间（仅收藏列表返回）
+    thumbnail_url: Optional[str] = None
+    snippet: Optional[str] = None  # 搜索命中的正文片段
+    created_at: datetime
+    updated_at: datetime
+
+
 class ResourceList(BaseModel):
     """资源列表响应"""
-    items: List[ResourceResponse]
+    items: List[ResourceCard]
     total: int
     page: int
     size: int
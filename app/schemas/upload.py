@@ -0,0 +1,26 @@
+"""
+分片上传相关数据传输对象
+"""
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+
+
+class UploadSessionCreate(BaseModel):
+    """创建上传会话请求"""
+    file_name: str = Field(..., min_length=1, max_length=255, description="原始文件名")
+    file_size: int = Field(..., gt=0, description="文件总大小（字节）")
+    title: str = Field(..., min_length=1, max_length=200, description="资源标题")
+    resource_type: str = Field(..., description="资源类型")
+    grade: Optional[str] = Field(None, description="年级（可多选，用逗号分隔）")
+    subject: Optional[str] = Field(None, description="科目")
+    description: Optional[str] = Field(None, description="资源描述")
+
+
+class UploadSessionInfo(BaseModel):
+    """上传会话信息"""
+    upload_id: str
+    file_name: str
+    file_size: int
+    offset: int = Field(..., description="已接收字节数，下一个分片从这里开始")
+    expires_at: datetime
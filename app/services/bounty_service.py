@@ -0,0 +1,431 @@
+"""
+悬赏服务
+悬赏采纳结算、过期悬赏处理、悬赏与资源的自动匹配
+"""
+import logging
+import re
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, update, insert, delete, bindparam, case, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.crud.user import refresh_user_levels
+from app.models.bounty import Bounty, BountyResponse, BountyMatch
+from app.models.user import User
+from app.models.resource import Resource, ResourceText, PointTransaction
+from app.services.extraction_service import normalize_text
+from app.services.user_stats_service import new_deltas, ledger_deltas, increment_stats
+
+logger = logging.getLogger(__name__)
+
+
+async def award_bounty(
+    db: AsyncSession,
+    creator: User,
+    bounty_id: int,
+    response_id: int,
+    idempotency_key: Optional[str] = None
+) -> bool:
+    """
+    采纳悬赏响应，把托管的悬赏积分发给响应者（单事务）
+
+    悬赏积分在创建时已从发布者扣除（托管），这里只给响应者入账；
+    状态通过条件更新从active改为completed，并发的重复采纳只有一个能成功
+
+    Args:
+        db: 数据库会话
+        creator: 悬赏发布者
+        bounty_id: 悬赏ID
+        response_id: 被采纳的响应ID
+        idempotency_key: 幂等键，客户端重试时携带同一个键会得到相同的成功结果
+
+    Returns:
+        bool: 本次是否实际完成了结算（幂等重放时为False）
+    """
+    result = await db.execute(
+        select(BountyResponse.responder_id, BountyResponse.resource_id)
+        .join(Bounty, BountyResponse.bounty_id == Bounty.id)
+        .where(
+            BountyResponse.id == response_id,
+            BountyResponse.bounty_id == bounty_id,
+            Bounty.creator_id == creator.id
+        )
+    )
+    response = result.one_or_none()
+    if response is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="悬赏或响应不存在"
+        )
+
+    try:
+        # 条件更新同时锁定悬赏行：只有仍为active的悬赏能被采纳
+        result = await db.execute(
+            update(Bounty)
+            .where(
+                Bounty.id == bounty_id,
+                Bounty.creator_id == creator.id,
+                Bounty.status == "active"
+            )
+            .values(
+                status="completed",
+                winner_id=response.responder_id,
+                winning_resource_id=response.resource_id,
+                award_idempotency_key=idempotency_key
+            )
+            .returning(Bounty.points_reward, Bounty.title)
+            .execution_options(synchronize_session=False)
+        )
+        awarded = result.one_or_none()
+
+        if awarded is None:
+            await db.rollback()
+            # 同一幂等键的重试：上次已经成功，直接返回成功
+            if idempotency_key:
+                result = await db.execute(
+                    select(Bounty.id).where(
+                        Bounty.id == bounty_id,
+                        Bounty.status == "completed",
+                        Bounty.award_idempotency_key == idempotency_key
+                    )
+                )
+                if result.scalar_one_or_none() is not None:
+                    return False
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="悬赏已结束"
+            )
+
+        await db.execute(
+            update(BountyResponse)
+            .where(BountyResponse.id == response_id)
+            .values(is_selected=True)
+            .execution_options(synchronize_session=False)
+        )
+
+        # 从托管中给响应者入账（原子增量）
+        await db.execute(
+            update(User)
+            .where(User.id == response.responder_id)
+            .values(points=User.points + awarded.points_reward)
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            insert(PointTransaction).values(
+                user_id=response.responder_id,
+                transaction_type="bounty_reward",
+                points_change=awarded.points_reward,
+                description=f"悬赏奖励: {awarded.title}"[:200],
+                related_resource_id=response.resource_id,
+                related_bounty_id=bounty_id
+            )
+        )
+        deltas = new_deltas()
+        deltas[response.responder_id].update(total_points_earned=awarded.points_reward, bounties_won=1)
+        await increment_stats(db, deltas)
+        await refresh_user_levels(db, [response.responder_id])
+
+        await db.commit()
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"悬赏 {bounty_id} 采纳失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="操作失败"
+        )
+
+    return True
+
+
+async def _expire_batch(now: datetime, batch_size: int) -> Tuple[int, int]:
+    """
+    把一批已过期的悬赏标记为expired并退还积分（单事务）
+
+    Returns:
+        Tuple[int, int]: (查到的过期悬赏数, 实际过期的悬赏数)
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Bounty.id)
+            .where(Bounty.status == "active", Bounty.expires_at < now)
+            .order_by(Bounty.expires_at)
+            .limit(batch_size)
+        )
+        candidate_ids = result.scalars().all()
+        if not candidate_ids:
+            return 0, 0
+
+        # 条件更新：期间已被选中完成的悬赏不会被过期，也不会退款
+        result = await db.execute(
+            update(Bounty)
+            .where(Bounty.id.in_(candidate_ids), Bounty.status == "active")
+            .values(status="expired")
+            .returning(Bounty.id, Bounty.creator_id, Bounty.points_reward, Bounty.title)
+            .execution_options(synchronize_session=False)
+        )
+        expired = result.all()
+
+        if expired:
+            # 每个发布者一次汇总退款
+            refunds = Counter()
+            for bounty in expired:
+                refunds[bounty.creator_id] += bounty.points_reward
+
+            users_table = User.__table__
+            await db.execute(
+                update(users_table)
+                .where(users_table.c.id == bindparam("uid"))
+                .values(points=users_table.c.points + bindparam("delta")),
+                [{"uid": creator_id, "delta": points} for creator_id, points in refunds.items()]
+            )
+            transactions = [
+                {
+                    "user_id": bounty.creator_id,
+                    "transaction_type": "bounty_refund",
+                    "points_change": bounty.points_reward,
+                    "description": f"悬赏过期退还: {bounty.title}"[:200],
+                    "related_bounty_id": bounty.id
+                }
+                for bounty in expired
+            ]
+            await db.execute(insert(PointTransaction), transactions)
+            await increment_stats(db, ledger_deltas(transactions))
+            await refresh_user_levels(db, refunds)
+
+        await db.commit()
+        return len(candidate_ids), len(expired)
+
+
+async def expire_bounties() -> int:
+    """
+    过期悬赏处理（定时任务）
+
+    按 (status, expires_at) 索引分批查找已过期的进行中悬赏，
+    每批在一个事务内标记为过期，并把悬赏积分退还给发布者
+
+    Returns:
+        int: 本次过期的悬赏数
+    """
+    now = datetime.utcnow()
+    total = 0
+    while True:
+        try:
+            found, expired = await _expire_batch(now, settings.BOUNTY_EXPIRY_BATCH_SIZE)
+        except Exception as e:
+            logger.error(f"过期悬赏处理失败: {e}")
+            break
+        if not found:
+            break
+        total += expired
+
+    if total:
+        logger.info(f"已处理 {total} 个过期悬赏并退还积分")
+    return total
+
+
+# ==================== 悬赏自动匹配 ====================
+
+# 关键词在标题、描述、正文中命中的得分
+TITLE_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+CONTENT_WEIGHT = 1
+
+_TERM_SPLIT_RE = re.compile(r"[\W_]+")
+_CJK_RE = re.compile(r"[\u4e00-\u9fff]")
+
+# 悬赏描述中常见、对匹配没有帮助的词
+_STOP_TERMS = {
+    "求助", "谢谢", "感谢", "需要", "有没", "没有", "有的", "资料", "一份", "一套",
+    "哪位", "麻烦", "请问", "急求", "最好", "可以", "分享", "一下",
+}
+
+
+def extract_match_terms(title: str, description: str, max_terms: int, exclude: str = "") -> List[str]:
+    """
+    从悬赏标题和描述中提取匹配关键词（标题在前）
+
+    中文没有分词，较长的中文片段拆成相邻两字的词组；
+    exclude中出现的词（如悬赏的年级、科目，已作为筛选条件）不再参与打分
+    """
+    exclude = normalize_text(exclude).lower()
+    terms: List[str] = []
+    for text in (title, description or ""):
+        for token in _TERM_SPLIT_RE.split(normalize_text(text).lower()):
+            if len(token) < 2:
+                continue
+            if _CJK_RE.search(token) and len(token) > 4:
+                candidates = [token[i:i + 2] for i in range(len(token) - 1)]
+            else:
+                candidates = [token]
+            for term in candidates:
+                if term not in _STOP_TERMS and term not in exclude and term not in terms:
+                    terms.append(term)
+                    if len(terms) >= max_terms:
+                        return terms
+    return terms
+
+
+def _bounty_terms(bounty: Bounty) -> List[str]:
+    return extract_match_terms(
+        bounty.title, bounty.description, settings.BOUNTY_MATCH_MAX_TERMS,
+        exclude=f"{bounty.grade} {bounty.subject}"
+    )
+
+
+def _score_expression(terms: List[str]):
+    """资源与关键词的匹配得分（SQL表达式）"""
+    score = 0
+    for term in terms:
+        pattern = f"%{term}%"
+        score = score + case((Resource.title.ilike(pattern), TITLE_WEIGHT), else_=0)
+        score = score + case((Resource.description.ilike(pattern), DESCRIPTION_WEIGHT), else_=0)
+        score = score + case((ResourceText.content.ilike(pattern), CONTENT_WEIGHT), else_=0)
+    return score
+
+
+async def _rank_resources(db: AsyncSession, bounty, terms: List[str], resource_ids=None) -> List[Tuple[int, int]]:
+    """按得分查询与悬赏匹配的资源，返回 [(资源ID, 得分)]"""
+    score = _score_expression(terms)
+    conditions = [
+        Resource.is_active == True,
+        Resource.uploader_id != bounty.creator_id,
+        Resource.subject == bounty.subject,
+        or_(
+            Resource.grade.ilike(f"%{bounty.grade}%"),
+            Resource.grade == "",
+            Resource.grade.is_(None)
+        ),
+        score > 0
+    ]
+    if resource_ids is not None:
+        conditions.append(Resource.id.in_(resource_ids))
+
+    result = await db.execute(
+        select(Resource.id, score.label("score"))
+        .outerjoin(ResourceText, ResourceText.resource_id == Resource.id)
+        .where(and_(*conditions))
+        .order_by(score.desc(), Resource.download_count.desc(), Resource.id.desc())
+        .limit(settings.BOUNTY_MATCH_LIMIT)
+    )
+    return [(row.id, row.score) for row in result.all()]
+
+
+async def _trim_matches(db: AsyncSession, bounty_id: int) -> None:
+    """每个悬赏只保留得分最高的候选资源"""
+    keep = (
+        select(BountyMatch.id)
+        .where(BountyMatch.bounty_id == bounty_id)
+        .order_by(BountyMatch.score.desc(), BountyMatch.id.desc())
+        .limit(settings.BOUNTY_MATCH_LIMIT)
+    )
+    await db.execute(
+        delete(BountyMatch).where(
+            BountyMatch.bounty_id == bounty_id,
+            BountyMatch.id.not_in(keep.scalar_subquery())
+        )
+    )
+
+
+async def match_bounty(bounty_id: int) -> int:
+    """
+    为悬赏匹配已有资源（创建悬赏后作为后台任务调用），结果覆盖原有候选
+
+    Returns:
+        int: 候选资源数
+    """
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Bounty).where(Bounty.id == bounty_id))
+            bounty = result.scalar_one_or_none()
+            if bounty is None or bounty.status != "active":
+                return 0
+
+            terms = _bounty_terms(bounty)
+            ranked = await _rank_resources(db, bounty, terms) if terms else []
+
+            await db.execute(delete(BountyMatch).where(BountyMatch.bounty_id == bounty_id))
+            if ranked:
+                await db.execute(
+                    insert(BountyMatch),
+                    [
+                        {"bounty_id": bounty_id, "resource_id": resource_id, "score": score}
+                        for resource_id, score in ranked
+                    ]
+                )
+            await db.commit()
+            return len(ranked)
+    except Exception as e:
+        logger.warning(f"悬赏 {bounty_id} 匹配失败: {e}")
+        return 0
+
+
+async def match_new_resources(resource_ids: Iterable[int]) -> int:
+    """
+    新资源上传（正文提取完成）后，与进行中的悬赏增量匹配
+
+    一次处理一批资源：按科目找出进行中的悬赏，每个悬赏只在这批资源中打分，
+    命中的资源并入候选后再截取得分最高的部分
+
+    Returns:
+        int: 新增的候选记录数
+    """
+    resource_ids = list(resource_ids)
+    if not resource_ids:
+        return 0
+
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Resource.subject).where(Resource.id.in_(resource_ids)).distinct()
+            )
+            subjects = [subject for subject in result.scalars().all() if subject]
+            if not subjects:
+                return 0
+
+            result = await db.execute(
+                select(Bounty).where(
+                    Bounty.status == "active",
+                    Bounty.expires_at > datetime.utcnow(),
+                    Bounty.subject.in_(subjects)
+                )
+            )
+            bounties = result.scalars().all()
+
+            added = 0
+            for bounty in bounties:
+                terms = _bounty_terms(bounty)
+                if not terms:
+                    continue
+                ranked = await _rank_resources(db, bounty, terms, resource_ids)
+                if not ranked:
+                    continue
+
+                # 并发的全量匹配可能已写入同一资源，先删后插
+                await db.execute(
+                    delete(BountyMatch).where(
+                        BountyMatch.bounty_id == bounty.id,
+                        BountyMatch.resource_id.in_([resource_id for resource_id, _ in ranked])
+                    )
+                )
+                await db.execute(
+                    insert(BountyMatch),
+                    [
+                        {"bounty_id": bounty.id, "resource_id": resource_id, "score": score}
+                        for resource_id, score in ranked
+                    ]
+                )
+                await _trim_matches(db, bounty.id)
+                added += len(ranked)
+
+            await db.commit()
+            return added
+    except Exception as e:
+        logger.warning(f"新资源与悬赏匹配失败: {e}")
+        return 0
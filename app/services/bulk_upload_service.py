@@ -0,0 +1,330 @@
+"""
+批量上传服务
+流式解析multipart请求体，每个文件边接收边写入存储后端，不在内存或临时文件中缓冲
+"""
+import asyncio
+import os
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update, insert
+
+from app.core.config import settings
+from app.crud.user import refresh_user_levels
+from app.models.user import User
+from app.models.resource import Resource, PointTransaction
+from app.services.storage_service import storage, build_storage_key
+from app.services.config_service import config_service
+from app.services.user_stats_service import bump_stats
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    from multipart.multipart import MultipartParser, parse_options_header
+
+
+class ReceivedFile:
+    """已接收（或被拒绝）的上传文件"""
+
+    def __init__(self, original_name: str, file_path: Optional[str], file_type: str):
+        self.original_name = original_name
+        self.file_path = file_path  # 存储键
+        self.file_type = file_type
+        self.file_size = 0
+        self.error: Optional[str] = None
+        self.resource_id: Optional[int] = None
+
+    def reject(self, error: str) -> None:
+        """拒绝该文件（已写入的部分由 discard_rejected_files 删除）"""
+        if not self.error:
+            self.error = error
+
+
+async def discard_rejected_files(files: List[ReceivedFile]) -> None:
+    """删除被拒绝文件已写入存储的部分"""
+    for received in files:
+        if received.error and received.file_path:
+            try:
+                await storage.delete(received.file_path)
+            except Exception:
+                pass
+            received.file_path = None
+
+
+class _StreamingFormReceiver:
+    """multipart解析回调：文件数据写入待写队列，普通字段收集到内存"""
+
+    def __init__(self, subfolder: str, max_files: int):
+        self.subfolder = subfolder
+        self.max_files = max_files
+        self.fields: Dict[str, str] = {}
+        self.files: List[ReceivedFile] = []
+        self.pending_writes: List[Tuple[ReceivedFile, bytes]] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._field_name: Optional[str] = None
+        self._field_value = bytearray()
+        self._file: Optional[ReceivedFile] = None
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._disposition = b""
+        self._field_name = None
+        self._field_value = bytearray()
+        self._file = None
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        if self._header_field.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        self._field_name = options.get(b"name", b"").decode("utf-8", errors="replace")
+        if b"filename" not in options:
+            return
+
+        original_name = options[b"filename"].decode("utf-8", errors="replace")
+        file_type = original_name.split('.')[-1].lower() if '.' in original_name else ""
+        received = ReceivedFile(original_name, None, file_type)
+        self._file = received
+        self.files.append(received)
+
+        if len(self.files) > self.max_files:
+            received.reject(f"单次最多上传{self.max_files}个文件")
+        elif file_type not in settings.ALLOWED_FILE_TYPES:
+            received.reject(f"不支持的文件类型，支持的格式：{', '.join(settings.ALLOWED_FILE_TYPES)}")
+        else:
+            received.file_path = build_storage_key(self.subfolder, file_type)
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        received = self._file
+        if received is None:
+            self._field_value += data[start:end]
+            return
+        if received.error:
+            return
+
+        received.file_size += end - start
+        if received.file_size > settings.MAX_FILE_SIZE:
+            received.reject(f"文件大小超过限制（{settings.MAX_FILE_SIZE // 1024 // 1024}MB）")
+            return
+        self.pending_writes.append((received, data[start:end]))
+
+    def on_part_end(self) -> None:
+        if self._file is None and self._field_name:
+            self.fields[self._field_name] = self._field_value.decode("utf-8", errors="replace")
+        elif self._file is not None and not self._file.error and self._file.file_size == 0:
+            self._file.reject("文件内容为空")
+
+
+async def _queue_chunks(queue: asyncio.Queue):
+    """从队列中读取数据块，遇到None结束"""
+    while True:
+        data = await queue.get()
+        if data is None:
+            break
+        yield data
+
+
+class _StorageWriter:
+    """把一个文件的数据块通过队列交给存储后端写入（存储端背压时接收也随之放慢）"""
+
+    def __init__(self, received: ReceivedFile):
+        self.received = received
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=8)
+        self.task = asyncio.create_task(storage.put(received.file_path, _queue_chunks(self.queue)))
+
+    async def _put(self, data: Optional[bytes]) -> None:
+        put = asyncio.ensure_future(self.queue.put(data))
+        await asyncio.wait({put, self.task}, return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            # 存储写入已提前结束（失败），抛出其异常
+            put.cancel()
+            await self.task
+            raise RuntimeError("存储写入提前结束")
+
+    async def write(self, data: bytes) -> None:
+        await self._put(data)
+
+    async def close(self) -> None:
+        await self._put(None)
+        await self.task
+
+    async def cancel(self) -> None:
+        self.task.cancel()
+        try:
+            await self.task
+        except BaseException:
+            pass
+
+
+async def receive_files(request: Request, subfolder: str, max_files: int) -> Tuple[Dict[str, str], List[ReceivedFile]]:
+    """
+    流式接收multipart请求中的所有文件
+
+    Args:
+        request: 请求对象
+        subfolder: 存储目录（存储键前缀）
+        max_files: 最多接收的文件数
+
+    Returns:
+        Tuple[Dict[str, str], List[ReceivedFile]]: (普通表单字段, 文件列表)
+    """
+    _, params = parse_options_header(request.headers.get("Content-Type", ""))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="请求格式错误，需要multipart/form-data"
+        )
+
+    receiver = _StreamingFormReceiver(subfolder, max_files)
+    parser = MultipartParser(boundary, receiver.callbacks())
+
+    # 各文件按顺序到达，同一时间只写入一个文件
+    writer: Optional[_StorageWriter] = None
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            # 解析回调是同步的，文件写入在这里异步完成
+            for received, data in receiver.pending_writes:
+                if received.error:
+                    continue
+                if writer is None or writer.received is not received:
+                    if writer is not None:
+                        await _finish_writer(writer)
+                    writer = _StorageWriter(received)
+                await writer.write(data)
+            receiver.pending_writes = []
+        parser.finalize()
+        if writer is not None:
+            await _finish_writer(writer)
+            writer = None
+    except Exception:
+        if writer is not None:
+            await writer.cancel()
+        for received in receiver.files:
+            received.reject("上传中断")
+        await discard_rejected_files(receiver.files)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="上传中断或请求格式错误"
+        )
+
+    # 写入过程中超限或为空被拒绝的文件，删除已写入的部分
+    await discard_rejected_files(receiver.files)
+    return receiver.fields, receiver.files
+
+
+async def _finish_writer(writer: _StorageWriter) -> None:
+    """结束一个文件的写入；文件已被拒绝时取消写入"""
+    if writer.received.error:
+        await writer.cancel()
+    else:
+        await writer.close()
+
+
+async def create_resources_for_files(
+    db: AsyncSession,
+    user: User,
+    files: List[ReceivedFile],
+    resource_type: str,
+    grade: str,
+    subject: str,
+    description: str
+) -> List[Resource]:
+    """
+    为接收成功的文件批量创建资源，并在同一事务中发放合并的上传奖励
+
+    Returns:
+        List[Resource]: 创建的资源列表
+    """
+    accepted = [received for received in files if not received.error]
+    if not accepted:
+        return []
+
+    resources = []
+    for received in accepted:
+        title = os.path.splitext(received.original_name)[0][:200] or received.original_name
+        resources.append(Resource(
+            uploader_id=user.id,
+            title=title,
+            description=description or "",
+            file_name=os.path.basename(received.file_path),
+            file_path=received.file_path,
+            file_size=received.file_size,
+            file_type=received.file_type,
+            grade=grade or "",
+            subject=subject or "",
+            resource_type=resource_type
+        ))
+
+    upload_points = config_service.points["upload"]
+    try:
+        db.add_all(resources)
+        await db.flush()
+
+        # 合并发放上传奖励：一次更新余额，流水逐条批量插入
+        await db.execute(
+            update(User)
+            .where(User.id == user.id)
+            .values(points=User.points + upload_points * len(resources))
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            insert(PointTransaction),
+            [
+                {
+                    "user_id": user.id,
+                    "transaction_type": "upload",
+                    "points_change": upload_points,
+                    "description": f"上传资源: {resource.title}"[:200],
+                    "related_resource_id": resource.id
+                }
+                for resource in resources
+            ]
+        )
+        await bump_stats(
+            db,
+            user.id,
+            total_uploads=len(resources),
+            total_points_earned=upload_points * len(resources),
+            contribution_points=upload_points * len(resources)
+        )
+        await refresh_user_levels(db, [user.id])
+
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        for received in accepted:
+            received.reject("资源上传失败")
+        await discard_rejected_files(accepted)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="资源上传失败"
+        )
+
+    for received, resource in zip(accepted, resources):
+        received.resource_id = resource.id
+    await db.refresh(user)
+    return resources
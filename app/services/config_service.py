@@ -0,0 +1,210 @@
+"""
+运行时配置服务
+把 system_configs 中的积分规则和用户等级加载为不可变快照（JSON已解析、等级阈值编译为有序表），
+热路径直接读取当前快照，无锁、无数据库查询；管理员修改配置时递增版本号，
+各进程定期比对版本号后整体替换快照，无需重启即可生效
+"""
+import ast
+import json
+import logging
+from bisect import bisect_right
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select, update, cast, Integer, Text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.report import SystemConfig
+
+logger = logging.getLogger(__name__)
+
+POINT_RULES_KEY = "point_rules"
+USER_LEVELS_KEY = "user_levels"
+VERSION_KEY = "config_version"
+
+# 管理后台初始化配置使用的键名 -> 积分规则键名
+POINT_RULE_ALIASES = {
+    "register_points": "register",
+    "upload_points": "upload",
+    "download_cost": "download",
+    "daily_signin_points": "signin",
+    "download_reward_points": "download_reward",
+    "min_bounty_points": "min_bounty"
+}
+
+DEFAULT_DAILY_DOWNLOADS = 5
+
+
+class UserLevel(NamedTuple):
+    """用户等级（max_points 为 -1 表示无上限，daily_downloads 为 -1 表示不限下载次数）"""
+    name: str
+    min_points: int
+    max_points: int
+    daily_downloads: int
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def parse_config_value(text: Optional[str]) -> Any:
+    """解析配置值：JSON，兼容早期以Python字面量写入的值，无法解析时返回None"""
+    if text is None:
+        return None
+    try:
+        return json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        pass
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return None
+
+
+def parse_point_rules(value: Any) -> Dict[str, int]:
+    """积分规则：在默认规则上覆盖配置中的有效项"""
+    rules = dict(settings.POINTS_CONFIG)
+    if isinstance(value, dict):
+        for key, points in value.items():
+            key = POINT_RULE_ALIASES.get(key, key)
+            if key in rules and _is_int(points):
+                rules[key] = points
+    return rules
+
+
+def parse_user_levels(value: Any) -> Tuple[UserLevel, ...]:
+    """
+    用户等级：支持 {"等级": {"min_points", "max_points", "daily_downloads"}}
+    和 {"等级": [min_points, max_points]} 两种写法，没有有效等级时使用默认配置
+    """
+    levels = []
+    if isinstance(value, dict):
+        for name, spec in value.items():
+            default_daily = settings.USER_LEVELS.get(name, {}).get("daily_downloads", DEFAULT_DAILY_DOWNLOADS)
+            if isinstance(spec, dict):
+                bounds = (spec.get("min_points"), spec.get("max_points"))
+                daily = spec.get("daily_downloads", default_daily)
+            elif isinstance(spec, (list, tuple)) and len(spec) >= 2:
+                bounds, daily = tuple(spec[:2]), default_daily
+            else:
+                continue
+            if all(_is_int(item) for item in (*bounds, daily)):
+                levels.append(UserLevel(name, bounds[0], bounds[1], daily))
+    if not levels:
+        levels = [
+            UserLevel(name, spec["min_points"], spec["max_points"], spec.get("daily_downloads", DEFAULT_DAILY_DOWNLOADS))
+            for name, spec in settings.USER_LEVELS.items()
+        ]
+    return tuple(sorted(levels, key=lambda level: level.min_points))
+
+
+class RuntimeConfig:
+    """运行时配置快照（创建后不再修改，更新时整体替换）"""
+
+    __slots__ = ("version", "points", "levels", "_thresholds", "_levels_by_name")
+
+    def __init__(self, version: int, points: Dict[str, int], levels: Iterable[UserLevel]):
+        self.version = version
+        self.points = MappingProxyType(dict(points))
+        self.levels = tuple(levels)
+        self._thresholds = [level.min_points for level in self.levels]
+        self._levels_by_name = MappingProxyType({level.name: level for level in self.levels})
+
+    def level_for(self, points: int) -> Optional[str]:
+        """积分对应的等级（二分查找），不在任何等级区间内时返回None"""
+        index = bisect_right(self._thresholds, points) - 1
+        if index < 0:
+            return None
+        level = self.levels[index]
+        if level.max_points != -1 and points > level.max_points:
+            return None
+        return level.name
+
+    def daily_limit(self, level_name: str) -> int:
+        """等级对应的每日下载次数上限，-1表示无限制"""
+        level = self._levels_by_name.get(level_name)
+        return level.daily_downloads if level else DEFAULT_DAILY_DOWNLOADS
+
+
+def default_config() -> RuntimeConfig:
+    return RuntimeConfig(0, parse_point_rules(None), parse_user_levels(None))
+
+
+class ConfigService:
+    """运行时配置服务"""
+
+    def __init__(self):
+        self.snapshot = default_config()
+
+    @property
+    def points(self):
+        """当前积分规则"""
+        return self.snapshot.points
+
+    async def _read_version(self, db: AsyncSession) -> Optional[int]:
+        result = await db.execute(
+            select(SystemConfig.config_value).where(SystemConfig.config_key == VERSION_KEY)
+        )
+        value = parse_config_value(result.scalar())
+        return value if _is_int(value) else None
+
+    async def load(self) -> RuntimeConfig:
+        """从数据库加载配置并替换快照（启动时调用）"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(SystemConfig.config_key, SystemConfig.config_value)
+                .where(SystemConfig.config_key.in_([POINT_RULES_KEY, USER_LEVELS_KEY, VERSION_KEY]))
+            )
+            values = {row.config_key: parse_config_value(row.config_value) for row in result}
+
+            version = values.get(VERSION_KEY)
+            if not _is_int(version):
+                version = 0
+                if VERSION_KEY not in values:
+                    db.add(SystemConfig(
+                        config_key=VERSION_KEY,
+                        config_value="0",
+                        description="配置版本号（修改配置时自动递增，各进程据此刷新配置）"
+                    ))
+                    try:
+                        await db.commit()
+                    except IntegrityError:
+                        await db.rollback()
+
+        self.snapshot = RuntimeConfig(
+            version,
+            parse_point_rules(values.get(POINT_RULES_KEY)),
+            parse_user_levels(values.get(USER_LEVELS_KEY))
+        )
+        return self.snapshot
+
+    async def refresh(self) -> bool:
+        """
+        版本号变化时重新加载配置（定时任务）
+
+        Returns:
+            bool: 是否重新加载了配置
+        """
+        async with AsyncSessionLocal() as db:
+            version = await self._read_version(db)
+        if version is None or version == self.snapshot.version:
+            return False
+        await self.load()
+        logger.info(f"运行时配置已更新到版本 {self.snapshot.version}")
+        return True
+
+    async def bump_version(self, db: AsyncSession) -> None:
+        """递增配置版本号（不提交事务，与配置修改一起提交）"""
+        await db.execute(
+            update(SystemConfig)
+            .where(SystemConfig.config_key == VERSION_KEY)
+            .values(config_value=cast(cast(SystemConfig.config_value, Integer) + 1, Text))
+            .execution_options(synchronize_session=False)
+        )
+
+
+# 全局运行时配置服务实例
+config_service = ConfigService()
@@ -0,0 +1,111 @@
+"""
+资源下载次数缓冲服务
+下载次数先累加在进程内缓冲区，再定期批量写回resources表，避免热门资源行成为写入热点
+"""
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from sqlalchemy import update, bindparam
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.resource import Resource
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadCounterBuffer:
+    """下载次数写缓冲类"""
+
+    def __init__(self, flush_interval: float, flush_threshold: int):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._pending: Dict[int, int] = {}
+        self._pending_events = 0
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def increment(self, resource_id: int, delta: int = 1) -> None:
+        """记录一次下载（不访问数据库）"""
+        self._pending[resource_id] = self._pending.get(resource_id, 0) + delta
+        self._pending_events += delta
+        if self._wakeup is not None and self._pending_events >= self.flush_threshold:
+            self._wakeup.set()
+
+    def pending_delta(self, resource_id: int) -> int:
+        """获取尚未写回数据库的下载次数"""
+        return self._pending.get(resource_id, 0)
+
+    async def flush(self) -> int:
+        """
+        将缓冲区中的下载次数批量写回数据库
+
+        Returns:
+            int: 本次写回的资源数量
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            # 先取走当前缓冲区，写回期间产生的新计数进入新的缓冲区
+            batch, self._pending = self._pending, {}
+            self._pending_events = 0
+
+            table = Resource.__table__
+            stmt = (
+                update(table)
+                .where(table.c.id == bindparam("rid"))
+                .values(download_count=table.c.download_count + bindparam("delta"))
+            )
+            params = [{"rid": rid, "delta": delta} for rid, delta in batch.items()]
+
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(stmt, params)
+                    await db.commit()
+            except Exception as e:
+                # 写回失败时把计数放回缓冲区，下次重试
+                for rid, delta in batch.items():
+                    self._pending[rid] = self._pending.get(rid, 0) + delta
+                    self._pending_events += delta
+                logger.error(f"下载次数写回失败: {e}")
+                return 0
+
+            return len(batch)
+
+    async def _run(self) -> None:
+        """后台循环：到达时间间隔或事件数阈值时写回"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        """启动后台写回任务（在应用启动时调用）"""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台任务并写回剩余计数（在应用关闭时调用）"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+        await self.flush()
+
+
+# 创建全局下载次数缓冲实例
+download_counter = DownloadCounterBuffer(
+    flush_interval=settings.DOWNLOAD_COUNT_FLUSH_INTERVAL,
+    flush_threshold=settings.DOWNLOAD_COUNT_FLUSH_THRESHOLD
+)
@@ -0,0 +1,109 @@
+"""
+已购资源权益服务
+按用户缓存已购买的资源ID集合，懒加载自downloads表，购买时增量更新；
+购买只在处理请求的进程内更新缓存，因此缓存未命中的资源需再查一次数据库确认
+"""
+from collections import OrderedDict
+from typing import Iterable, Set
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models.resource import Download
+
+try:
+    from pyroaring import BitMap
+except ImportError:
+    BitMap = None
+
+
+def _new_entitlement_set(resource_ids: Iterable[int] = ()):
+    """创建资源ID集合（安装了pyroaring时使用压缩位图）"""
+    if BitMap is not None:
+        return BitMap(resource_ids)
+    return set(resource_ids)
+
+
+class EntitlementService:
+    """已购资源权益服务类"""
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self._cache: "OrderedDict[int, object]" = OrderedDict()
+
+    async def _get_set(self, db: AsyncSession, user_id: int):
+        """获取用户的已购集合，未缓存时从数据库加载"""
+        entitlements = self._cache.get(user_id)
+        if entitlements is not None:
+            self._cache.move_to_end(user_id)
+            return entitlements
+
+        result = await db.execute(
+            select(Download.resource_id).where(Download.user_id == user_id)
+        )
+        entitlements = _new_entitlement_set(result.scalars().all())
+
+        self._cache[user_id] = entitlements
+        if len(self._cache) > self.max_users:
+            self._cache.popitem(last=False)
+        return entitlements
+
+    async def has_purchased(self, db: AsyncSession, user_id: int, resource_id: int) -> bool:
+        """
+        判断用户是否已购买资源
+
+        命中缓存直接返回；未命中时再查一次数据库确认，
+        避免其他进程刚完成的购买被误判为未购买而重复扣分
+        """
+        entitlements = await self._get_set(db, user_id)
+        if resource_id in entitlements:
+            return True
+
+        result = await db.execute(
+            select(Download.id).where(
+                Download.user_id == user_id,
+                Download.resource_id == resource_id
+            ).limit(1)
+        )
+        if result.scalar_one_or_none() is None:
+            return False
+
+        entitlements.add(resource_id)
+        return True
+
+    async def purchased_among(self, db: AsyncSession, user_id: int, resource_ids: Iterable[int]) -> Set[int]:
+        """
+        批量判断：返回给定资源中用户已购买的部分（用于列表标记）
+
+        缓存未命中的资源用一次 IN 查询确认，其他进程（节点）完成的购买也能及时标记
+        """
+        entitlements = await self._get_set(db, user_id)
+        resource_ids = list(resource_ids)
+        purchased = {resource_id for resource_id in resource_ids if resource_id in entitlements}
+        misses = [resource_id for resource_id in resource_ids if resource_id not in purchased]
+        if misses:
+            result = await db.execute(
+                select(Download.resource_id).where(
+                    Download.user_id == user_id,
+                    Download.resource_id.in_(misses)
+                )
+            )
+            for resource_id in result.scalars().all():
+                entitlements.add(resource_id)
+                purchased.add(resource_id)
+        return purchased
+
+    def grant(self, user_id: int, resource_id: int) -> None:
+        """购买成功后更新缓存（未加载的用户下次访问时会从数据库加载）"""
+        entitlements = self._cache.get(user_id)
+        if entitlements is not None:
+            entitlements.add(resource_id)
+
+    def invalidate(self, user_id: int) -> None:
+        """丢弃用户的缓存"""
+        self._cache.pop(user_id, None)
+
+
+# 创建全局权益服务实例
+entitlement_service = EntitlementService(max_users=settings.ENTITLEMENT_CACHE_USERS)
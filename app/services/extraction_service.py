@@ -0,0 +1,248 @@
+"""
+资源文本提取服务
+上传后在后台进程池中提取文档正文，写入resource_texts表供搜索使用
+"""
+import logging
+import re
+import unicodedata
+import zipfile
+from typing import Dict, List, Optional, Tuple
+from xml.etree.ElementTree import iterparse, ParseError
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func, case, table, column, text
+from sqlalchemy.sql import Select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.schema_upgrade import RESOURCE_TEXT_FTS
+from app.models.resource import ResourceText
+from app.services.worker_pool import run_in_process
+
+logger = logging.getLogger(__name__)
+
+# 单个XML部件最多读取的字节数（防止压缩炸弹）
+MAX_MEMBER_BYTES = 20 * 1024 * 1024
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_SLIDE_RE = re.compile(r"^ppt/slides/slide(\d+)\.xml$")
+
+
+class _TextLimitReached(Exception):
+    """提取的文本已达到上限"""
+
+
+class _TextCollector:
+    """文本收集器，超出字符上限时中止解析"""
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.parts: List[str] = []
+        self.length = 0
+        self.truncated = False
+
+    def add(self, text: str) -> None:
+        if not text:
+            return
+        remaining = self.max_chars - self.length
+        if len(text) >= remaining:
+            self.parts.append(text[:remaining])
+            self.length = self.max_chars
+            self.truncated = True
+            raise _TextLimitReached()
+        self.parts.append(text)
+        self.length += len(text)
+
+    def text(self) -> str:
+        return normalize_text(" ".join(self.parts))
+
+
+class _LimitedReader:
+    """限制读取字节数的文件包装"""
+
+    def __init__(self, fileobj, limit: int):
+        self._fileobj = fileobj
+        self._remaining = limit
+
+    def read(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b""
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._fileobj.read(size)
+        self._remaining -= len(data)
+        return data
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本：全角转半角、合并空白"""
+    text = unicodedata.normalize("NFKC", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def _collect_xml_text(archive: zipfile.ZipFile, member: str, collector: _TextCollector,
+                      text_tag: str = "t", break_tag: str = "p") -> None:
+    """流式解析XML部件，收集文本节点（逐个元素处理后立即释放）"""
+    with archive.open(member) as raw:
+        reader = _LimitedReader(raw, MAX_MEMBER_BYTES)
+        try:
+            for _, element in iterparse(reader, events=("end",)):
+                tag = element.tag.rsplit("}", 1)[-1]
+                if tag == text_tag:
+                    collector.add(element.text or "")
+                elif tag == break_tag:
+                    collector.add(" ")
+                element.clear()
+        except ParseError:
+            # 超出读取上限或文件损坏时保留已解析的部分
+            pass
+
+
+def _ooxml_members(archive: zipfile.ZipFile, file_type: str) -> List[str]:
+    """获取OOXML文件中包含正文的部件"""
+    names = set(archive.namelist())
+    if file_type == "docx":
+        return [name for name in ("word/document.xml",) if name in names]
+    if file_type == "pptx":
+        slides = [(int(m.group(1)), name) for name in names if (m := _SLIDE_RE.match(name))]
+        return [name for _, name in sorted(slides)]
+    if file_type == "xlsx":
+        return [name for name in ("xl/sharedStrings.xml",) if name in names]
+    return []
+
+
+def extract_text(file_path: str, file_type: str, max_chars: int, max_pages: int) -> Tuple[str, str, bool]:
+    """
+    提取文件正文（在子进程中执行）
+
+    Returns:
+        Tuple[str, str, bool]: (状态, 文本, 是否截断)
+    """
+    collector = _TextCollector(max_chars)
+
+    if file_type in ("docx", "pptx", "xlsx"):
+        with zipfile.ZipFile(file_path) as archive:
+            try:
+                for member in _ooxml_members(archive, file_type):
+                    _collect_xml_text(archive, member, collector)
+            except _TextLimitReached:
+                pass
+    elif file_type == "pdf":
+        try:
+            import fitz  # PyMuPDF（requirements.txt 已声明，未安装时PDF不处理）
+        except ImportError:
+            return "unsupported", "", False
+
+        with fitz.open(file_path) as document:
+            try:
+                for page_index in range(min(document.page_count, max_pages)):
+                    collector.add(document.load_page(page_index).get_text())
+                    collector.add(" ")
+            except _TextLimitReached:
+                pass
+    else:
+        return "unsupported", "", False
+
+    text = collector.text()
+    return ("ready" if text else "empty"), text, collector.truncated
+
+
+async def extract_resource_text(resource_id: int, file_path: str, file_type: str) -> str:
+    """
+    提取资源正文并保存（作为后台任务调用）
+
+    Args:
+        resource_id: 资源ID
+        file_path: 资源文件的本地路径
+        file_type: 文件扩展名
+
+    Returns:
+        str: 提取状态
+    """
+    try:
+        extract_status, text, truncated = await run_in_process(
+            extract_text, file_path, file_type,
+            settings.TEXT_EXTRACT_MAX_CHARS, settings.TEXT_EXTRACT_MAX_PAGES
+        )
+    except Exception as e:
+        logger.warning(f"资源 {resource_id} 文本提取失败: {e}")
+        extract_status, text, truncated = "failed", "", False
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(ResourceText).where(ResourceText.resource_id == resource_id))
+        db.add(ResourceText(
+            resource_id=resource_id,
+            content=text,
+            status=extract_status,
+            char_count=len(text),
+            truncated=truncated
+        ))
+        await db.commit()
+
+    return extract_status
+
+
+# 三元组索引只能加速至少3个字符的关键词，更短的关键词不检索正文
+FULLTEXT_MIN_CHARS = 3
+
+
+def text_match_ids(db: AsyncSession, keyword: str) -> Optional[Select]:
+    """
+    正文包含关键词的资源ID子查询（走全文索引，不逐行扫描正文）
+
+    SQLite 查询 FTS5 三元组表，PostgreSQL 的 ILIKE 由 pg_trgm GIN 索引支持；
+    关键词少于 FULLTEXT_MIN_CHARS 个字符时返回None
+    """
+    keyword = normalize_text(keyword)
+    if len(keyword) < FULLTEXT_MIN_CHARS:
+        return None
+
+    if db.bind.dialect.name == "postgresql":
+        return select(ResourceText.resource_id).where(ResourceText.content.ilike(f"%{keyword}%"))
+
+    fts = table(RESOURCE_TEXT_FTS, column("rowid"))
+    phrase = '"' + keyword.replace('"', '""') + '"'
+    return select(fts.c.rowid).where(
+        text(f"{RESOURCE_TEXT_FTS} MATCH :fts_phrase").bindparams(fts_phrase=phrase)
+    )
+
+
+async def get_text_snippets(
+    db: AsyncSession,
+    resource_ids: List[int],
+    keyword: str,
+    width: int = 60
+) -> Dict[int, str]:
+    """
+    获取关键词在资源正文中的上下文片段（在数据库中截取，不加载全文）
+
+    Args:
+        db: 数据库会话
+        resource_ids: 资源ID列表
+        keyword: 搜索关键词
+        width: 关键词前后保留的字符数
+
+    Returns:
+        Dict[int, str]: 资源ID到片段的映射
+    """
+    keyword = normalize_text(keyword).lower()
+    if not resource_ids or not keyword:
+        return {}
+
+    content = func.lower(ResourceText.content)
+    if db.bind.dialect.name == "postgresql":
+        position = func.strpos(content, keyword)
+    else:
+        position = func.instr(content, keyword)
+    start = case((position > width, position - width), else_=1)
+
+    result = await db.execute(
+        select(
+            ResourceText.resource_id,
+            func.substr(ResourceText.content, start, len(keyword) + 2 * width)
+        ).where(
+            ResourceText.resource_id.in_(resource_ids),
+            position > 0
+        )
+    )
+    return {resource_id: snippet for resource_id, snippet in result.all()}
@@ -0,0 +1,105 @@
+"""
+资源收藏服务
+收藏记录与资源的收藏数在同一事务内增量维护，列表页按页批量查询收藏状态
+"""
+from typing import Iterable, Set
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.resource import Resource, Favorite
+
+
+async def _get_favorite_count(db: AsyncSession, resource_id: int) -> int:
+    result = await db.execute(
+        select(Resource.favorite_count).where(Resource.id == resource_id)
+    )
+    return result.scalar() or 0
+
+
+async def add_favorite(db: AsyncSession, user_id: int, resource_id: int) -> dict:
+    """
+    收藏资源（重复收藏不报错，也不重复计数）
+
+    Returns:
+        dict: 是否新增收藏和资源当前的收藏数
+    """
+    result = await db.execute(
+        select(Resource.id).where(
+            Resource.id == resource_id,
+            Resource.is_active == True
+        )
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="资源不存在"
+        )
+
+    created = False
+    try:
+        db.add(Favorite(user_id=user_id, resource_id=resource_id))
+        await db.flush()
+        # 收藏数与收藏记录同一事务提交
+        await db.execute(
+            update(Resource)
+            .where(Resource.id == resource_id)
+            .values(favorite_count=Resource.favorite_count + 1)
+        )
+        await db.commit()
+        created = True
+    except IntegrityError:
+        # 唯一约束冲突：已经收藏过（包括并发的重复请求）
+        await db.rollback()
+
+    return {
+        "is_favorited": True,
+        "created": created,
+        "favorite_count": await _get_favorite_count(db, resource_id)
+    }
+
+
+async def remove_favorite(db: AsyncSession, user_id: int, resource_id: int) -> dict:
+    """
+    取消收藏（未收藏时不报错）
+
+    Returns:
+        dict: 是否删除了收藏和资源当前的收藏数
+    """
+    result = await db.execute(
+        delete(Favorite).where(
+            Favorite.user_id == user_id,
+            Favorite.resource_id == resource_id
+        )
+    )
+    removed = result.rowcount == 1
+    if removed:
+        await db.execute(
+            update(Resource)
+            .where(Resource.id == resource_id, Resource.favorite_count > 0)
+            .values(favorite_count=Resource.favorite_count - 1)
+        )
+    await db.commit()
+
+    return {
+        "is_favorited": False,
+        "removed": removed,
+        "favorite_count": await _get_favorite_count(db, resource_id)
+    }
+
+
+async def favorited_among(db: AsyncSession, user_id: int, resource_ids: Iterable[int]) -> Set[int]:
+    """批量判断：返回给定资源中用户已收藏的部分（一页一次查询）"""
+    resource_ids = list(resource_ids)
+    if not resource_ids:
+        return set()
+
+    result = await db.execute(
+        select(Favorite.resource_id).where(
+            Favorite.user_id == user_id,
+            Favorite.resource_id.in_(resource_ids)
+        )
+    )
+    return set(result.scalars().all())
@@ -1,35 +1,50 @@
 """
 文件处理服务
 """
+import hashlib
+import io
+import logging
 import os
-import uuid
+import zipfile
+from datetime import datetime
 try:
     import magic
 except ImportError:
     magic = None
-from typing import Tuple
+from typing import Tuple, List, AsyncIterator
 from fastapi import HTTPException, status, UploadFile
 
 from app.core.config import settings
+from app.services.storage_service import storage, build_storage_key, CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+# 打包下载时文件缺失清单的文件名
+MISSING_FILES_NAME = "缺失文件.txt"
 
 
 def validate_file(file: UploadFile) -> None:
     """验证上传文件"""
+    validate_file_meta(file.filename, file.size)
+
+
+def validate_file_meta(filename: str, file_size: int) -> None:
+    """根据文件名和大小验证上传文件"""
     # 检查文件大小
-    if file.size > settings.MAX_FILE_SIZE:
+    if file_size > settings.MAX_FILE_SIZE:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
             detail=f"文件大小超过限制（{settings.MAX_FILE_SIZE // 1024 // 1024}MB）"
         )
     
     # 检查文件扩展名
-    if not file.filename:
+    if not filename:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="文件名不能为空"
         )
     
-    file_ext = file.filename.split('.')[-1].lower()
+    file_ext = filename.split('.')[-1].lower()
     if file_ext not in settings.ALLOWED_FILE_TYPES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -37,30 +52,33 @@ def validate_file(file: UploadFile) -> None:
         )
 
 
+async def _iter_upload_file(file: UploadFile) -> AsyncIterator[bytes]:
+    """分块读取上传文件"""
+    while True:
+        data = await file.read(CHUNK_SIZE)
+        if not data:
+            break
+        yield data
+
+
 async def save_uploaded_file(file: UploadFile, subfolder: str) -> Tuple[str, str]:
-    """保存上传的文件"""
-    # 生成唯一文件名
+    """保存上传的文件到存储后端，返回 (存储键, 文件名)"""
+    # 生成唯一存储键
     file_ext = file.filename.split('.')[-1].lower()
-    unique_filename = f"{uuid.uuid4().hex}.{file_ext}"
-    
-    # 创建保存路径
-    save_dir = os.path.join(settings.UPLOAD_DIR, subfolder)
-    os.makedirs(save_dir, exist_ok=True)
-    
-    file_path = os.path.join(save_dir, unique_filename)
+    storage_key = build_storage_key(subfolder, file_ext)
     
     try:
-        # 保存文件
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # 分块写入，不把整个文件读入内存
+        await storage.put(storage_key, _iter_upload_file(file), file.content_type)
         
-        return file_path, unique_filename
+        return storage_key, os.path.basename(storage_key)
         
     except Exception as e:
-        # 如果保存失败，删除可能创建的文件
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        # 如果保存失败，删除可能写入的对象
+        try:
+            await storage.delete(storage_key)
+        except Exception:
+            pass
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="文件保存失败"
@@ -76,24 +94,41 @@ def get_file_mime_type(file_path: str) -> str:
         except:
             pass
     # 根据扩展名返回默认类型
-        ext = file_path.split('.')[-1].lower()
-        mime_types = {
-            'pdf': 'application/pdf',
-            'doc': 'application/msword',
-            'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            'ppt': 'application/vnd.ms-powerpoint',
-            'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
-            'xls': 'application/vnd.ms-excel',
-            'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            'jpg': 'image/jpeg',
-            'jpeg': 'image/jpeg',
-            'png': 'image/png'
-        }
-        return mime_types.get(ext, 'application/octet-stream')
+    ext = file_path.split('.')[-1].lower()
+    mime_types = {
+        'pdf': 'application/pdf',
+        'doc': 'application/msword',
+        'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        'ppt': 'application/vnd.ms-powerpoint',
+        'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+        'xls': 'application/vnd.ms-excel',
+        'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'jpg': 'image/jpeg',
+        'jpeg': 'image/jpeg',
+        'png': 'image/png'
+    }
+    return mime_types.get(ext, 'application/octet-stream')
+
+
+def inspect_file(file_path: str, chunk_size: int = 1024 * 1024) -> Tuple[str, str]:
+    """
+    计算文件SHA-256并识别MIME类型（在子进程中执行）
+    
+    Returns:
+        Tuple[str, str]: (SHA-256十六进制摘要, MIME类型)
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as source:
+        while True:
+            data = source.read(chunk_size)
+            if not data:
+                break
+            digest.update(data)
+    return digest.hexdigest(), get_file_mime_type(file_path)
 
 
 def delete_file(file_path: str) -> bool:
-    """删除文件"""
+    """删除本地文件（临时文件等）"""
     try:
         if os.path.exists(file_path):
             os.remove(file_path)
@@ -101,3 +136,71 @@ def delete_file(file_path: str) -> bool:
         return False
     except:
         return False
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """ZIP流式输出缓冲（不可seek，zipfile会改用数据描述符写入）"""
+    
+    def __init__(self):
+        self._chunks = []
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def drain(self) -> bytes:
+        chunks, self._chunks = self._chunks, []
+        return b"".join(chunks)
+
+
+async def iter_zip_stream(entries: List[Tuple[str, str]], chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    边读文件边生成ZIP数据流
+    
+    文件以存储方式（不再压缩）写入，内存中最多只保留一个数据块；
+    调用方已在结算前确认文件存在，打包过程中文件被删除时在压缩包末尾写入缺失清单
+    
+    Args:
+        entries: (存储键, 压缩包内文件名) 列表
+        chunk_size: 每次读取的字节数
+    """
+    buffer = _ZipStreamBuffer()
+    missing = []
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        for storage_key, arcname in entries:
+            stored = await storage.stat(storage_key)
+            if stored is None:
+                logger.warning(f"打包下载时文件缺失: {storage_key}")
+                missing.append(arcname)
+                continue
+            
+            info = zipfile.ZipInfo(arcname, date_time=datetime.now().timetuple()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            info.file_size = stored.size
+            with archive.open(info, mode="w", force_zip64=True) as target:
+                async for data in storage.get(storage_key, chunk_size):
+                    target.write(data)
+                    yield buffer.drain()
+            yield buffer.drain()
+        
+        if missing:
+            archive.writestr(MISSING_FILES_NAME, "以下文件缺失，请联系管理员：\n" + "\n".join(missing) + "\n")
+            yield buffer.drain()
+    
+    # 写出中央目录
+    yield buffer.drain()
+
+
+def build_archive_name(title: str, file_type: str, used_names: set) -> str:
+    """生成压缩包内不重复的文件名"""
+    base = title.replace("/", "_").replace("\\", "_").strip() or "资源"
+    name = f"{base}.{file_type}"
+    index = 2
+    while name in used_names:
+        name = f"{base}({index}).{file_type}"
+        index += 1
+    used_names.add(name)
+    return name
@@ -0,0 +1,309 @@
+"""
+存储垃圾回收服务
+清理软删除资源的文件（超过保留期后）、冷热层切换后超过宽限期的旧副本、
+没有资源记录引用的孤立文件和残留的临时文件
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import select, update, func, and_
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.resource import Resource
+from app.models.upload import UploadSession
+from app.services.preview_service import get_thumbnail_key
+from app.services.storage_service import StorageBackend, LocalStorage, StoredObject, storage
+from app.services.tiering_service import archive_storage, copy_from_archive
+
+logger = logging.getLogger(__name__)
+
+# 最近一次回收报告（供管理接口查询）
+last_report: Optional[dict] = None
+_running = False
+
+
+class _IOThrottle:
+    """删除限速，避免与在线下载争抢磁盘/存储的IO"""
+
+    def __init__(self, ops_per_second: float):
+        self.interval = 1.0 / ops_per_second if ops_per_second > 0 else 0.0
+        self._next = time.monotonic()
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._next > now:
+            await asyncio.sleep(self._next - now)
+        self._next = max(self._next, now) + self.interval
+
+
+def _stem(key: str) -> str:
+    """存储键去掉扩展名（资源文件、缩略图、未写完的 .part 文件共用同一前缀）"""
+    directory, _, name = key.rpartition("/")
+    return f"{directory}/{name.split('.', 1)[0]}" if directory else name.split(".", 1)[0]
+
+
+def _reference_prefixes(backend: StorageBackend) -> List[str]:
+    """数据库中存储键可能的前缀（本地存储的旧数据保存的是带上传目录的完整路径）"""
+    prefixes = [""]
+    if isinstance(backend, LocalStorage):
+        legacy_prefix = os.path.normpath(backend.root) + os.sep
+        if legacy_prefix not in prefixes:
+            prefixes.append(legacy_prefix)
+    return prefixes
+
+
+def _new_stats() -> Dict[str, int]:
+    return {"files": 0, "bytes": 0}
+
+
+async def _delete(backend: StorageBackend, stored: StoredObject, stats: Dict[str, int],
+                  throttle: _IOThrottle, dry_run: bool) -> None:
+    if not dry_run:
+        await throttle.wait()
+        if not await backend.delete(stored.key):
+            return
+    stats["files"] += 1
+    stats["bytes"] += stored.size
+
+
+async def _purge_soft_deleted(report: dict, throttle: _IOThrottle, dry_run: bool) -> None:
+    """清理超过保留期的软删除资源的文件（资源记录保留，下载历史仍可查询）"""
+    stats = report["soft_deleted"]
+    cutoff = datetime.utcnow() - timedelta(days=settings.GC_SOFT_DELETE_GRACE_DAYS)
+    last_id = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Resource.id, Resource.file_path, Resource.archive_key)
+                .where(and_(
+                    Resource.id > last_id,
+                    Resource.is_active == False,
+                    Resource.storage_tier != "purged",
+                    func.coalesce(Resource.deleted_at, Resource.updated_at) < cutoff
+                ))
+                .order_by(Resource.id)
+                .limit(settings.GC_BATCH_SIZE)
+            )
+            rows = result.all()
+        if not rows:
+            break
+
+        for row in rows:
+            for backend, key in (
+                (storage, row.file_path),
+                (storage, get_thumbnail_key(row.file_path)),
+                (archive_storage, row.archive_key),
+            ):
+                if not key:
+                    continue
+                stored = await backend.stat(key)
+                if stored is not None:
+                    await _delete(backend, stored, stats, throttle, dry_run)
+
+            if not dry_run:
+                # 条件更新：清理期间被管理员恢复的资源不会标记为已清理
+                async with AsyncSessionLocal() as db:
+                    await db.execute(
+                        update(Resource)
+                        .where(Resource.id == row.id, Resource.is_active == False)
+                        .values(storage_tier="purged", archive_key=None)
+                    )
+                    await db.commit()
+            stats["resources"] += 1
+        last_id = rows[-1].id
+
+
+async def _release_tier_copies(stats: Dict[str, int], throttle: _IOThrottle, dry_run: bool) -> None:
+    """
+    清理冷热层切换后超过宽限期的旧副本（归档后的热存储文件、恢复后的归档文件）
+
+    先用条件更新认领（期间再次切换的资源跳过），删除后复查：删除期间资源又切换到了刚删除的那一层时，
+    用另一层仍保留的副本补回
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=settings.COLD_TIER_GRACE_HOURS)
+    last_id = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(
+                    Resource.id, Resource.file_path, Resource.archive_key,
+                    Resource.storage_tier, Resource.tier_changed_at
+                )
+                .where(and_(
+                    Resource.id > last_id,
+                    Resource.is_active == True,
+                    Resource.storage_tier.in_(("hot", "cold")),
+                    Resource.tier_changed_at < cutoff
+                ))
+                .order_by(Resource.id)
+                .limit(settings.GC_BATCH_SIZE)
+            )
+            rows = result.all()
+        if not rows:
+            break
+
+        for row in rows:
+            if row.storage_tier == "cold":
+                backend, key = storage, row.file_path
+            else:
+                backend, key = archive_storage, row.archive_key
+            stored = await backend.stat(key) if key else None
+            if dry_run:
+                if stored is not None:
+                    await _delete(backend, stored, stats, throttle, dry_run)
+                continue
+
+            async with AsyncSessionLocal() as db:
+                claimed = await db.execute(
+                    update(Resource)
+                    .where(
+                        Resource.id == row.id,
+                        Resource.storage_tier == row.storage_tier,
+                        Resource.tier_changed_at == row.tier_changed_at
+                    )
+                    .values(
+                        tier_changed_at=None,
+                        archive_key=row.archive_key if row.storage_tier == "cold" else None
+                    )
+                )
+                await db.commit()
+            if claimed.rowcount != 1 or stored is None:
+                continue
+            await _delete(backend, stored, stats, throttle, dry_run)
+
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(Resource.storage_tier, Resource.archive_key).where(Resource.id == row.id)
+                )
+                current = result.one()
+                if row.storage_tier == "cold" and current.storage_tier == "hot" and current.archive_key:
+                    # 删除期间被恢复：归档副本仍在，重新写回热存储
+                    logger.warning(f"资源 {row.id} 清理热存储副本时被恢复，重新写回")
+                    await copy_from_archive(row.file_path, current.archive_key)
+                elif row.storage_tier == "hot" and current.storage_tier == "cold" and current.archive_key == key:
+                    # 删除期间被重新归档到同一存储键：热存储副本仍在，退回热存储
+                    logger.warning(f"资源 {row.id} 清理归档副本时被重新归档，退回热存储")
+                    await db.execute(
+                        update(Resource)
+                        .where(Resource.id == row.id, Resource.storage_tier == "cold")
+                        .values(storage_tier="hot", archive_key=None, tier_changed_at=None)
+                    )
+                    await db.commit()
+        last_id = rows[-1].id
+
+
+async def _referenced_stems(column, backend: StorageBackend, batch: List[StoredObject]) -> Set[str]:
+    """查询一批存储对象中仍被资源记录引用的部分（按存储键范围查询，一批一次）"""
+    low = _stem(batch[0].key)
+    high = _stem(batch[-1].key) + "/"
+    stems = set()
+    async with AsyncSessionLocal() as db:
+        for prefix in _reference_prefixes(backend):
+            result = await db.execute(
+                select(column).where(column >= prefix + low, column <= prefix + high)
+            )
+            for value in result.scalars().all():
+                stems.add(_stem(value[len(prefix):]))
+    return stems
+
+
+async def _sweep_orphans(backend: StorageBackend, prefix: str, column, stats: Dict[str, int],
+                         throttle: _IOThrottle, dry_run: bool) -> None:
+    """分批比对存储中的文件与资源记录，删除无人引用且超过最短保留时间的文件"""
+    min_mtime = datetime.utcnow() - timedelta(hours=settings.GC_ORPHAN_MIN_AGE_HOURS)
+
+    async def sweep(batch: List[StoredObject]) -> None:
+        referenced = await _referenced_stems(column, backend, batch)
+        for stored in batch:
+            # 刚写入的文件可能属于尚未提交的上传，暂不处理
+            if stored.modified_at and stored.modified_at > min_mtime:
+                continue
+            if _stem(stored.key) not in referenced:
+                await _delete(backend, stored, stats, throttle, dry_run)
+
+    batch: List[StoredObject] = []
+    async for stored in backend.list(prefix):
+        batch.append(stored)
+        if len(batch) >= settings.GC_BATCH_SIZE:
+            await sweep(batch)
+            batch = []
+    if batch:
+        await sweep(batch)
+
+
+async def _sweep_temp_files(stats: Dict[str, int], throttle: _IOThrottle, dry_run: bool) -> None:
+    """清理进程异常退出后残留的本地临时文件（上传中会话的临时文件除外）"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(UploadSession.temp_path))
+        active = {os.path.normpath(path) for path in result.scalars().all()}
+
+    temp_storage = LocalStorage(settings.UPLOAD_DIR)
+    min_mtime = datetime.utcnow() - timedelta(hours=settings.GC_ORPHAN_MIN_AGE_HOURS)
+    async for stored in temp_storage.list("tmp"):
+        if stored.modified_at and stored.modified_at > min_mtime:
+            continue
+        if os.path.normpath(temp_storage.path(stored.key)) in active:
+            continue
+        await _delete(temp_storage, stored, stats, throttle, dry_run)
+
+
+async def collect_garbage(dry_run: bool = False) -> dict:
+    """
+    执行一次存储垃圾回收（定时任务）
+
+    Args:
+        dry_run: 只统计可回收的文件，不实际删除
+
+    Returns:
+        dict: 回收报告（各类文件的数量和字节数）
+    """
+    global last_report, _running
+    if _running:
+        logger.info("存储垃圾回收正在执行，跳过本次")
+        return last_report or {}
+
+    _running = True
+    throttle = _IOThrottle(settings.GC_MAX_DELETES_PER_SECOND)
+    report = {
+        "dry_run": dry_run,
+        "started_at": datetime.utcnow(),
+        "finished_at": None,
+        "soft_deleted": {"resources": 0, **_new_stats()},
+        "tier_copies": _new_stats(),
+        "orphans": _new_stats(),
+        "archive_orphans": _new_stats(),
+        "temp_files": _new_stats(),
+        "reclaimed_bytes": 0,
+    }
+    try:
+        await _purge_soft_deleted(report, throttle, dry_run)
+        await _release_tier_copies(report["tier_copies"], throttle, dry_run)
+        await _sweep_orphans(storage, "resources/", Resource.file_path, report["orphans"], throttle, dry_run)
+        await _sweep_orphans(archive_storage, "cold/resources/", Resource.archive_key,
+                             report["archive_orphans"], throttle, dry_run)
+        await _sweep_temp_files(report["temp_files"], throttle, dry_run)
+    finally:
+        _running = False
+        report["finished_at"] = datetime.utcnow()
+        report["reclaimed_bytes"] = sum(
+            report[name]["bytes"]
+            for name in ("soft_deleted", "tier_copies", "orphans", "archive_orphans", "temp_files")
+        )
+        last_report = report
+
+    logger.info(
+        f"存储垃圾回收{'（试运行）' if dry_run else ''}完成: "
+        f"软删除资源 {report['soft_deleted']['resources']} 个，"
+        f"冷热层旧副本 {report['tier_copies']['files']} 个，"
+        f"孤立文件 {report['orphans']['files'] + report['archive_orphans']['files']} 个，"
+        f"临时文件 {report['temp_files']['files']} 个，"
+        f"共回收 {report['reclaimed_bytes']} 字节"
+    )
+    return report
@@ -1,14 +1,19 @@
 """
 年级管理服务
 """
+import json
 from datetime import datetime, date
-from typing import Optional
+from typing import Callable, Dict, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, case, func, or_
 
 from app.models.user import User
+from app.models.report import SystemConfig
 from app.core.config import settings
 
+# 批量升级进度在 system_configs 中的键
+GRADE_UPGRADE_PROGRESS_KEY = "grade_upgrade_progress"
+
 
 class GradeService:
     """年级管理服务类"""
@@ -97,44 +102,121 @@ class GradeService:
         return True
     
     @classmethod
-    async def upgrade_all_users_grade(cls, db: AsyncSession, force: bool = False) -> int:
+    def _upgradable_grades(cls) -> list:
+        """升级后会变化的年级（高三等不变的年级不参与批量升级）"""
+        return [grade for grade, next_grade in cls.GRADE_UPGRADE_MAP.items() if next_grade != grade]
+    
+    @classmethod
+    def _pending_conditions(cls, current_year: int) -> list:
+        """今年还需要升级的用户条件（从未升级过的用户 last_grade_upgrade_year 为NULL）"""
+        return [
+            User.is_active == True,
+            User.child_grade.in_(cls._upgradable_grades()),
+            or_(User.last_grade_upgrade_year.is_(None), User.last_grade_upgrade_year != current_year)
+        ]
+    
+    @classmethod
+    async def _load_checkpoint(cls, db: AsyncSession, current_year: int) -> int:
+        """读取今年批量升级已处理到的用户ID（中断后从这里继续）"""
+        result = await db.execute(
+            select(SystemConfig.config_value).where(SystemConfig.config_key == GRADE_UPGRADE_PROGRESS_KEY)
+        )
+        value = result.scalar()
+        if not value:
+            return 0
+        try:
+            progress = json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return 0
+        return progress.get("last_id", 0) if progress.get("year") == current_year else 0
+    
+    @classmethod
+    async def _save_checkpoint(cls, db: AsyncSession, current_year: int, last_id: int, upgraded: int) -> None:
+        """保存升级进度（与本批升级在同一事务中提交）"""
+        value = json.dumps({"year": current_year, "last_id": last_id, "upgraded": upgraded})
+        result = await db.execute(
+            update(SystemConfig)
+            .where(SystemConfig.config_key == GRADE_UPGRADE_PROGRESS_KEY)
+            .values(config_value=value)
+        )
+        if result.rowcount == 0:
+            db.add(SystemConfig(
+                config_key=GRADE_UPGRADE_PROGRESS_KEY,
+                config_value=value,
+                description="年级批量升级进度（中断后从该用户ID继续）"
+            ))
+    
+    @classmethod
+    async def count_pending_upgrades(cls, db: AsyncSession) -> Dict[str, int]:
+        """
+        统计今年待升级的用户数（按当前年级分组，不修改数据；与批量升级一样从上次进度之后开始统计）
+
+        Returns:
+            Dict[str, int]: {当前年级: 用户数}
+        """
+        current_year = datetime.now().year
+        last_id = await cls._load_checkpoint(db, current_year)
+        result = await db.execute(
+            select(User.child_grade, func.count())
+            .where(User.id > last_id, *cls._pending_conditions(current_year))
+            .group_by(User.child_grade)
+        )
+        return {grade: count for grade, count in result.all()}
+    
+    @classmethod
+    async def upgrade_all_users_grade(
+        cls,
+        db: AsyncSession,
+        force: bool = False,
+        dry_run: bool = False,
+        batch_size: Optional[int] = None,
+        progress: Optional[Callable[[int, int, int], None]] = None
+    ) -> int:
         """
         批量升级所有用户的年级
 
+        按用户ID分段执行 UPDATE ... SET child_grade = CASE ... END，每段一个短事务，
+        不会长时间锁表；每段提交时记录进度，中断后重跑从上次的位置继续（已升级的用户也不会重复升级）
+
         Args:
             db: 数据库会话
             force: 是否强制升级（忽略时间限制）
+            dry_run: 只统计待升级的用户数，不修改数据
+            batch_size: 每段的用户ID跨度（默认 GRADE_UPGRADE_BATCH_SIZE）
+            progress: 进度回调 (已处理到的用户ID, 最大用户ID, 已升级数)
 
         Returns:
-            int: 升级的用户数量
+            int: 升级（或试运行时待升级）的用户数量
         """
         if not force and not cls.should_upgrade_grade():
             return 0
         
-        current_year = datetime.now().year
+        if dry_run:
+            return sum((await cls.count_pending_upgrades(db)).values())
         
-        # 查询需要升级的用户（今年还没有升级过的）
-        result = await db.execute(
-            select(User).where(
-                User.is_active == True,
-                User.last_grade_upgrade_year != current_year
-            )
-        )
-        users = result.scalars().all()
+        current_year = datetime.now().year
+        batch_size = batch_size or settings.GRADE_UPGRADE_BATCH_SIZE
+        next_grade = case(cls.GRADE_UPGRADE_MAP, value=User.child_grade, else_=User.child_grade)
         
+        max_id = (await db.execute(select(func.max(User.id)))).scalar() or 0
+        last_id = await cls._load_checkpoint(db, current_year)
         upgraded_count = 0
         
-        for user in users:
-            next_grade = cls.get_next_grade(user.child_grade)
-            
-            # 如果年级有变化，则升级
-            if next_grade != user.child_grade:
-                user.child_grade = next_grade
-                user.last_grade_upgrade_year = current_year
-                upgraded_count += 1
-        
-        if upgraded_count > 0:
+        while last_id < max_id:
+            upper_id = min(last_id + batch_size, max_id)
+            result = await db.execute(
+                update(User)
+                .where(User.id > last_id, User.id <= upper_id, *cls._pending_conditions(current_year))
+                .values(child_grade=next_grade, last_grade_upgrade_year=current_year)
+                .execution_options(synchronize_session=False)
+            )
+            upgraded_count += result.rowcount
+            await cls._save_checkpoint(db, current_year, upper_id, upgraded_count)
             await db.commit()
+            
+            last_id = upper_id
+            if progress is not None:
+                progress(last_id, max_id, upgraded_count)
         
         return upgraded_count
     
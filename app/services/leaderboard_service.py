@@ -0,0 +1,497 @@
+"""
+排行榜服务
+按周、月、总榜维护获得积分和上传数的排行，并可按孩子年级、城市筛选
+积分榜只统计贡献积分（上传奖励和资源被下载奖励），注册、签到、退款、对账调整等不计入；
+每个榜单是一个有序集合（Redis ZSET，或 sortedcontainers 有序列表），积分流水和上传在事务提交后增量累加，
+更新、前N名和当前用户名次的查询均为 O(log n)；定期按数据库重建，校正用户年级/城市变化并恢复进程内榜单；
+重建期间的增量同时记入日志，替换榜单时叠加到数据库快照上，不会被快照覆盖
+"""
+import asyncio
+import logging
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import event, select, func, case
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.resource import Resource, PointTransaction
+from app.models.user import User
+from app.models.user_stats import UserStatistics
+
+try:
+    from sortedcontainers import SortedList
+except ImportError:
+    SortedList = None
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# 计入积分榜的积分流水类型（贡献积分）
+CONTRIBUTION_TYPES = ("upload", "download_reward")
+
+# 榜单指标 -> user_stats 中对应的统计字段
+METRICS = {
+    "points": "contribution_points",
+    "uploads": "total_uploads"
+}
+PERIODS = ("week", "month", "all")
+
+# 会话中待提交后写入榜单的增量
+PENDING_KEY = "leaderboard_deltas"
+
+# 重建标记的最长保留时间（秒），重建进程异常退出时日志不会一直累积
+REBUILD_TIMEOUT = 600
+
+
+def period_key(period: str, now: datetime) -> str:
+    """周期标识：周榜 2024-W07，月榜 2024-02，总榜 all"""
+    if period == "week":
+        year, week, _ = now.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == "month":
+        return now.strftime("%Y-%m")
+    return "all"
+
+
+def period_start(period: str, now: datetime) -> Optional[datetime]:
+    """周期起始时间（UTC），总榜为None"""
+    today = datetime(now.year, now.month, now.day)
+    if period == "week":
+        return today - timedelta(days=today.weekday())
+    if period == "month":
+        return today.replace(day=1)
+    return None
+
+
+def board_key(metric: str, period: str, scope: str, now: datetime) -> str:
+    return f"{metric}:{period}:{period_key(period, now)}:{scope}"
+
+
+def board_scope(grade: Optional[str] = None, city: Optional[str] = None) -> str:
+    if grade:
+        return f"grade:{grade}"
+    if city:
+        return f"city:{city}"
+    return "all"
+
+
+def user_scopes(grade: Optional[str], city: Optional[str]) -> List[str]:
+    """用户计入的榜单范围：全站、所在年级、所在城市"""
+    scopes = ["all"]
+    if grade:
+        scopes.append(board_scope(grade=grade))
+    if city:
+        scopes.append(board_scope(city=city))
+    return scopes
+
+
+class _BisectList:
+    """未安装 sortedcontainers 时的有序列表（插入为 O(n) 内存移动，名次查询为二分，仅作兜底）"""
+
+    def __init__(self, items: Iterable = ()):
+        self._items = sorted(items)
+
+    def add(self, item) -> None:
+        insort(self._items, item)
+
+    def remove(self, item) -> None:
+        del self._items[bisect_left(self._items, item)]
+
+    def bisect_left(self, item) -> int:
+        return bisect_left(self._items, item)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+
+class _MemoryBoard:
+    """单个榜单：按 (-分数, 用户ID) 排序，分数相同时用户ID小的在前"""
+
+    def __init__(self, scores: Mapping[int, int] = None):
+        self.scores: Dict[int, int] = dict(scores or {})
+        ranking = ((-score, user_id) for user_id, score in self.scores.items())
+        self.ranking = SortedList(ranking) if SortedList is not None else _BisectList(ranking)
+
+    def incr(self, user_id: int, amount: int) -> None:
+        old = self.scores.get(user_id)
+        if old is not None:
+            self.ranking.remove((-old, user_id))
+        new = (old or 0) + amount
+        self.scores[user_id] = new
+        self.ranking.add((-new, user_id))
+
+    def top(self, limit: int) -> List[Tuple[int, int]]:
+        return [(user_id, -neg_score) for neg_score, user_id in self.ranking[:limit]]
+
+    def rank(self, user_id: int) -> Optional[Tuple[int, int]]:
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return self.ranking.bisect_left((-score, user_id)), score
+
+
+class MemoryLeaderboardStore:
+    """进程内榜单存储（单进程部署使用）"""
+
+    def __init__(self):
+        self._boards: Dict[str, _MemoryBoard] = {}
+        self._journal: Optional[Counter] = None  # 重建期间的增量
+
+    @staticmethod
+    def _apply(boards: Dict[str, _MemoryBoard], increments: Iterable[Tuple[str, int, int]]) -> None:
+        for key, user_id, amount in increments:
+            board = boards.get(key)
+            if board is None:
+                board = boards[key] = _MemoryBoard()
+            board.incr(user_id, amount)
+
+    async def incr(self, increments: Iterable[Tuple[str, int, int]]) -> None:
+        increments = list(increments)
+        self._apply(self._boards, increments)
+        if self._journal is not None:
+            for key, user_id, amount in increments:
+                self._journal[(key, user_id)] += amount
+
+    async def top(self, key: str, limit: int) -> List[Tuple[int, int]]:
+        board = self._boards.get(key)
+        return board.top(limit) if board else []
+
+    async def rank(self, key: str, user_id: int) -> Optional[Tuple[int, int]]:
+        board = self._boards.get(key)
+        return board.rank(user_id) if board else None
+
+    async def begin_rebuild(self) -> bool:
+        self._journal = Counter()
+        return True
+
+    async def cancel_rebuild(self) -> None:
+        self._journal = None
+
+    async def replace_all(self, boards: Mapping[str, Mapping[int, int]]) -> None:
+        # 整体替换，过期周期的榜单随之丢弃；快照之后的增量叠加到新榜单上
+        journal, self._journal = self._journal or Counter(), None
+        new_boards = {key: _MemoryBoard(scores) for key, scores in boards.items()}
+        self._apply(new_boards, ((key, user_id, amount) for (key, user_id), amount in journal.items()))
+        self._boards = new_boards
+
+    async def close(self) -> None:
+        self._boards.clear()
+
+
+class RedisLeaderboardStore:
+    """Redis有序集合榜单存储（多进程部署使用），周榜、月榜在周期结束后自动过期"""
+
+    PERIOD_TTL = {
+        "week": 14 * 24 * 3600,
+        "month": 62 * 24 * 3600
+    }
+
+    REBUILDING_KEY = "leaderboard:rebuilding"
+    JOURNALS_KEY = "leaderboard:journals"
+
+    # 累加增量；重建标记存在时（任一进程正在重建）同时记入该榜单的日志
+    INCR_SCRIPT = """
+    local rebuilding = redis.call('EXISTS', KEYS[1]) == 1
+    for i = 1, #ARGV - 1, 4 do
+        local key, member, amount, ttl = ARGV[i], ARGV[i + 1], ARGV[i + 2], tonumber(ARGV[i + 3])
+        redis.call('ZINCRBY', key, amount, member)
+        if ttl > 0 then
+            redis.call('EXPIRE', key, ttl)
+        end
+        if rebuilding then
+            redis.call('ZINCRBY', key .. ':journal', amount, member)
+            redis.call('EXPIRE', key .. ':journal', ARGV[#ARGV])
+            redis.call('SADD', KEYS[2], key)
+        end
+    end
+    """
+
+    # 结束重建：清除标记和全部日志（替换后再写入的日志在目标榜单中已累加过）
+    FINISH_SCRIPT = """
+    redis.call('DEL', KEYS[1])
+    for _, key in ipairs(redis.call('SMEMBERS', KEYS[2])) do
+        redis.call('DEL', key .. ':journal')
+    end
+    redis.call('DEL', KEYS[2])
+    """
+
+    def __init__(self, redis_url: str):
+        self._redis = aioredis.from_url(redis_url, decode_responses=True)
+        self._incr_script = self._redis.register_script(self.INCR_SCRIPT)
+        self._finish_script = self._redis.register_script(self.FINISH_SCRIPT)
+
+    @staticmethod
+    def _key(key: str) -> str:
+        return f"leaderboard:{key}"
+
+    def _ttl(self, key: str) -> Optional[int]:
+        return self.PERIOD_TTL.get(key.split(":", 2)[1])
+
+    async def incr(self, increments: Iterable[Tuple[str, int, int]]) -> None:
+        args = []
+        for key, user_id, amount in increments:
+            args += [self._key(key), user_id, amount, self._ttl(key) or 0]
+        if args:
+            await self._incr_script(keys=[self.REBUILDING_KEY, self.JOURNALS_KEY], args=[*args, REBUILD_TIMEOUT])
+
+    async def top(self, key: str, limit: int) -> List[Tuple[int, int]]:
+        rows = await self._redis.zrevrange(self._key(key), 0, limit - 1, withscores=True)
+        return [(int(member), int(score)) for member, score in rows]
+
+    async def rank(self, key: str, user_id: int) -> Optional[Tuple[int, int]]:
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.zrevrank(self._key(key), user_id)
+        pipe.zscore(self._key(key), user_id)
+        rank, score = await pipe.execute()
+        if rank is None:
+            return None
+        return int(rank), int(score)
+
+    async def begin_rebuild(self) -> bool:
+        # 重建标记兼作锁：多个进程同时到达重建时间时只有一个执行
+        return bool(await self._redis.set(self.REBUILDING_KEY, 1, ex=REBUILD_TIMEOUT, nx=True))
+
+    async def cancel_rebuild(self) -> None:
+        await self._finish_script(keys=[self.REBUILDING_KEY, self.JOURNALS_KEY])
+
+    async def replace_all(self, boards: Mapping[str, Mapping[int, int]]) -> None:
+        # 每个榜单先写临时键，再与重建期间的日志合并写入目标键（同一事务内），读请求不会看到半成品
+        journaled = await self._redis.smembers(self.JOURNALS_KEY)
+        keys = {self._key(key): key for key in boards}
+        keys.update({target: target.split(":", 1)[1] for target in journaled if target not in keys})
+        for target, key in keys.items():
+            scores = boards.get(key)
+            staging = f"{target}:rebuild"
+            pipe = self._redis.pipeline(transaction=True)
+            pipe.delete(staging)
+            if scores:
+                pipe.zadd(staging, {str(user_id): score for user_id, score in scores.items()})
+            pipe.zunionstore(target, [staging, f"{target}:journal"])
+            pipe.delete(staging, f"{target}:journal")
+            ttl = self._ttl(key)
+            if ttl:
+                pipe.expire(target, ttl)
+            await pipe.execute()
+        await self._finish_script(keys=[self.REBUILDING_KEY, self.JOURNALS_KEY])
+
+    async def close(self) -> None:
+        await self._redis.close()
+
+
+def create_store():
+    """根据配置创建榜单存储"""
+    if settings.LEADERBOARD_BACKEND == "redis":
+        # 不能退回进程内榜单：多进程部署时每个进程只看到自己累加的部分
+        if aioredis is None:
+            raise RuntimeError("LEADERBOARD_BACKEND=redis 需要安装 redis（pip install -r requirements.txt）")
+        return RedisLeaderboardStore(settings.REDIS_URL)
+    if SortedList is None:
+        logger.warning("未安装 sortedcontainers，进程内排行榜更新退化为 O(n)")
+    return MemoryLeaderboardStore()
+
+
+class LeaderboardService:
+    """排行榜服务"""
+
+    def __init__(self, store):
+        self.store = store
+        self._tasks = set()
+
+    def stage(self, db: AsyncSession, deltas: Mapping[int, Mapping[str, int]]) -> None:
+        """暂存本事务的统计增量，事务提交后才写入榜单（回滚则丢弃）"""
+        pending = db.info.setdefault(PENDING_KEY, Counter())
+        for user_id, changes in deltas.items():
+            for metric, field in METRICS.items():
+                amount = changes.get(field, 0)
+                if amount > 0:
+                    pending[(user_id, metric)] += amount
+
+    def schedule(self, pending: Optional[Counter]) -> None:
+        """提交后异步写入榜单，不阻塞当前请求"""
+        if not pending:
+            return
+        task = asyncio.get_running_loop().create_task(self.record(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def record(self, pending: Mapping[Tuple[int, str], int]) -> None:
+        """按用户当前的年级、城市，把增量累加到各周期、各范围的榜单"""
+        try:
+            user_ids = {user_id for user_id, _ in pending}
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(User.id, User.child_grade, User.city).where(User.id.in_(user_ids))
+                )
+                scopes = {row.id: user_scopes(row.child_grade, row.city) for row in result}
+
+            now = datetime.utcnow()
+            increments = [
+                (board_key(metric, period, scope, now), user_id, amount)
+                for (user_id, metric), amount in pending.items()
+                for period in PERIODS
+                for scope in scopes.get(user_id, ())
+            ]
+            await self.store.incr(increments)
+        except Exception as e:
+            logger.warning(f"排行榜更新失败: {e}")
+
+    async def get_board(
+        self,
+        db: AsyncSession,
+        metric: str,
+        period: str,
+        limit: int,
+        user_id: Optional[int] = None,
+        grade: Optional[str] = None,
+        city: Optional[str] = None
+    ) -> dict:
+        """获取榜单前N名（附用户信息），登录时同时返回当前用户的名次"""
+        now = datetime.utcnow()
+        key = board_key(metric, period, board_scope(grade, city), now)
+        top = await self.store.top(key, limit)
+
+        users = {}
+        if top:
+            result = await db.execute(
+                select(User.id, User.nickname, User.avatar_url, User.level)
+                .where(User.id.in_([member for member, _ in top]))
+            )
+            users = {row.id: row for row in result}
+
+        items = []
+        for index, (member, score) in enumerate(top):
+            user = users.get(member)
+            items.append({
+                "rank": index + 1,
+                "user_id": member,
+                "nickname": user.nickname if user else None,
+                "avatar_url": user.avatar_url if user else None,
+                "level": user.level if user else None,
+                "score": score
+            })
+
+        mine = await self.store.rank(key, user_id) if user_id else None
+        return {
+            "metric": metric,
+            "period": period,
+            "period_key": period_key(period, now),
+            "items": items,
+            "my_rank": mine[0] + 1 if mine else None,
+            "my_score": mine[1] if mine else 0
+        }
+
+    async def rebuild(self) -> int:
+        """
+        按数据库重建全部当前周期的榜单（定时任务，启动时先执行一次）
+
+        总榜取自 user_stats，周榜、月榜对本月/本周以来的贡献积分流水和资源各做一次分组聚合；
+        读取快照前开始记录增量日志，替换时叠加到快照上（快照开始前刚提交、尚未写入榜单的增量可能多计一次，
+        下次重建时校正）
+
+        Returns:
+            int: 重建的榜单数
+        """
+        if not await self.store.begin_rebuild():
+            logger.info("其他进程正在重建排行榜，跳过本次")
+            return 0
+        try:
+            boards = await self._snapshot()
+        except BaseException:
+            await self.store.cancel_rebuild()
+            raise
+        await self.store.replace_all(boards)
+        return len(boards)
+
+    async def _snapshot(self) -> Dict[str, Dict[int, int]]:
+        """按数据库计算全部当前周期的榜单"""
+        now = datetime.utcnow()
+        starts = {period: period_start(period, now) for period in ("week", "month")}
+        since = min(starts.values())
+        boards: Dict[str, Dict[int, int]] = defaultdict(dict)
+
+        def add(row, period: str, metric: str, value) -> None:
+            if value:
+                for scope in user_scopes(row.child_grade, row.city):
+                    boards[board_key(metric, period, scope, now)][row.user_id] = int(value)
+
+        def period_sums(value, created_at):
+            return [
+                func.sum(case((created_at >= start, value), else_=0)).label(period)
+                for period, start in starts.items()
+            ]
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(
+                    UserStatistics.user_id,
+                    UserStatistics.contribution_points,
+                    UserStatistics.total_uploads,
+                    User.child_grade,
+                    User.city
+                ).join(User, User.id == UserStatistics.user_id)
+            )
+            for row in result:
+                add(row, "all", "points", row.contribution_points)
+                add(row, "all", "uploads", row.total_uploads)
+
+            result = await db.execute(
+                select(
+                    PointTransaction.user_id,
+                    *period_sums(PointTransaction.points_change, PointTransaction.created_at),
+                    User.child_grade,
+                    User.city
+                )
+                .join(User, User.id == PointTransaction.user_id)
+                .where(
+                    PointTransaction.transaction_type.in_(CONTRIBUTION_TYPES),
+                    PointTransaction.points_change > 0,
+                    PointTransaction.created_at >= since
+                )
+                .group_by(PointTransaction.user_id, User.child_grade, User.city)
+            )
+            for row in result:
+                for period in starts:
+                    add(row, period, "points", getattr(row, period))
+
+            result = await db.execute(
+                select(
+                    Resource.uploader_id.label("user_id"),
+                    *period_sums(1, Resource.created_at),
+                    User.child_grade,
+                    User.city
+                )
+                .join(User, User.id == Resource.uploader_id)
+                .where(Resource.created_at >= since)
+                .group_by(Resource.uploader_id, User.child_grade, User.city)
+            )
+            for row in result:
+                for period in starts:
+                    add(row, period, "uploads", getattr(row, period))
+
+        return boards
+
+    async def close(self) -> None:
+        await self.store.close()
+
+
+# 全局排行榜服务实例
+leaderboard_service = LeaderboardService(create_store())
+
+
+@event.listens_for(Session, "after_commit")
+def _record_after_commit(session: Session) -> None:
+    leaderboard_service.schedule(session.info.pop(PENDING_KEY, None))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,181 @@
+"""
+积分流水归档服务
+超过保留期的积分流水按月压缩为 JSON Lines 文件写入归档存储，并从热表删除；
+每个用户已归档部分的积分合计（净额及获得、消耗、贡献积分）累加到期初余额快照，热表只保留近期流水，写入时索引维护成本保持稳定
+"""
+import gzip
+import json
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Tuple
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.resource import PointTransaction, PointBalanceSnapshot
+from app.services.leaderboard_service import CONTRIBUTION_TYPES
+from app.services.tiering_service import archive_storage
+from app.services.worker_pool import run_in_process
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLUMNS = (
+    PointTransaction.id,
+    PointTransaction.user_id,
+    PointTransaction.transaction_type,
+    PointTransaction.points_change,
+    PointTransaction.related_resource_id,
+    PointTransaction.related_bounty_id,
+    PointTransaction.description,
+    PointTransaction.created_at,
+)
+
+# 快照中按归档流水累加的合计字段
+SNAPSHOT_TOTALS = ("opening_balance", "archived_earned", "archived_spent", "archived_contribution", "archived_count")
+
+_CODEC_SUFFIXES = {"zstd": ".zst", "gzip": ".gz"}
+
+
+def archive_cutoff(now: datetime, months: int) -> datetime:
+    """归档截止时间：保留期起始月份的1日（只归档完整的自然月）"""
+    month_index = now.year * 12 + now.month - 1 - months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+def get_ledger_archive_key(month: str, first_id: int, last_id: int, codec: str) -> str:
+    """归档文件存储键，按月分目录，文件名为该批流水的ID范围（重试时覆盖同一文件）"""
+    return f"ledger/point_transactions/{month}/{first_id}-{last_id}.jsonl{_CODEC_SUFFIXES[codec]}"
+
+
+def compress_bytes(data: bytes, level: int) -> Tuple[str, bytes]:
+    """压缩数据（在子进程中执行），安装了zstandard时使用zstd，否则使用gzip"""
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=level).compress(data)
+    return "gzip", gzip.compress(data, compresslevel=min(level, 9))
+
+
+async def _single_chunk(data: bytes) -> AsyncIterator[bytes]:
+    yield data
+
+
+def _snapshot_upsert(db: AsyncSession):
+    table = PointBalanceSnapshot.__table__
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id],
+        set_={
+            "opening_balance": table.c.opening_balance + stmt.excluded.opening_balance,
+            "archived_earned": table.c.archived_earned + stmt.excluded.archived_earned,
+            "archived_spent": table.c.archived_spent + stmt.excluded.archived_spent,
+            "archived_contribution": table.c.archived_contribution + stmt.excluded.archived_contribution,
+            "archived_count": table.c.archived_count + stmt.excluded.archived_count,
+            "archived_through": stmt.excluded.archived_through,
+            "updated_at": func.now()
+        }
+    )
+
+
+async def _archive_batch(rows: List, cutoff: datetime) -> None:
+    """把一批流水按月写入归档文件，再在一个事务中删除这些流水并累加期初余额快照"""
+    by_month: Dict[str, List] = defaultdict(list)
+    for row in rows:
+        by_month[row.created_at.strftime("%Y-%m")].append(row)
+
+    for month, month_rows in by_month.items():
+        data = "\n".join(
+            json.dumps(dict(row._mapping), ensure_ascii=False, default=str) for row in month_rows
+        ).encode("utf-8") + b"\n"
+        codec, payload = await run_in_process(compress_bytes, data, settings.ARCHIVE_COMPRESSION_LEVEL)
+        key = get_ledger_archive_key(month, month_rows[0].id, month_rows[-1].id, codec)
+        await archive_storage.put(key, _single_chunk(payload), content_type="application/x-ndjson")
+
+    totals: Dict[int, Counter] = defaultdict(Counter)
+    for row in rows:
+        user_totals = totals[row.user_id]
+        user_totals["opening_balance"] += row.points_change
+        user_totals["archived_count"] += 1
+        if row.points_change > 0:
+            user_totals["archived_earned"] += row.points_change
+            if row.transaction_type in CONTRIBUTION_TYPES:
+                user_totals["archived_contribution"] += row.points_change
+        else:
+            user_totals["archived_spent"] -= row.points_change
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            delete(PointTransaction)
+            .where(
+                PointTransaction.id >= rows[0].id,
+                PointTransaction.id <= rows[-1].id,
+                PointTransaction.created_at < cutoff
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            _snapshot_upsert(db),
+            [
+                {
+                    "user_id": user_id,
+                    **{field: user_totals[field] for field in SNAPSHOT_TOTALS},
+                    "archived_through": cutoff
+                }
+                for user_id, user_totals in totals.items()
+            ]
+        )
+        await db.commit()
+
+
+async def archive_ledger() -> int:
+    """
+    归档超过保留期的积分流水（定时任务）
+
+    按ID顺序分批处理，每批先写归档文件再删除，中途失败时重跑会覆盖同一批的归档文件
+
+    Returns:
+        int: 本次归档的流水条数
+    """
+    cutoff = archive_cutoff(datetime.utcnow(), settings.LEDGER_ARCHIVE_MONTHS)
+    batch_size = settings.LEDGER_ARCHIVE_BATCH_SIZE
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(*ARCHIVE_COLUMNS)
+                .where(PointTransaction.created_at < cutoff)
+                .order_by(PointTransaction.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+        if not rows:
+            break
+
+        await _archive_batch(rows, cutoff)
+        total += len(rows)
+        if len(rows) < batch_size:
+            break
+
+    if total:
+        logger.info(f"已归档 {total} 条早于 {cutoff:%Y-%m-%d} 的积分流水")
+    return total
+
+
+async def get_opening_balance(db: AsyncSession, user_id: int) -> dict:
+    """读取用户的期初余额快照（没有归档过的用户期初余额为0）"""
+    result = await db.execute(
+        select(PointBalanceSnapshot.opening_balance, PointBalanceSnapshot.archived_through)
+        .where(PointBalanceSnapshot.user_id == user_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return {"opening_balance": 0, "archived_through": None}
+    return dict(row._mapping)
@@ -0,0 +1,129 @@
+"""
+列表查询服务
+列表页只查询卡片展示需要的列，直接由行数据构造响应字典，
+跳过ORM实体加载和Pydantic逐条校验；卡片只返回描述预览（description_preview），完整描述由详情接口返回
+"""
+from typing import Dict, List, Optional, Sequence
+
+from fastapi import HTTPException, status
+from sqlalchemy import func
+
+from app.core.responses import DefaultJSONResponse
+from app.models.bounty import Bounty
+from app.models.resource import Resource
+from app.models.user import User
+
+# 列表卡片中描述的最大长度（完整描述在详情页查看）
+DESCRIPTION_PREVIEW_CHARS = 120
+
+# 资源卡片需要的列（不含file_path、file_hash等内部字段）
+RESOURCE_CARD_COLUMNS = (
+    Resource.id,
+    Resource.uploader_id,
+    Resource.title,
+    func.substr(Resource.description, 1, DESCRIPTION_PREVIEW_CHARS).label("description_preview"),
+    Resource.grade,
+    Resource.subject,
+    Resource.resource_type,
+    Resource.file_name,
+    Resource.file_size,
+    Resource.file_type,
+    Resource.download_count,
+    Resource.favorite_count,
+    Resource.thumbnail_status,
+    Resource.is_active,
+    Resource.created_at,
+    Resource.updated_at,
+)
+
+# 悬赏卡片需要的列
+BOUNTY_CARD_COLUMNS = (
+    Bounty.id,
+    Bounty.creator_id,
+    Bounty.title,
+    func.substr(Bounty.description, 1, DESCRIPTION_PREVIEW_CHARS).label("description_preview"),
+    Bounty.grade,
+    Bounty.subject,
+    Bounty.points_reward,
+    Bounty.status,
+    Bounty.winner_id,
+    Bounty.winning_resource_id,
+    Bounty.response_count,
+    Bounty.expires_at,
+    Bounty.created_at,
+    Bounty.updated_at,
+)
+
+# 悬赏卡片中的发布者信息（与users表连接查询）
+BOUNTY_CREATOR_COLUMNS = (
+    User.nickname.label("creator_nickname"),
+    User.avatar_url.label("creator_avatar_url"),
+    User.level.label("creator_level"),
+)
+
+
+def resource_cards(rows: Sequence) -> List[Dict]:
+    """由资源列投影的查询行构造卡片字典（字段与ResourceCard一致）"""
+    items = []
+    for row in rows:
+        item = dict(row._mapping)
+        thumbnail_status = item.pop("thumbnail_status")
+        item["description_preview"] = item["description_preview"] or ""
+        item["download_count"] = item["download_count"] or 0
+        item["favorite_count"] = item["favorite_count"] or 0
+        item["thumbnail_url"] = (
+            f"/api/v1/resources/{item['id']}/thumbnail" if thumbnail_status == "ready" else None
+        )
+        item["is_purchased"] = False
+        item["is_favorited"] = False
+        item["snippet"] = None
+        items.append(item)
+    return items
+
+
+def bounty_cards(rows: Sequence) -> List[Dict]:
+    """由悬赏列投影（及发布者列）的查询行构造卡片字典（字段与BountyCard一致）"""
+    items = []
+    for row in rows:
+        item = dict(row._mapping)
+        item["response_count"] = item["response_count"] or 0
+        if "creator_nickname" in item:
+            item["creator"] = {
+                "id": item["creator_id"],
+                "nickname": item.pop("creator_nickname"),
+                "avatar_url": item.pop("creator_avatar_url"),
+                "level": item.pop("creator_level"),
+            }
+        items.append(item)
+    return items
+
+
+def decode_cursor(cursor: str) -> int:
+    """解析翻页游标（上一页最后一行的ID），格式错误时返回400"""
+    try:
+        return int(cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="翻页游标无效"
+        )
+
+
+def page_response(items: List[Dict], total: int, page: int, size: int) -> DefaultJSONResponse:
+    """构造分页列表响应（直接返回响应对象，不再经过response_model序列化）"""
+    return DefaultJSONResponse({
+        "items": items,
+        "total": total,
+        "page": page,
+        "size": size,
+        "pages": (total + size - 1) // size
+    })
+
+
+def cursor_response(items: List[Dict], size: int, next_cursor: Optional[str]) -> DefaultJSONResponse:
+    """构造游标翻页列表响应（不统计总数）"""
+    return DefaultJSONResponse({
+        "items": items,
+        "size": size,
+        "next_cursor": next_cursor
+    })
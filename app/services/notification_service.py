@@ -0,0 +1,324 @@
+"""
+站内通知服务
+通知写入收件箱并增量维护未读计数（notification_counters 表，不占用户表的行锁），同时通过推送通道实时发给在线用户（SSE）
+推送通道默认为进程内实现，多进程部署时切换为Redis发布订阅
+"""
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, Optional, Set
+
+from sqlalchemy import select, update, insert, or_, and_, case
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.bounty import Bounty, BountyResponse
+from app.models.notification import Notification, NotificationCounter
+from app.models.resource import Resource
+from app.models.user import User
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# 每个连接缓存的未发送事件数，消费过慢时丢弃新事件（收件箱中仍可查到）
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def _encode_event(event: dict) -> str:
+    return json.dumps(event, ensure_ascii=False, default=str)
+
+
+class MemoryBroker:
+    """进程内推送通道（单进程部署使用）"""
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+
+    async def publish(self, user_id: int, event: dict) -> None:
+        for queue in self._subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                pass
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int) -> AsyncIterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(user_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[user_id]
+
+    async def close(self) -> None:
+        self._subscribers.clear()
+
+
+class RedisBroker:
+    """Redis发布订阅推送通道（多进程部署使用），每个用户一个频道"""
+
+    def __init__(self, redis_url: str):
+        self._redis = aioredis.from_url(redis_url, decode_responses=True)
+
+    @staticmethod
+    def _channel(user_id: int) -> str:
+        return f"notify:{user_id}"
+
+    async def publish(self, user_id: int, event: dict) -> None:
+        await self._redis.publish(self._channel(user_id), _encode_event(event))
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int) -> AsyncIterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(self._channel(user_id))
+
+        async def relay():
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                try:
+                    queue.put_nowait(json.loads(message["data"]))
+                except asyncio.QueueFull:
+                    pass
+
+        task = asyncio.create_task(relay())
+        try:
+            yield queue
+        finally:
+            task.cancel()
+            await pubsub.unsubscribe()
+            await pubsub.close()
+
+    async def close(self) -> None:
+        await self._redis.close()
+
+
+def create_broker():
+    """根据配置创建推送通道"""
+    if settings.NOTIFICATION_BROKER == "redis":
+        # 不能退回进程内通道：多进程部署时连接在其他进程上的用户收不到推送
+        if aioredis is None:
+            raise RuntimeError("NOTIFICATION_BROKER=redis 需要安装 redis（pip install -r requirements.txt）")
+        return RedisBroker(settings.REDIS_URL)
+    return MemoryBroker()
+
+
+# 全局推送通道实例
+broker = create_broker()
+
+
+def _increment_unread(db: AsyncSession, user_ids: Iterable[int]):
+    """未读数加一（计数行不存在时插入）"""
+    table = NotificationCounter.__table__
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(table).values([{"user_id": user_id, "unread_count": 1} for user_id in user_ids])
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id],
+        set_={"unread_count": table.c.unread_count + stmt.excluded.unread_count}
+    )
+
+
+async def decrement_unread(db: AsyncSession, user_id: int, count: int) -> None:
+    """未读数减少 count（不低于0），不提交事务"""
+    await db.execute(
+        update(NotificationCounter)
+        .where(NotificationCounter.user_id == user_id)
+        .values(unread_count=case(
+            (NotificationCounter.unread_count > count, NotificationCounter.unread_count - count),
+            else_=0
+        ))
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def fetch_unread_count(db: AsyncSession, user_id: int) -> int:
+    """读取未读数（按主键读取计数行，不统计通知表）"""
+    result = await db.execute(
+        select(NotificationCounter.unread_count).where(NotificationCounter.user_id == user_id)
+    )
+    return result.scalar() or 0
+
+
+async def notify_users(
+    user_ids: Iterable[int],
+    notification_type: str,
+    title: str,
+    content: Optional[str] = None,
+    related_bounty_id: Optional[int] = None,
+    related_resource_id: Optional[int] = None
+) -> int:
+    """
+    给一批用户发送同一条通知
+
+    按批写入收件箱并累加未读数（每批一个事务），提交后推送给在线用户
+
+    Returns:
+        int: 收到通知的用户数
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    title = title[:200]
+    content = content[:500] if content else content
+    sent = 0
+    for start in range(0, len(user_ids), settings.NOTIFICATION_FANOUT_BATCH_SIZE):
+        batch = user_ids[start:start + settings.NOTIFICATION_FANOUT_BATCH_SIZE]
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                insert(Notification).returning(Notification.id, Notification.user_id, Notification.created_at),
+                [
+                    {
+                        "user_id": user_id,
+                        "notification_type": notification_type,
+                        "title": title,
+                        "content": content,
+                        "related_bounty_id": related_bounty_id,
+                        "related_resource_id": related_resource_id
+                    }
+                    for user_id in batch
+                ]
+            )
+            created = result.all()
+            await db.execute(_increment_unread(db, batch))
+            await db.commit()
+
+        for row in created:
+            await broker.publish(row.user_id, {
+                "id": row.id,
+                "notification_type": notification_type,
+                "title": title,
+                "content": content,
+                "related_bounty_id": related_bounty_id,
+                "related_resource_id": related_resource_id,
+                "is_read": False,
+                "created_at": row.created_at
+            })
+        sent += len(created)
+    return sent
+
+
+async def notify_new_bounty(bounty_id: int) -> None:
+    """
+    新悬赏通知：孩子年级相同的用户，以及上传过该年级该科目资源的用户（后台任务）
+
+    人数超过 NOTIFICATION_FANOUT_MAX_USERS 时按相关度截取：先通知能直接响应的上传者，
+    再按最近签到时间通知活跃用户
+    """
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Bounty).where(Bounty.id == bounty_id))
+            bounty = result.scalar_one_or_none()
+            if bounty is None or bounty.status != "active":
+                return
+
+            uploaders = select(Resource.uploader_id).where(
+                Resource.is_active == True,
+                Resource.subject == bounty.subject,
+                Resource.grade.ilike(f"%{bounty.grade}%")
+            )
+            result = await db.execute(
+                select(User.id)
+                .where(and_(
+                    User.is_active == True,
+                    User.id != bounty.creator_id,
+                    or_(User.child_grade == bounty.grade, User.id.in_(uploaders))
+                ))
+                .order_by(
+                    case((User.id.in_(uploaders), 0), else_=1),
+                    User.last_signin_date.is_(None),
+                    User.last_signin_date.desc(),
+                    User.id.desc()
+                )
+                .limit(settings.NOTIFICATION_FANOUT_MAX_USERS)
+            )
+            user_ids = result.scalars().all()
+
+        sent = await notify_users(
+            user_ids,
+            "bounty_new",
+            f"新悬赏：{bounty.title}",
+            f"{bounty.grade}{bounty.subject}，悬赏{bounty.points_reward}积分",
+            related_bounty_id=bounty.id
+        )
+        logger.info(f"悬赏 {bounty_id} 已通知 {sent} 位用户")
+    except Exception as e:
+        logger.warning(f"悬赏 {bounty_id} 通知发送失败: {e}")
+
+
+async def notify_bounty_response(response_id: int) -> None:
+    """悬赏收到响应时通知发布者（后台任务）"""
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Bounty.id, Bounty.creator_id, Bounty.title, BountyResponse.resource_id, User.nickname)
+                .join(BountyResponse, BountyResponse.bounty_id == Bounty.id)
+                .join(User, BountyResponse.responder_id == User.id)
+                .where(BountyResponse.id == response_id)
+            )
+            row = result.one_or_none()
+        if row is None:
+            return
+
+        await notify_users(
+            [row.creator_id],
+            "bounty_response",
+            f"您的悬赏收到新响应：{row.title}",
+            f"{row.nickname} 提交了资源，请查看并确认",
+            related_bounty_id=row.id,
+            related_resource_id=row.resource_id
+        )
+    except Exception as e:
+        logger.warning(f"悬赏响应 {response_id} 通知发送失败: {e}")
+
+
+async def notify_bounty_selected(bounty_id: int) -> None:
+    """响应被选中时通知响应者（后台任务）"""
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Bounty.id, Bounty.title, Bounty.points_reward, Bounty.winner_id, Bounty.winning_resource_id)
+                .where(Bounty.id == bounty_id)
+            )
+            row = result.one_or_none()
+        if row is None or row.winner_id is None:
+            return
+
+        await notify_users(
+            [row.winner_id],
+            "bounty_selected",
+            f"您的响应被采纳：{row.title}",
+            f"获得悬赏奖励{row.points_reward}积分",
+            related_bounty_id=row.id,
+            related_resource_id=row.winning_resource_id
+        )
+    except Exception as e:
+        logger.warning(f"悬赏 {bounty_id} 采纳通知发送失败: {e}")
+
+
+async def event_stream(user_id: int) -> AsyncIterator[str]:
+    """
+    SSE事件流：连接时先发送当前未读数，之后推送新通知，空闲时定期发送心跳
+    """
+    # 未读数用短会话读取，长连接期间不占用数据库连接
+    async with AsyncSessionLocal() as db:
+        unread_count = await fetch_unread_count(db, user_id)
+    async with broker.subscribe(user_id) as queue:
+        yield f"event: unread\ndata: {_encode_event({'unread_count': unread_count})}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.NOTIFICATION_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # 心跳（注释行），防止代理断开空闲连接
+                yield ": keepalive\n\n"
+                continue
+            yield f"id: {event['id']}\nevent: notification\ndata: {_encode_event(event)}\n\n"
@@ -8,6 +8,7 @@ from sqlalchemy import select
 from app.models.user import User
 from app.models.resource import PointTransaction
 from app.crud.user import update_user_level
+from app.services.user_stats_service import record_ledger
 
 
 async def add_points(
@@ -41,6 +42,11 @@ async def add_points(
     )
     
     db.add(transaction)
+    await record_ledger(db, [{
+        "user_id": user_id,
+        "transaction_type": transaction_type,
+        "points_change": transaction.points_change
+    }])
     await db.commit()
     
     # 更新用户等级
@@ -84,6 +90,11 @@ async def deduct_points(
     )
     
     db.add(transaction)
+    await record_ledger(db, [{
+        "user_id": user_id,
+        "transaction_type": transaction_type,
+        "points_change": transaction.points_change
+    }])
     await db.commit()
     
     # 更新用户等级
@@ -124,40 +135,3 @@ async def transfer_points(
     )
     
     return deduct_transaction, add_transaction
-
-
-async def check_daily_download_limit(db: AsyncSession, user: User) -> bool:
-    """检查每日下载限制"""
-    from app.core.config import settings
-    from datetime import date
-    
-    # 如果不是今天，重置下载次数
-    today = date.today()
-    if user.last_download_date != today:
-        user.daily_downloads = 0
-        user.last_download_date = today
-        await db.commit()
-    
-    # 获取用户等级的下载限制
-    level_config = settings.USER_LEVELS.get(user.level, {})
-    daily_limit = level_config.get("daily_downloads", 5)
-    
-    # -1表示无限制
-    if daily_limit == -1:
-        return True
-    
-    return user.daily_downloads < daily_limit
-
-
-async def increment_daily_downloads(db: AsyncSession, user: User):
-    """增加每日下载次数"""
-    from datetime import date
-    
-    today = date.today()
-    if user.last_download_date != today:
-        user.daily_downloads = 1
-        user.last_download_date = today
-    else:
-        user.daily_downloads += 1
-    
-    await db.commit()
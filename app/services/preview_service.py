@@ -0,0 +1,110 @@
+"""
+资源缩略图服务
+上传后在后台进程池中生成缩略图，与资源文件存放在同一存储目录
+"""
+import logging
+import os
+import tempfile
+from typing import Optional
+
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.resource import Resource
+from app.services.storage_service import storage
+from app.services.worker_pool import run_in_process
+
+logger = logging.getLogger(__name__)
+
+# 支持生成缩略图的文件类型
+IMAGE_TYPES = {"jpg", "jpeg", "png"}
+PDF_TYPES = {"pdf"}
+
+
+def get_thumbnail_key(file_key: str) -> str:
+    """缩略图存储键：与资源文件同目录"""
+    return f"{os.path.splitext(file_key)[0]}.thumb.jpg"
+
+
+def render_thumbnail(file_path: str, file_type: str, thumb_path: str, max_size: int) -> str:
+    """
+    生成缩略图（在子进程中执行）
+
+    Returns:
+        str: 缩略图状态 ready / unsupported
+    """
+    from PIL import Image
+
+    if file_type in IMAGE_TYPES:
+        with Image.open(file_path) as source:
+            # 大图只按缩略图尺寸解码，降低内存和CPU消耗
+            source.draft("RGB", (max_size, max_size))
+            image = source.convert("RGB")
+    elif file_type in PDF_TYPES:
+        try:
+            import fitz  # PyMuPDF（requirements.txt 已声明，未安装时PDF不处理）
+        except ImportError:
+            return "unsupported"
+
+        with fitz.open(file_path) as document:
+            if document.page_count == 0:
+                return "unsupported"
+            page = document.load_page(0)
+            zoom = max_size / max(page.rect.width, page.rect.height)
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+    else:
+        return "unsupported"
+
+    image.thumbnail((max_size, max_size))
+    tmp_path = f"{thumb_path}.tmp"
+    image.save(tmp_path, format="JPEG", quality=80, optimize=True)
+    os.replace(tmp_path, thumb_path)
+    return "ready"
+
+
+async def generate_thumbnail(resource_id: int, file_key: str, file_type: str,
+                             local_path: Optional[str] = None) -> str:
+    """
+    生成资源缩略图并更新状态（作为后台任务调用）
+
+    Args:
+        resource_id: 资源ID
+        file_key: 资源文件存储键
+        file_type: 文件扩展名
+        local_path: 资源文件的本地路径（未提供时从存储中取一份本地副本）
+
+    Returns:
+        str: 缩略图状态
+    """
+    if local_path is None:
+        async with storage.local_copy(file_key) as local_path:
+            return await generate_thumbnail(resource_id, file_key, file_type, local_path)
+
+    temp_dir = os.path.join(settings.UPLOAD_DIR, "tmp")
+    os.makedirs(temp_dir, exist_ok=True)
+    fd, thumb_path = tempfile.mkstemp(suffix=".thumb.jpg", dir=temp_dir)
+    os.close(fd)
+    try:
+        thumbnail_status = await run_in_process(
+            render_thumbnail, local_path, file_type, thumb_path, settings.THUMBNAIL_SIZE
+        )
+        if thumbnail_status == "ready":
+            await storage.put_file(get_thumbnail_key(file_key), thumb_path, "image/jpeg")
+    except Exception as e:
+        logger.warning(f"资源 {resource_id} 缩略图生成失败: {e}")
+        thumbnail_status = "failed"
+    finally:
+        if os.path.exists(thumb_path):
+            os.remove(thumb_path)
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(Resource)
+            .where(Resource.id == resource_id)
+            .values(thumbnail_status=thumbnail_status)
+        )
+        await db.commit()
+
+    return thumbnail_status
@@ -0,0 +1,241 @@
+"""
+资源购买结算服务
+多个资源的扣分、奖励、下载记录在一个事务内完成
+"""
+from collections import Counter
+from typing import List, Set, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, insert, bindparam
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.crud.user import refresh_user_levels
+from app.models.user import User
+from app.models.resource import Resource, Download, PointTransaction
+from app.services.quota_service import quota_service
+from app.services.entitlement_service import entitlement_service
+from app.services.counter_service import download_counter
+from app.services.config_service import config_service
+from app.services.user_stats_service import ledger_deltas, increment_stats
+from app.services.tiering_service import find_missing_files
+
+
+async def settle_purchases(
+    db: AsyncSession,
+    user: User,
+    resource_ids: List[int],
+    require_all: bool = False
+) -> Tuple[List[Resource], List[dict]]:
+    """
+    批量购买资源（单事务结算）
+
+    自己上传的和已购买过的资源不扣分，文件缺失的资源不结算；其余资源一次性检查配额和积分，
+    买家一次扣分，每个上传者一次汇总奖励，下载记录和积分流水批量插入
+
+    Args:
+        db: 数据库会话
+        user: 购买用户
+        resource_ids: 资源ID列表
+        require_all: 有资源或文件不存在时是否整体失败（不扣分）
+
+    Returns:
+        Tuple[List[Resource], List[dict]]: (可下载的资源列表, 逐项结果)
+    """
+    # 去重并保持顺序
+    resource_ids = list(dict.fromkeys(resource_ids))
+
+    result = await db.execute(
+        select(Resource).where(
+            Resource.id.in_(resource_ids),
+            Resource.is_active == True
+        )
+    )
+    resources_by_id = {resource.id: resource for resource in result.scalars().all()}
+
+    # 结算前确认文件都在，避免为缺失的文件扣分
+    missing_file_ids = set(await find_missing_files(list(resources_by_id.values())))
+
+    # 已购买记录以数据库为准，避免重复扣分
+    purchased_result = await db.execute(
+        select(Download.resource_id).where(
+            Download.user_id == user.id,
+            Download.resource_id.in_(list(resources_by_id))
+        )
+    )
+    purchased_ids = set(purchased_result.scalars().all())
+
+    download_cost = config_service.points["download"]
+
+    items = []
+    available = []
+    chargeable = []
+    for resource_id in resource_ids:
+        resource = resources_by_id.get(resource_id)
+        if resource is None:
+            items.append({"resource_id": resource_id, "status": "not_found", "points_cost": 0})
+            continue
+        if resource_id in missing_file_ids:
+            items.append({"resource_id": resource_id, "status": "file_missing", "points_cost": 0})
+            continue
+
+        available.append(resource)
+        if resource.uploader_id == user.id:
+            items.append({"resource_id": resource_id, "status": "owned", "points_cost": 0})
+        elif resource_id in purchased_ids:
+            items.append({"resource_id": resource_id, "status": "already_purchased", "points_cost": 0})
+        else:
+            items.append({"resource_id": resource_id, "status": "purchased", "points_cost": download_cost})
+            chargeable.append(resource)
+
+    missing = [item["resource_id"] for item in items if item["status"] in ("not_found", "file_missing")]
+    if require_all and missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"资源或文件不存在: {', '.join(str(resource_id) for resource_id in missing)}"
+        )
+
+    if not chargeable:
+        return available, items
+
+    _, charged_ids = await charge_resources(db, user, chargeable)
+
+    # 并发请求已先买下的资源不重复扣分
+    for item in items:
+        if item["status"] == "purchased" and item["resource_id"] not in charged_ids:
+            item.update(status="already_purchased", points_cost=0)
+
+    return available, items
+
+
+def _insert_downloads(db: AsyncSession):
+    """批量写入下载记录，已存在的 (user_id, resource_id) 跳过，返回实际写入的资源ID"""
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    return (
+        dialect.insert(Download)
+        .on_conflict_do_nothing(index_elements=["user_id", "resource_id"])
+        .returning(Download.resource_id)
+    )
+
+
+async def charge_resources(db: AsyncSession, user: User, resources: List[Resource]) -> Tuple[int, Set[int]]:
+    """
+    对需要付费的资源一次性结算并提交事务
+
+    下载记录先以 ON CONFLICT DO NOTHING 写入，只对实际写入的资源扣分和奖励；
+    并发购买同一资源时只有一个请求写入成功，另一个不会重复扣分
+
+    Args:
+        db: 数据库会话
+        user: 购买用户
+        resources: 需要扣分购买的资源（调用方已排除自己上传和已购买的资源）
+
+    Returns:
+        Tuple[int, Set[int]]: (本次消耗的积分, 本次实际购买的资源ID)
+    """
+    points_config = config_service.points
+    download_cost = points_config["download"]
+    download_reward = points_config["download_reward"]
+    total_cost = download_cost * len(resources)
+    if user.points < total_cost:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"积分不足，需要{total_cost}积分"
+        )
+
+    # 一次性占用全部下载配额（并发购买中已被其他请求买下的部分随后退还）
+    allowed, daily_limit = await quota_service.try_consume(user.id, user.level, len(resources))
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"已达到每日下载限制（{daily_limit}次），请明天再试或提升用户等级"
+        )
+
+    try:
+        # 先写下载记录，唯一索引保证同一用户同一资源只结算一次
+        inserted = await db.execute(
+            _insert_downloads(db),
+            [
+                {"user_id": user.id, "resource_id": resource.id, "points_cost": download_cost}
+                for resource in resources
+            ]
+        )
+        charged_ids = set(inserted.scalars().all())
+        charged = [resource for resource in resources if resource.id in charged_ids]
+        total_cost = download_cost * len(charged)
+
+        if charged:
+            # 买家一次扣分（条件更新，并发下不会扣成负数）
+            debit = await db.execute(
+                update(User)
+                .where(User.id == user.id, User.points >= total_cost)
+                .values(points=User.points - total_cost)
+                .execution_options(synchronize_session=False)
+            )
+            if debit.rowcount != 1:
+                raise ValueError("积分不足")
+
+            # 每个上传者一次汇总奖励
+            rewards = Counter(resource.uploader_id for resource in charged)
+            users_table = User.__table__
+            await db.execute(
+                update(users_table)
+                .where(users_table.c.id == bindparam("uid"))
+                .values(points=users_table.c.points + bindparam("delta")),
+                [{"uid": uploader_id, "delta": count * download_reward} for uploader_id, count in rewards.items()]
+            )
+
+            # 批量写入积分流水
+            transactions = []
+            for resource in charged:
+                transactions.append({
+                    "user_id": user.id,
+                    "transaction_type": "download",
+                    "points_change": -download_cost,
+                    "description": f"下载资源: {resource.title}"[:200],
+                    "related_resource_id": resource.id
+                })
+                transactions.append({
+                    "user_id": resource.uploader_id,
+                    "transaction_type": "download_reward",
+                    "points_change": download_reward,
+                    "description": f"资源被下载: {resource.title}"[:200],
+                    "related_resource_id": resource.id
+                })
+            await db.execute(insert(PointTransaction), transactions)
+
+            # 统计增量：买家下载数、双方积分收支
+            deltas = ledger_deltas(transactions)
+            deltas[user.id]["total_downloads"] += len(charged)
+            await increment_stats(db, deltas)
+
+            await refresh_user_levels(db, [user.id, *rewards])
+
+        await db.commit()
+
+    except ValueError:
+        await db.rollback()
+        await quota_service.release(user.id, len(resources))
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"积分不足，需要{total_cost}积分"
+        )
+    except Exception:
+        await db.rollback()
+        await quota_service.release(user.id, len(resources))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="购买失败，请重试"
+        )
+
+    if len(charged) < len(resources):
+        await quota_service.release(user.id, len(resources) - len(charged))
+
+    await db.refresh(user)
+
+    for resource in resources:
+        entitlement_service.grant(user.id, resource.id)
+    for resource in charged:
+        download_counter.increment(resource.id)
+
+    return total_cost, charged_ids
@@ -0,0 +1,151 @@
+"""
+每日下载配额服务
+按用户、按天计数，计数不再写入users表，检查与消耗为一次原子操作
+"""
+import asyncio
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.services.config_service import config_service
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+
+def get_daily_limit(level: str) -> int:
+    """获取用户等级对应的每日下载次数上限，-1表示无限制"""
+    return config_service.snapshot.daily_limit(level)
+
+
+def _seconds_until_midnight() -> int:
+    """距离今天24点的秒数"""
+    now = datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), time.min)
+    return max(int((midnight - now).total_seconds()), 1)
+
+
+class MemoryQuotaStore:
+    """进程内计数器（单进程部署使用，多进程部署请使用Redis）"""
+
+    def __init__(self):
+        self._counters: Dict[Tuple[int, date], int] = {}
+        self._day: Optional[date] = None
+        self._lock = asyncio.Lock()
+
+    def _rollover(self):
+        """跨天时丢弃前一天的全部计数"""
+        today = date.today()
+        if self._day != today:
+            self._counters.clear()
+            self._day = today
+
+    async def consume(self, user_id: int, amount: int, limit: int) -> Tuple[bool, int]:
+        async with self._lock:
+            self._rollover()
+            key = (user_id, self._day)
+            used = self._counters.get(key, 0)
+            if limit != -1 and used + amount > limit:
+                return False, used
+            self._counters[key] = used + amount
+            return True, used + amount
+
+    async def release(self, user_id: int, amount: int) -> None:
+        async with self._lock:
+            self._rollover()
+            key = (user_id, self._day)
+            used = self._counters.get(key, 0)
+            if used <= amount:
+                self._counters.pop(key, None)
+            else:
+                self._counters[key] = used - amount
+
+    async def get_used(self, user_id: int) -> int:
+        async with self._lock:
+            self._rollover()
+            return self._counters.get((user_id, self._day), 0)
+
+
+class RedisQuotaStore:
+    """Redis计数器，键在当天24点自动过期"""
+
+    # 检查并消耗必须在一个脚本内完成，避免并发请求同时越过上限
+    CONSUME_SCRIPT = """
+    local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+    local amount = tonumber(ARGV[1])
+    local limit = tonumber(ARGV[2])
+    if limit ~= -1 and used + amount > limit then
+        return {0, used}
+    end
+    used = redis.call('INCRBY', KEYS[1], amount)
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    return {1, used}
+    """
+
+    def __init__(self, redis_url: str):
+        self._redis = aioredis.from_url(redis_url, decode_responses=True)
+        self._consume = self._redis.register_script(self.CONSUME_SCRIPT)
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"quota:download:{date.today().isoformat()}:{user_id}"
+
+    async def consume(self, user_id: int, amount: int, limit: int) -> Tuple[bool, int]:
+        allowed, used = await self._consume(
+            keys=[self._key(user_id)],
+            args=[amount, limit, _seconds_until_midnight()]
+        )
+        return bool(allowed), int(used)
+
+    async def release(self, user_id: int, amount: int) -> None:
+        key = self._key(user_id)
+        used = await self._redis.decrby(key, amount)
+        if used <= 0:
+            await self._redis.delete(key)
+
+    async def get_used(self, user_id: int) -> int:
+        used = await self._redis.get(self._key(user_id))
+        return int(used or 0)
+
+
+class QuotaService:
+    """每日下载配额服务类"""
+
+    def __init__(self):
+        if settings.QUOTA_BACKEND == "redis":
+            # 不能退回进程内计数：多进程部署时每个进程各算一份配额，重启后清零
+            if aioredis is None:
+                raise RuntimeError("QUOTA_BACKEND=redis 需要安装 redis（pip install -r requirements.txt）")
+            self._store = RedisQuotaStore(settings.REDIS_URL)
+        else:
+            self._store = MemoryQuotaStore()
+
+    async def try_consume(self, user_id: int, level: str, amount: int = 1) -> Tuple[bool, int]:
+        """
+        检查并消耗下载配额
+
+        Args:
+            user_id: 用户ID
+            level: 用户等级
+            amount: 本次消耗的次数
+
+        Returns:
+            Tuple[bool, int]: (是否允许, 每日上限)
+        """
+        limit = get_daily_limit(level)
+        allowed, _ = await self._store.consume(user_id, amount, limit)
+        return allowed, limit
+
+    async def release(self, user_id: int, amount: int = 1) -> None:
+        """归还配额（下载事务失败时调用）"""
+        await self._store.release(user_id, amount)
+
+    async def get_used(self, user_id: int) -> int:
+        """获取用户今日已用的下载次数"""
+        return await self._store.get_used(user_id)
+
+
+# 创建全局配额服务实例
+quota_service = QuotaService()
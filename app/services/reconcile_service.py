@@ -0,0 +1,148 @@
+"""
+积分对账服务
+按用户ID分块，用一条分组聚合语句比对用户余额与“期初余额快照 + 积分流水合计”，
+内存占用与分块大小相关、与流水总量无关；可选写入调整流水，使流水与余额一致
+"""
+import logging
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import select, func, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.resource import PointTransaction, PointBalanceSnapshot
+from app.models.user import User
+from app.services.user_stats_service import record_ledger
+
+logger = logging.getLogger(__name__)
+
+# 最近一次对账报告（供管理接口查询）
+last_report: Optional[dict] = None
+_running = False
+
+
+def _discrepancy_query(lo: int, hi: int, user_ids: Optional[List[int]] = None):
+    """
+    [lo, hi] 范围内余额与流水不一致的用户
+
+    流水按用户分组聚合后与用户表、快照表关联，余额和流水在同一条语句中读取，不会因并发写入误报
+    """
+    ledger = (
+        select(PointTransaction.user_id, func.sum(PointTransaction.points_change).label("total"))
+        .where(PointTransaction.user_id.between(lo, hi))
+        .group_by(PointTransaction.user_id)
+        .subquery()
+    )
+    expected = (
+        func.coalesce(PointBalanceSnapshot.opening_balance, 0) + func.coalesce(ledger.c.total, 0)
+    ).label("ledger_balance")
+    query = (
+        select(User.id.label("user_id"), User.points.label("balance"), expected)
+        .outerjoin(ledger, ledger.c.user_id == User.id)
+        .outerjoin(PointBalanceSnapshot, PointBalanceSnapshot.user_id == User.id)
+        .where(User.id.between(lo, hi), User.points != expected)
+        .order_by(User.id)
+    )
+    if user_ids is not None:
+        query = query.where(User.id.in_(user_ids))
+    return query
+
+
+async def _correct(db: AsyncSession, lo: int, hi: int, user_ids: List[int]) -> int:
+    """重新核对后为仍不一致的用户写入调整流水（单事务）"""
+    result = await db.execute(_discrepancy_query(lo, hi, user_ids))
+    transactions = [
+        {
+            "user_id": row.user_id,
+            "transaction_type": "reconcile",
+            "points_change": row.balance - row.ledger_balance,
+            "description": "对账调整：积分流水与余额不一致"
+        }
+        for row in result
+    ]
+    if transactions:
+        await db.execute(insert(PointTransaction), transactions)
+        await record_ledger(db, transactions)
+    await db.commit()
+    return len(transactions)
+
+
+async def reconcile_ledger(
+    fix: bool = False,
+    on_discrepancy: Optional[Callable[[dict], None]] = None
+) -> dict:
+    """
+    执行一次积分对账（定时任务）
+
+    Args:
+        fix: 为不一致的用户写入调整流水（以用户余额为准）
+        on_discrepancy: 每发现一个不一致用户时回调（用于导出完整明细），报告中只保留前若干条
+
+    Returns:
+        dict: 对账报告
+    """
+    global last_report, _running
+    if _running:
+        logger.info("积分对账正在执行，跳过本次")
+        return last_report or {}
+
+    _running = True
+    report = {
+        "fix": fix,
+        "started_at": datetime.utcnow(),
+        "finished_at": None,
+        "users_checked": 0,
+        "discrepancies": 0,
+        "total_difference": 0,
+        "corrected": 0,
+        "details": []
+    }
+    try:
+        last_id = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(User.id)
+                    .where(User.id > last_id)
+                    .order_by(User.id)
+                    .limit(settings.LEDGER_RECONCILE_CHUNK_SIZE)
+                )
+                chunk = result.scalars().all()
+                if not chunk:
+                    break
+                lo, hi = chunk[0], chunk[-1]
+                last_id = hi
+                report["users_checked"] += len(chunk)
+
+                result = await db.execute(_discrepancy_query(lo, hi))
+                found = []
+                for row in result:
+                    detail = {
+                        "user_id": row.user_id,
+                        "balance": row.balance,
+                        "ledger_balance": row.ledger_balance,
+                        "difference": row.balance - row.ledger_balance
+                    }
+                    found.append(row.user_id)
+                    report["discrepancies"] += 1
+                    report["total_difference"] += detail["difference"]
+                    if len(report["details"]) < settings.LEDGER_RECONCILE_REPORT_LIMIT:
+                        report["details"].append(detail)
+                    if on_discrepancy is not None:
+                        on_discrepancy(detail)
+
+                if fix and found:
+                    report["corrected"] += await _correct(db, lo, hi, found)
+    finally:
+        _running = False
+        report["finished_at"] = datetime.utcnow()
+        last_report = report
+
+    logger.info(
+        f"积分对账完成: 检查用户 {report['users_checked']} 个，"
+        f"不一致 {report['discrepancies']} 个（差额合计 {report['total_difference']}），"
+        f"已调整 {report['corrected']} 个"
+    )
+    return report
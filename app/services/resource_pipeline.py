@@ -0,0 +1,71 @@
+"""
+资源上传后处理流水线
+缩略图生成、正文提取等后台步骤统一从这里调度
+"""
+import asyncio
+import logging
+from typing import List
+
+from sqlalchemy import update
+
+from app.core.database import AsyncSessionLocal
+from app.models.resource import Resource
+from app.services.file_service import inspect_file
+from app.services.preview_service import generate_thumbnail
+from app.services.storage_service import storage
+from app.services.extraction_service import extract_resource_text
+from app.services.bounty_service import match_new_resources
+from app.services.worker_pool import run_in_process
+
+logger = logging.getLogger(__name__)
+
+
+async def inspect_resource_file(resource_id: int, file_path: str) -> None:
+    """计算文件哈希、识别MIME类型并保存"""
+    try:
+        file_hash, mime_type = await run_in_process(inspect_file, file_path)
+    except Exception as e:
+        logger.warning(f"资源 {resource_id} 文件检查失败: {e}")
+        return
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(Resource)
+            .where(Resource.id == resource_id)
+            .values(file_hash=file_hash, mime_type=mime_type)
+        )
+        await db.commit()
+
+
+async def _process_file(resource_id: int, file_key: str, file_type: str) -> None:
+    try:
+        # 对象存储时只下载一份本地副本，供各步骤共用
+        async with storage.local_copy(file_key) as local_path:
+            await asyncio.gather(
+                inspect_resource_file(resource_id, local_path),
+                generate_thumbnail(resource_id, file_key, file_type, local_path),
+                extract_resource_text(resource_id, local_path, file_type)
+            )
+    except Exception as e:
+        logger.warning(f"资源 {resource_id} 后台处理失败: {e}")
+
+
+async def process_uploaded_resource(resource_id: int, file_key: str, file_type: str) -> None:
+    """上传完成后的后台处理（作为后台任务调用，各步骤并行在进程池中执行）"""
+    await _process_file(resource_id, file_key, file_type)
+    # 正文提取完成后再与进行中的悬赏匹配
+    await match_new_resources([resource_id])
+
+
+async def process_uploaded_resources(resources: List[tuple]) -> None:
+    """批量上传后的后台处理，所有文件的各步骤一起提交到进程池
+
+    Args:
+        resources: (资源ID, 存储键, 文件类型) 列表
+    """
+    await asyncio.gather(*[
+        _process_file(resource_id, file_key, file_type)
+        for resource_id, file_key, file_type in resources
+    ])
+    # 整批资源一次与进行中的悬赏匹配
+    await match_new_resources([resource_id for resource_id, _, _ in resources])
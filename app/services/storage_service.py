@@ -0,0 +1,493 @@
+"""
+文件存储服务
+资源文件通过存储键（如 resources/xxx.pdf）读写，后端可以是本地磁盘或S3兼容对象存储（MinIO等）
+"""
+import asyncio
+import datetime
+import hashlib
+import hmac
+import os
+import shutil
+import tempfile
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional
+from urllib.parse import quote, urlsplit
+from xml.etree import ElementTree
+
+import aiofiles
+import httpx
+from fastapi.responses import FileResponse, RedirectResponse, Response
+
+from app.core.config import settings
+
+# 流式读写的块大小
+CHUNK_SIZE = 64 * 1024
+
+
+class StorageError(Exception):
+    """存储后端操作失败"""
+
+
+class StoredObject:
+    """存储对象的元信息"""
+
+    def __init__(self, key: str, size: int, content_type: Optional[str] = None,
+                 modified_at: Optional[datetime.datetime] = None):
+        self.key = key
+        self.size = size
+        self.content_type = content_type
+        self.modified_at = modified_at  # 最后修改时间（UTC）
+
+
+def build_storage_key(subfolder: str, file_type: str) -> str:
+    """生成唯一存储键"""
+    return f"{subfolder}/{uuid.uuid4().hex}.{file_type}"
+
+
+async def iter_local_file(file_path: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """分块读取本地文件"""
+    async with aiofiles.open(file_path, "rb") as source:
+        while True:
+            data = await source.read(chunk_size)
+            if not data:
+                break
+            yield data
+
+
+def _content_disposition(filename: str) -> str:
+    return f"attachment; filename*=utf-8''{quote(filename)}"
+
+
+class StorageBackend:
+    """存储后端基类"""
+
+    # 预签名地址有效期（秒），重定向响应的缓存时间不能超过它
+    presign_expires = 0
+
+    async def put(self, key: str, chunks: AsyncIterable[bytes], content_type: Optional[str] = None) -> int:
+        """流式写入对象，返回写入的字节数"""
+        raise NotImplementedError
+
+    async def put_file(self, key: str, local_path: str, content_type: Optional[str] = None) -> int:
+        """把本地文件存入存储（源文件保留，由调用方删除）"""
+        return await self.put(key, iter_local_file(local_path), content_type)
+
+    def get(self, key: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """流式读取对象"""
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> bool:
+        """删除对象，返回对象是否存在"""
+        raise NotImplementedError
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        """获取对象元信息，不存在时返回None"""
+        raise NotImplementedError
+
+    def presigned_url(self, key: str, expires_in: Optional[int] = None, filename: Optional[str] = None) -> str:
+        """生成客户端可直接下载的地址"""
+        raise NotImplementedError
+
+    def list(self, prefix: str) -> AsyncIterator[StoredObject]:
+        """按存储键顺序列出前缀下的全部对象"""
+        raise NotImplementedError
+
+    @asynccontextmanager
+    async def local_copy(self, key: str):
+        """获取对象的本地文件路径（供进程池处理），退出时清理临时文件"""
+        suffix = os.path.splitext(key)[1]
+        temp_dir = os.path.join(settings.UPLOAD_DIR, "tmp")
+        os.makedirs(temp_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(suffix=suffix, dir=temp_dir)
+        os.close(fd)
+        try:
+            async with aiofiles.open(temp_path, "wb") as target:
+                async for data in self.get(key):
+                    await target.write(data)
+            yield temp_path
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    async def file_response(
+        self,
+        key: str,
+        filename: Optional[str] = None,
+        media_type: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+        cache_max_age: Optional[int] = None
+    ) -> Response:
+        """
+        返回文件下载响应（对象存储重定向到预签名地址，不经过应用节点）
+
+        cache_max_age 为内容不变的文件设置客户端缓存时间；重定向指向会过期的预签名地址，
+        最多缓存预签名有效期的一半，且不标记 immutable
+        """
+        headers = dict(headers or {})
+        if cache_max_age:
+            max_age = min(cache_max_age, self.presign_expires // 2)
+            headers["Cache-Control"] = f"public, max-age={max_age}" if max_age > 0 else "no-cache"
+        return RedirectResponse(self.presigned_url(key, filename=filename), headers=headers)
+
+    async def close(self) -> None:
+        """释放连接等资源"""
+
+
+class LocalStorage(StorageBackend):
+    """本地磁盘存储，文件通过 /uploads 静态目录访问"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        """存储键对应的本地路径（兼容旧数据中保存的完整路径）"""
+        root = os.path.normpath(self.root)
+        normalized = os.path.normpath(key)
+        if os.path.isabs(normalized) or normalized.startswith(root + os.sep):
+            return normalized
+        return os.path.join(root, normalized)
+
+    def _relative_key(self, key: str) -> str:
+        return os.path.relpath(self.path(key), self.root).replace(os.sep, "/")
+
+    async def put(self, key: str, chunks: AsyncIterable[bytes], content_type: Optional[str] = None) -> int:
+        file_path = self.path(key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        part_path = f"{file_path}.part"
+        size = 0
+        try:
+            async with aiofiles.open(part_path, "wb") as target:
+                async for data in chunks:
+                    await target.write(data)
+                    size += len(data)
+            os.replace(part_path, file_path)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        return size
+
+    async def put_file(self, key: str, local_path: str, content_type: Optional[str] = None) -> int:
+        file_path = self.path(key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        try:
+            # 同一文件系统内用硬链接，不复制数据
+            os.link(local_path, file_path)
+        except OSError:
+            shutil.copyfile(local_path, file_path)
+        return os.path.getsize(file_path)
+
+    async def get(self, key: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        async for data in iter_local_file(self.path(key), chunk_size):
+            yield data
+
+    async def delete(self, key: str) -> bool:
+        file_path = self.path(key)
+        try:
+            os.remove(file_path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            size = os.path.getsize(self.path(key))
+        except OSError:
+            return None
+        return StoredObject(key, size)
+
+    def presigned_url(self, key: str, expires_in: Optional[int] = None, filename: Optional[str] = None) -> str:
+        return f"/uploads/{quote(self._relative_key(key))}"
+
+    @staticmethod
+    def _scan_directory(directory: str, prefix: str) -> List[StoredObject]:
+        objects = []
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            return objects
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                stat = entry.stat()
+                objects.append(StoredObject(
+                    f"{prefix}{entry.name}",
+                    stat.st_size,
+                    modified_at=datetime.datetime.utcfromtimestamp(stat.st_mtime)
+                ))
+        return sorted(objects, key=lambda stored: stored.key)
+
+    async def list(self, prefix: str) -> AsyncIterator[StoredObject]:
+        # 前缀按目录处理（如 resources/），目录扫描放到线程中执行，不阻塞事件循环
+        prefix = prefix.rstrip("/") + "/"
+        objects = await asyncio.to_thread(self._scan_directory, self.path(prefix), prefix)
+        for stored in objects:
+            yield stored
+
+    @asynccontextmanager
+    async def local_copy(self, key: str):
+        yield self.path(key)
+
+    async def file_response(
+        self,
+        key: str,
+        filename: Optional[str] = None,
+        media_type: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+        cache_max_age: Optional[int] = None
+    ) -> Response:
+        headers = dict(headers or {})
+        if cache_max_age:
+            headers["Cache-Control"] = f"public, max-age={cache_max_age}, immutable"
+        return FileResponse(path=self.path(key), filename=filename, media_type=media_type, headers=headers)
+
+
+class S3Storage(StorageBackend):
+    """S3兼容对象存储（AWS Signature V4，路径风格地址，适用于MinIO等）"""
+
+    # 分片上传的分片大小（S3要求除最后一片外不小于5MB）
+    PART_SIZE = 8 * 1024 * 1024
+
+    def __init__(self, endpoint_url: str, bucket: str, access_key: str, secret_key: str,
+                 region: str = "us-east-1", presign_expires: int = 3600):
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.host = urlsplit(self.endpoint_url).netloc
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.presign_expires = presign_expires
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=10.0))
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # ---- 签名 ----
+
+    def _object_path(self, key: str) -> str:
+        return f"/{self.bucket}/{quote(key, safe='/-_.~')}"
+
+    def _signing_key(self, date_stamp: str) -> bytes:
+        key = f"AWS4{self.secret_key}".encode("utf-8")
+        for part in (date_stamp, self.region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode("utf-8"), hashlib.sha256).digest()
+        return key
+
+    @staticmethod
+    def _canonical_query(params: Dict[str, str]) -> str:
+        return "&".join(
+            f"{quote(name, safe='-_.~')}={quote(str(value), safe='-_.~')}"
+            for name, value in sorted(params.items())
+        )
+
+    def _signature(self, method: str, path: str, query: str, headers: Dict[str, str],
+                   amz_date: str, payload_hash: str) -> str:
+        signed_headers = ";".join(sorted(headers))
+        canonical_headers = "".join(f"{name}:{headers[name].strip()}\n" for name in sorted(headers))
+        canonical_request = "\n".join([method, path, query, canonical_headers, signed_headers, payload_hash])
+        scope = f"{amz_date[:8]}/{self.region}/s3/aws4_request"
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256", amz_date, scope,
+            hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()
+        ])
+        return hmac.new(self._signing_key(amz_date[:8]), string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def _signed_request(self, method: str, path: str, params: Optional[Dict[str, str]] = None,
+                        content=None, content_type: Optional[str] = None) -> httpx.Request:
+        params = params or {}
+        amz_date = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+        query = self._canonical_query(params)
+        # 请求体不参与签名，上传时可以流式发送
+        headers = {
+            "host": self.host,
+            "x-amz-content-sha256": "UNSIGNED-PAYLOAD",
+            "x-amz-date": amz_date,
+        }
+        signature = self._signature(method, path, query, headers, amz_date, "UNSIGNED-PAYLOAD")
+        headers["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{amz_date[:8]}/{self.region}/s3/aws4_request, "
+            f"SignedHeaders={';'.join(sorted(h for h in headers if h != 'authorization'))}, "
+            f"Signature={signature}"
+        )
+        if content_type:
+            headers["content-type"] = content_type
+        url = f"{self.endpoint_url}{path}" + (f"?{query}" if query else "")
+        return httpx.Request(method, url, headers=headers, content=content)
+
+    async def _send(self, method: str, key: str, params: Optional[Dict[str, str]] = None,
+                    content=None, content_type: Optional[str] = None, ok=(200, 204)) -> httpx.Response:
+        request = self._signed_request(method, self._object_path(key), params, content, content_type)
+        response = await self.client.send(request)
+        if response.status_code not in ok:
+            raise StorageError(f"{method} {key} 失败: HTTP {response.status_code} {response.text[:200]}")
+        return response
+
+    async def ensure_bucket(self) -> None:
+        """存储桶不存在时创建（部署初始化用）"""
+        path = f"/{self.bucket}"
+        response = await self.client.send(self._signed_request("HEAD", path))
+        if response.status_code == 404:
+            response = await self.client.send(self._signed_request("PUT", path, content=b""))
+        if response.status_code not in (200, 204):
+            raise StorageError(f"创建存储桶失败: HTTP {response.status_code}")
+
+    # ---- 对象操作 ----
+
+    async def put(self, key: str, chunks: AsyncIterable[bytes], content_type: Optional[str] = None) -> int:
+        """小文件直接PUT；超过一个分片大小时改用分片上传，内存中最多保留一个分片"""
+        buffer = bytearray()
+        upload_id = None
+        parts: List[tuple] = []
+        size = 0
+        try:
+            async for data in chunks:
+                buffer += data
+                size += len(data)
+                if len(buffer) >= self.PART_SIZE:
+                    if upload_id is None:
+                        upload_id = await self._create_multipart(key, content_type)
+                    parts.append(await self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+                    buffer = bytearray()
+
+            if upload_id is None:
+                await self._send("PUT", key, content=bytes(buffer), content_type=content_type)
+                return size
+
+            if buffer:
+                parts.append(await self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+            await self._complete_multipart(key, upload_id, parts)
+            return size
+        except BaseException:
+            if upload_id is not None:
+                try:
+                    await self._send("DELETE", key, params={"uploadId": upload_id})
+                except Exception:
+                    pass
+            raise
+
+    async def _create_multipart(self, key: str, content_type: Optional[str]) -> str:
+        response = await self._send("POST", key, params={"uploads": ""}, content=b"", content_type=content_type)
+        root = ElementTree.fromstring(response.content)
+        for element in root.iter():
+            if element.tag.rsplit("}", 1)[-1] == "UploadId":
+                return element.text
+        raise StorageError(f"创建分片上传失败: {key}")
+
+    async def _upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> tuple:
+        response = await self._send(
+            "PUT", key, params={"partNumber": str(part_number), "uploadId": upload_id}, content=data
+        )
+        return part_number, response.headers.get("etag", "")
+
+    async def _complete_multipart(self, key: str, upload_id: str, parts: List[tuple]) -> None:
+        body = "<CompleteMultipartUpload>" + "".join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>" for number, etag in parts
+        ) + "</CompleteMultipartUpload>"
+        response = await self._send(
+            "POST", key, params={"uploadId": upload_id}, content=body.encode("utf-8"), content_type="application/xml"
+        )
+        # 合并失败时S3也可能返回200，错误信息在响应体中
+        if b"<Error>" in response.content:
+            raise StorageError(f"合并分片失败: {key} {response.text[:200]}")
+
+    async def get(self, key: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        request = self._signed_request("GET", self._object_path(key))
+        response = await self.client.send(request, stream=True)
+        try:
+            if response.status_code != 200:
+                raise StorageError(f"GET {key} 失败: HTTP {response.status_code}")
+            async for data in response.aiter_bytes(chunk_size):
+                yield data
+        finally:
+            await response.aclose()
+
+    async def delete(self, key: str) -> bool:
+        if await self.stat(key) is None:
+            return False
+        await self._send("DELETE", key)
+        return True
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        response = await self._send("HEAD", key, ok=(200, 404))
+        if response.status_code == 404:
+            return None
+        return StoredObject(
+            key,
+            int(response.headers.get("content-length", 0)),
+            response.headers.get("content-type")
+        )
+
+    async def list(self, prefix: str) -> AsyncIterator[StoredObject]:
+        path = f"/{self.bucket}"
+        params = {"list-type": "2", "prefix": prefix}
+        while True:
+            response = await self.client.send(self._signed_request("GET", path, params))
+            if response.status_code != 200:
+                raise StorageError(f"列出对象失败: HTTP {response.status_code}")
+
+            root = ElementTree.fromstring(response.content)
+            token = None
+            truncated = False
+            for element in root:
+                tag = element.tag.rsplit("}", 1)[-1]
+                if tag == "Contents":
+                    fields = {child.tag.rsplit("}", 1)[-1]: child.text for child in element}
+                    yield StoredObject(
+                        fields["Key"],
+                        int(fields.get("Size") or 0),
+                        modified_at=datetime.datetime.strptime(fields["LastModified"][:19], "%Y-%m-%dT%H:%M:%S")
+                    )
+                elif tag == "NextContinuationToken":
+                    token = element.text
+                elif tag == "IsTruncated":
+                    truncated = element.text == "true"
+
+            if not truncated or not token:
+                break
+            params = {"list-type": "2", "prefix": prefix, "continuation-token": token}
+
+    def presigned_url(self, key: str, expires_in: Optional[int] = None, filename: Optional[str] = None) -> str:
+        amz_date = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+        path = self._object_path(key)
+        params = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.access_key}/{amz_date[:8]}/{self.region}/s3/aws4_request",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(expires_in or self.presign_expires),
+            "X-Amz-SignedHeaders": "host",
+        }
+        if filename:
+            params["response-content-disposition"] = _content_disposition(filename)
+        query = self._canonical_query(params)
+        signature = self._signature("GET", path, query, {"host": self.host}, amz_date, "UNSIGNED-PAYLOAD")
+        return f"{self.endpoint_url}{path}?{query}&X-Amz-Signature={signature}"
+
+
+def create_storage(archive: bool = False) -> StorageBackend:
+    """
+    根据配置创建存储后端
+
+    Args:
+        archive: 是否为冷数据归档存储（本地为 ARCHIVE_DIR，对象存储可使用单独的低成本存储桶）
+    """
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            bucket=(settings.S3_ARCHIVE_BUCKET or settings.S3_BUCKET) if archive else settings.S3_BUCKET,
+            access_key=settings.S3_ACCESS_KEY,
+            secret_key=settings.S3_SECRET_KEY,
+            region=settings.S3_REGION,
+            presign_expires=settings.S3_PRESIGN_EXPIRES
+        )
+    return LocalStorage(settings.ARCHIVE_DIR if archive else settings.UPLOAD_DIR)
+
+
+# 创建全局存储实例
+storage = create_storage()
@@ -0,0 +1,286 @@
+"""
+冷热分层存储服务
+长期无人下载的资源文件压缩后移入归档存储，下次下载时自动恢复到热存储；
+切换后旧层的副本不立即删除，保留 COLD_TIER_GRACE_HOURS 供进行中的下载和恢复读取，之后由垃圾回收清理
+"""
+import asyncio
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, update, and_, exists
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.resource import Resource, Download
+from app.services.storage_service import storage, create_storage
+from app.services.worker_pool import run_in_process
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# 本身已压缩的格式，归档时不再压缩
+PRECOMPRESSED_TYPES = {"jpg", "jpeg", "png", "docx", "pptx", "xlsx"}
+
+# 压缩后至少节省的比例，达不到时按原样归档
+MIN_SAVING_RATIO = 0.05
+
+_CODEC_SUFFIXES = {"zstd": ".zst", "gzip": ".gz", "none": ""}
+
+# 归档存储实例（本地为 ARCHIVE_DIR，对象存储为 S3_ARCHIVE_BUCKET）
+archive_storage = create_storage(archive=True)
+
+# 正在进行的恢复任务，同一资源的并发下载共用一次恢复
+_restore_tasks: Dict[int, asyncio.Task] = {}
+
+
+def _temp_path(suffix: str) -> str:
+    temp_dir = os.path.join(settings.UPLOAD_DIR, "tmp")
+    os.makedirs(temp_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=temp_dir)
+    os.close(fd)
+    return path
+
+
+def get_archive_key(file_key: str, codec: str) -> str:
+    """归档存储键"""
+    return f"cold/{file_key.lstrip('/')}{_CODEC_SUFFIXES[codec]}"
+
+
+def get_archive_codec(archive_key: str) -> str:
+    """根据归档存储键判断压缩方式"""
+    for codec, suffix in _CODEC_SUFFIXES.items():
+        if suffix and archive_key.endswith(suffix):
+            return codec
+    return "none"
+
+
+def compress_file(source_path: str, target_path: str, level: int) -> Tuple[str, int]:
+    """
+    压缩文件（在子进程中执行），安装了zstandard时使用zstd，否则使用gzip
+
+    Returns:
+        Tuple[str, int]: (压缩方式, 压缩后字节数)
+    """
+    with open(source_path, "rb") as source, open(target_path, "wb") as target:
+        if zstandard is not None:
+            zstandard.ZstdCompressor(level=level).copy_stream(source, target)
+            codec = "zstd"
+        else:
+            with gzip.GzipFile(fileobj=target, mode="wb", compresslevel=min(level, 9)) as compressed:
+                shutil.copyfileobj(source, compressed, 1024 * 1024)
+            codec = "gzip"
+    return codec, os.path.getsize(target_path)
+
+
+def decompress_file(source_path: str, target_path: str, codec: str) -> int:
+    """解压文件（在子进程中执行），返回解压后字节数"""
+    with open(source_path, "rb") as source, open(target_path, "wb") as target:
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("未安装zstandard，无法恢复zstd归档")
+            zstandard.ZstdDecompressor().copy_stream(source, target)
+        elif codec == "gzip":
+            with gzip.GzipFile(fileobj=source, mode="rb") as compressed:
+                shutil.copyfileobj(compressed, target, 1024 * 1024)
+        else:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+    return os.path.getsize(target_path)
+
+
+async def archive_resource(resource_id: int, file_key: str, file_type: str) -> Optional[Tuple[int, int]]:
+    """
+    把资源文件移入归档存储
+
+    Returns:
+        Optional[Tuple[int, int]]: (原始字节数, 归档后字节数)，资源状态已变化时返回None
+    """
+    compressed_path = None
+    try:
+        async with storage.local_copy(file_key) as local_path:
+            original_size = os.path.getsize(local_path)
+            codec, archived_path, archived_size = "none", local_path, original_size
+
+            if file_type not in PRECOMPRESSED_TYPES:
+                compressed_path = _temp_path(".cold")
+                compressed_codec, compressed_size = await run_in_process(
+                    compress_file, local_path, compressed_path, settings.ARCHIVE_COMPRESSION_LEVEL
+                )
+                if compressed_size <= original_size * (1 - MIN_SAVING_RATIO):
+                    codec, archived_path, archived_size = compressed_codec, compressed_path, compressed_size
+
+            archive_key = get_archive_key(file_key, codec)
+            await archive_storage.put_file(archive_key, archived_path)
+    finally:
+        if compressed_path and os.path.exists(compressed_path):
+            os.remove(compressed_path)
+
+    # 条件更新，期间资源被恢复或删除时放弃本次归档；热存储中的文件留给垃圾回收在宽限期后清理
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(Resource)
+            .where(Resource.id == resource_id, Resource.storage_tier == "hot")
+            .values(storage_tier="cold", archive_key=archive_key, tier_changed_at=datetime.utcnow())
+        )
+        await db.commit()
+
+    if result.rowcount != 1:
+        await archive_storage.delete(archive_key)
+        return None
+
+    return original_size, archived_size
+
+
+async def copy_from_archive(file_key: str, archive_key: str) -> None:
+    """把归档副本解压后写回热存储"""
+    restored_path = _temp_path(os.path.splitext(file_key)[1])
+    try:
+        async with archive_storage.local_copy(archive_key) as archived_path:
+            await run_in_process(
+                decompress_file, archived_path, restored_path, get_archive_codec(archive_key)
+            )
+        await storage.put_file(file_key, restored_path)
+    finally:
+        if os.path.exists(restored_path):
+            os.remove(restored_path)
+
+
+async def _restore(resource_id: int) -> bool:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Resource.file_path, Resource.storage_tier, Resource.archive_key)
+            .where(Resource.id == resource_id)
+        )
+        row = result.one_or_none()
+    if row is None or row.storage_tier != "cold":
+        return False
+
+    await copy_from_archive(row.file_path, row.archive_key)
+
+    # 保留归档副本和 archive_key：其他进程中的恢复可能仍在读取，宽限期后由垃圾回收清理
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(Resource)
+            .where(Resource.id == resource_id, Resource.storage_tier == "cold")
+            .values(storage_tier="hot", tier_changed_at=datetime.utcnow())
+        )
+        await db.commit()
+
+    logger.info(f"资源 {resource_id} 已从归档存储恢复")
+    return True
+
+
+async def restore_resource(resource_id: int) -> bool:
+    """
+    把归档的资源文件恢复到热存储
+
+    Returns:
+        bool: 是否执行了恢复（资源本来就是热数据时返回False）
+    """
+    task = _restore_tasks.get(resource_id)
+    if task is None:
+        task = asyncio.create_task(_restore(resource_id))
+        _restore_tasks[resource_id] = task
+        task.add_done_callback(lambda _: _restore_tasks.pop(resource_id, None))
+    # 请求被取消时不中断恢复，其他等待者仍可使用结果
+    return await asyncio.shield(task)
+
+
+async def ensure_hot(resources: List[Resource]) -> None:
+    """下载前确保资源文件在热存储中（归档的资源就地恢复）"""
+    cold = [resource for resource in resources if resource.storage_tier == "cold"]
+    if not cold:
+        return
+
+    try:
+        await asyncio.gather(*[restore_resource(resource.id) for resource in cold])
+    except Exception as e:
+        logger.error(f"归档资源恢复失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="文件恢复失败，请稍后重试"
+        )
+
+    # 只同步内存中的状态，不产生额外的更新
+    for resource in cold:
+        set_committed_value(resource, "storage_tier", "hot")
+
+
+async def find_missing_files(resources: List[Resource]) -> List[int]:
+    """检查资源文件是否存在（已归档的检查归档存储），返回文件缺失的资源ID"""
+    async def _exists(resource: Resource) -> bool:
+        if resource.storage_tier == "cold" and resource.archive_key:
+            return await archive_storage.stat(resource.archive_key) is not None
+        return await storage.stat(resource.file_path) is not None
+
+    found = await asyncio.gather(*[_exists(resource) for resource in resources])
+    return [resource.id for resource, exists_ in zip(resources, found) if not exists_]
+
+
+async def run_tiering(batch_size: Optional[int] = None) -> dict:
+    """
+    冷数据归档（定时任务）
+
+    下载次数低于阈值、且最近一段时间内既没有新上传也没有被下载的资源移入归档存储
+
+    Returns:
+        dict: 归档的资源数和节省的字节数
+    """
+    batch_size = batch_size or settings.COLD_TIER_BATCH_SIZE
+    cutoff = datetime.utcnow() - timedelta(days=settings.COLD_TIER_IDLE_DAYS)
+    recently_downloaded = exists().where(
+        Download.resource_id == Resource.id,
+        Download.created_at >= cutoff
+    )
+
+    stats = {"archived": 0, "original_bytes": 0, "archived_bytes": 0, "failed": 0}
+    last_id = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Resource.id, Resource.file_path, Resource.file_type)
+                .where(and_(
+                    Resource.id > last_id,
+                    Resource.is_active == True,
+                    Resource.storage_tier == "hot",
+                    Resource.created_at < cutoff,
+                    Resource.download_count < settings.COLD_TIER_MAX_DOWNLOADS,
+                    ~recently_downloaded
+                ))
+                .order_by(Resource.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+
+        if not rows:
+            break
+
+        for row in rows:
+            try:
+                sizes = await archive_resource(row.id, row.file_path, row.file_type)
+            except Exception as e:
+                logger.warning(f"资源 {row.id} 归档失败: {e}")
+                stats["failed"] += 1
+                continue
+            if sizes:
+                stats["archived"] += 1
+                stats["original_bytes"] += sizes[0]
+                stats["archived_bytes"] += sizes[1]
+        last_id = rows[-1].id
+
+    if stats["archived"] or stats["failed"]:
+        logger.info(
+            f"冷数据归档完成: 归档 {stats['archived']} 个资源，"
+            f"{stats['original_bytes']} -> {stats['archived_bytes']} 字节，失败 {stats['failed']} 个"
+        )
+    return stats
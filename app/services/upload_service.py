@@ -0,0 +1,245 @@
+"""
+可续传分片上传服务
+分片按偏移量直接写入磁盘临时文件，全部接收后转为正式资源
+"""
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict
+
+import aiofiles
+from fastapi import HTTPException, status
+from starlette.requests import ClientDisconnect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.upload import UploadSession
+from app.models.resource import Resource
+from app.services.file_service import validate_file_meta, delete_file
+from app.services.storage_service import storage, build_storage_key
+from app.services.user_stats_service import bump_stats
+
+logger = logging.getLogger(__name__)
+
+# 同一会话的分片串行写入
+_session_locks: Dict[str, asyncio.Lock] = {}
+
+
+def _get_temp_dir() -> str:
+    temp_dir = os.path.join(settings.UPLOAD_DIR, "tmp")
+    os.makedirs(temp_dir, exist_ok=True)
+    return temp_dir
+
+
+def _new_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+
+
+async def create_upload_session(db: AsyncSession, user_id: int, data) -> UploadSession:
+    """创建上传会话并预先创建空的临时文件"""
+    validate_file_meta(data.file_name, data.file_size)
+    
+    upload_id = uuid.uuid4().hex
+    temp_path = os.path.join(_get_temp_dir(), f"{upload_id}.part")
+    async with aiofiles.open(temp_path, "wb"):
+        pass
+    
+    session = UploadSession(
+        id=upload_id,
+        user_id=user_id,
+        file_name=data.file_name,
+        file_type=data.file_name.split('.')[-1].lower(),
+        file_size=data.file_size,
+        received_bytes=0,
+        temp_path=temp_path,
+        title=data.title,
+        description=data.description or "",
+        grade=data.grade or "",
+        subject=data.subject or "",
+        resource_type=data.resource_type,
+        expires_at=_new_expiry()
+    )
+    db.add(session)
+    await db.commit()
+    await db.refresh(session)
+    return session
+
+
+async def get_upload_session(db: AsyncSession, user_id: int, upload_id: str) -> UploadSession:
+    """获取当前用户的上传会话（不存在或已过期时抛出异常）"""
+    result = await db.execute(
+        select(UploadSession).where(
+            UploadSession.id == upload_id,
+            UploadSession.user_id == user_id
+        )
+    )
+    session = result.scalar_one_or_none()
+    
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="上传会话不存在"
+        )
+    
+    if session.expires_at < datetime.utcnow():
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="上传会话已过期，请重新上传"
+        )
+    
+    return session
+
+
+async def append_chunk(
+    db: AsyncSession,
+    session: UploadSession,
+    offset: int,
+    chunks: AsyncIterator[bytes]
+) -> int:
+    """
+    将分片写入临时文件
+    
+    连接中断时保留已写入的部分，客户端查询偏移量后可从断点继续
+    
+    Args:
+        db: 数据库会话
+        session: 上传会话
+        offset: 分片起始偏移量（必须等于已接收字节数）
+        chunks: 请求体数据流
+    
+    Returns:
+        int: 写入后的偏移量
+    """
+    lock = _session_locks.setdefault(session.id, asyncio.Lock())
+    async with lock:
+        await db.refresh(session)
+        if offset != session.received_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"偏移量不匹配，当前已接收{session.received_bytes}字节"
+            )
+        
+        max_end = min(session.file_size, offset + settings.UPLOAD_CHUNK_MAX_SIZE)
+        written = 0
+        interrupted = None
+        async with aiofiles.open(session.temp_path, "r+b") as buffer:
+            await buffer.seek(offset)
+            try:
+                async for data in chunks:
+                    if offset + written + len(data) > max_end:
+                        interrupted = HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail="分片超出文件大小或单个分片上限"
+                        )
+                        data = data[:max_end - offset - written]
+                    await buffer.write(data)
+                    written += len(data)
+                    if interrupted:
+                        break
+            except ClientDisconnect:
+                # 客户端断开连接：保存已收到的部分
+                logger.info(f"上传会话 {session.id} 分片中断，已接收{written}字节")
+            await buffer.truncate(offset + written)
+        
+        new_offset = offset + written
+        await db.execute(
+            update(UploadSession)
+            .where(UploadSession.id == session.id)
+            .values(received_bytes=new_offset, expires_at=_new_expiry())
+        )
+        await db.commit()
+        await db.refresh(session)
+    
+    if interrupted:
+        raise interrupted
+    return new_offset
+
+
+async def finalize_upload(db: AsyncSession, session: UploadSession) -> Resource:
+    """全部分片接收完成后，将临时文件转为正式资源（与删除会话在同一事务中）"""
+    if session.received_bytes != session.file_size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"文件尚未上传完成（{session.received_bytes}/{session.file_size}字节）"
+        )
+    
+    # 临时文件存入存储后端（本地存储为硬链接）；失败时保留临时文件以便重试
+    storage_key = build_storage_key("resources", session.file_type)
+    try:
+        await storage.put_file(storage_key, session.temp_path)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="文件保存失败"
+        )
+    
+    try:
+        resource = Resource(
+            uploader_id=session.user_id,
+            title=session.title,
+            description=session.description or "",
+            file_name=os.path.basename(storage_key),
+            file_path=storage_key,
+            file_size=session.file_size,
+            file_type=session.file_type,
+            grade=session.grade or "",
+            subject=session.subject or "",
+            resource_type=session.resource_type
+        )
+        db.add(resource)
+        await db.delete(session)
+        await bump_stats(db, session.user_id, total_uploads=1)
+        await db.commit()
+        await db.refresh(resource)
+    except Exception:
+        await db.rollback()
+        await storage.delete(storage_key)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="资源上传失败"
+        )
+    
+    delete_file(session.temp_path)
+    _session_locks.pop(session.id, None)
+    return resource
+
+
+async def abort_upload(db: AsyncSession, session: UploadSession) -> None:
+    """取消上传，删除临时文件"""
+    delete_file(session.temp_path)
+    await db.delete(session)
+    await db.commit()
+    _session_locks.pop(session.id, None)
+
+
+async def purge_expired_upload_sessions() -> int:
+    """
+    清理过期的上传会话及其临时文件（定时任务）
+    
+    Returns:
+        int: 清理的会话数量
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(UploadSession.id, UploadSession.temp_path)
+            .where(UploadSession.expires_at < datetime.utcnow())
+        )
+        expired = result.all()
+        if not expired:
+            return 0
+        
+        for upload_id, temp_path in expired:
+            delete_file(temp_path)
+            _session_locks.pop(upload_id, None)
+        
+        await db.execute(
+            delete(UploadSession).where(UploadSession.id.in_([upload_id for upload_id, _ in expired]))
+        )
+        await db.commit()
+    
+    logger.info(f"清理过期上传会话 {len(expired)} 个")
+    return len(expired)
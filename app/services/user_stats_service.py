@@ -0,0 +1,175 @@
+"""
+用户统计服务
+user_stats 表由各写入路径在同一事务中增量累加，/users/stats 只需按主键读取一行；
+历史数据或统计漂移时用 rebuild_user_stats 一次性分组重算
+"""
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Mapping
+
+from sqlalchemy import select, delete, func, case, literal, and_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import AsyncSessionLocal
+from app.models.bounty import Bounty
+from app.models.resource import Resource, Download, PointTransaction, PointBalanceSnapshot
+from app.models.user import User
+from app.models.user_stats import UserStatistics
+from app.services.leaderboard_service import leaderboard_service, CONTRIBUTION_TYPES
+
+STAT_FIELDS = (
+    "total_uploads",
+    "total_downloads",
+    "total_points_earned",
+    "total_points_spent",
+    "contribution_points",
+    "bounties_created",
+    "bounties_won"
+)
+
+
+def new_deltas() -> Dict[int, Counter]:
+    """按用户累计的统计增量：{user_id: Counter(字段=增量)}"""
+    return defaultdict(Counter)
+
+
+def ledger_deltas(transactions: Iterable[Mapping], deltas: Dict[int, Counter] = None) -> Dict[int, Counter]:
+    """把积分流水（含 user_id、transaction_type、points_change）折算为获得/消耗积分和贡献积分的增量"""
+    if deltas is None:
+        deltas = new_deltas()
+    for transaction in transactions:
+        change = transaction["points_change"]
+        if change > 0:
+            deltas[transaction["user_id"]]["total_points_earned"] += change
+            if transaction.get("transaction_type") in CONTRIBUTION_TYPES:
+                deltas[transaction["user_id"]]["contribution_points"] += change
+        elif change < 0:
+            deltas[transaction["user_id"]]["total_points_spent"] -= change
+    return deltas
+
+
+def _upsert(db: AsyncSession):
+    table = UserStatistics.__table__
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id],
+        set_={
+            **{field: table.c[field] + stmt.excluded[field] for field in STAT_FIELDS},
+            "updated_at": func.now()
+        }
+    )
+
+
+async def increment_stats(db: AsyncSession, deltas: Mapping[int, Mapping[str, int]]) -> None:
+    """
+    累加统计增量（不存在的行直接插入），不提交事务，由调用方与业务写入一起提交；
+    贡献积分和上传数的增量在提交后同步到排行榜
+    """
+    rows = [
+        {"user_id": user_id, **{field: changes.get(field, 0) for field in STAT_FIELDS}}
+        for user_id, changes in deltas.items()
+        if any(changes.values())
+    ]
+    if rows:
+        await db.execute(_upsert(db), rows)
+        leaderboard_service.stage(db, deltas)
+
+
+async def bump_stats(db: AsyncSession, user_id: int, **changes: int) -> None:
+    """累加单个用户的统计增量（不提交事务）"""
+    await increment_stats(db, {user_id: changes})
+
+
+async def record_ledger(db: AsyncSession, transactions: Iterable[Mapping]) -> None:
+    """按积分流水累加获得/消耗积分（不提交事务）"""
+    await increment_stats(db, ledger_deltas(transactions))
+
+
+def _grouped_counts():
+    """各来源表按用户分组的聚合子查询"""
+    uploads = (
+        select(Resource.uploader_id.label("user_id"), func.count().label("total_uploads"))
+        .group_by(Resource.uploader_id)
+        .subquery()
+    )
+    downloads = (
+        select(Download.user_id, func.count().label("total_downloads"))
+        .group_by(Download.user_id)
+        .subquery()
+    )
+    ledger = (
+        select(
+            PointTransaction.user_id,
+            func.sum(case((PointTransaction.points_change > 0, PointTransaction.points_change), else_=0))
+            .label("total_points_earned"),
+            func.sum(case((PointTransaction.points_change < 0, -PointTransaction.points_change), else_=0))
+            .label("total_points_spent"),
+            func.sum(case(
+                (and_(PointTransaction.transaction_type.in_(CONTRIBUTION_TYPES), PointTransaction.points_change > 0),
+                 PointTransaction.points_change),
+                else_=0
+            )).label("contribution_points")
+        )
+        .group_by(PointTransaction.user_id)
+        .subquery()
+    )
+    created = (
+        select(Bounty.creator_id.label("user_id"), func.count().label("bounties_created"))
+        .group_by(Bounty.creator_id)
+        .subquery()
+    )
+    won = (
+        select(Bounty.winner_id.label("user_id"), func.count().label("bounties_won"))
+        .where(Bounty.winner_id.isnot(None))
+        .group_by(Bounty.winner_id)
+        .subquery()
+    )
+    return uploads, downloads, ledger, created, won
+
+
+def stats_backfill_statement():
+    """
+    按来源表分组重算全部用户统计的 INSERT ... SELECT 语句（每张来源表只分组扫描一次），
+    获得/消耗积分和贡献积分为热表流水合计加上期初余额快照中已归档部分的合计
+    """
+    uploads, downloads, ledger, created, won = _grouped_counts()
+    source = (
+        select(
+            User.id,
+            func.coalesce(uploads.c.total_uploads, literal(0)),
+            func.coalesce(downloads.c.total_downloads, literal(0)),
+            func.coalesce(ledger.c.total_points_earned, literal(0))
+            + func.coalesce(PointBalanceSnapshot.archived_earned, literal(0)),
+            func.coalesce(ledger.c.total_points_spent, literal(0))
+            + func.coalesce(PointBalanceSnapshot.archived_spent, literal(0)),
+            func.coalesce(ledger.c.contribution_points, literal(0))
+            + func.coalesce(PointBalanceSnapshot.archived_contribution, literal(0)),
+            func.coalesce(created.c.bounties_created, literal(0)),
+            func.coalesce(won.c.bounties_won, literal(0))
+        )
+        .select_from(User)
+        .outerjoin(uploads, uploads.c.user_id == User.id)
+        .outerjoin(downloads, downloads.c.user_id == User.id)
+        .outerjoin(ledger, ledger.c.user_id == User.id)
+        .outerjoin(PointBalanceSnapshot, PointBalanceSnapshot.user_id == User.id)
+        .outerjoin(created, created.c.user_id == User.id)
+        .outerjoin(won, won.c.user_id == User.id)
+    )
+    return UserStatistics.__table__.insert().from_select(["user_id", *STAT_FIELDS], source)
+
+
+async def rebuild_user_stats() -> int:
+    """
+    一次性重算所有用户的统计（清空后按 stats_backfill_statement 重新写入）
+
+    重算期间的增量写入可能丢失，应在低峰期执行
+
+    Returns:
+        int: 写入的用户统计行数
+    """
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(UserStatistics.__table__))
+        result = await db.execute(stats_backfill_statement())
+        await db.commit()
+        return result.rowcount
@@ -0,0 +1,35 @@
+"""
+后台进程池
+缩略图、文本提取等CPU密集型任务在独立进程中执行，不占用事件循环
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Optional
+
+from app.core.config import settings
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """获取进程池（首次使用时创建）"""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=settings.PROCESS_POOL_WORKERS)
+    return _process_pool
+
+
+async def run_in_process(func: Callable, *args, **kwargs):
+    """在进程池中执行函数（函数及参数必须可被pickle）"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), partial(func, *args, **kwargs))
+
+
+def shutdown_process_pool() -> None:
+    """关闭进程池（在应用关闭时调用）"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=True, cancel_futures=True)
+        _process_pool = None
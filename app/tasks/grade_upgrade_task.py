@@ -14,17 +14,31 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-async def run_grade_upgrade_task():
+def _log_progress(last_id: int, max_id: int, upgraded: int):
+    logger.info(f"年级升级进度: {last_id}/{max_id}（{last_id * 100 // max(max_id, 1)}%），已升级 {upgraded} 个用户")
+
+
+async def run_grade_upgrade_task(dry_run: bool = False):
     """
     运行年级升级任务
     每年9月1日自动执行
+
+    Args:
+        dry_run: 只统计待升级的用户数，不修改数据
     """
-    logger.info("开始执行年级升级任务...")
+    logger.info(f"开始执行年级升级任务{'（试运行）' if dry_run else ''}...")
     
     try:
         async with AsyncSessionLocal() as db:
-            # 批量升级所有用户的年级
-            upgraded_count = await grade_service.upgrade_all_users_grade(db)
+            if dry_run:
+                pending = await grade_service.count_pending_upgrades(db)
+                for grade, count in sorted(pending.items()):
+                    logger.info(f"   {grade} → {grade_service.get_next_grade(grade)}: {count} 个用户")
+                logger.info(f"试运行完成，共 {sum(pending.values())} 个用户待升级")
+                return
+            
+            # 分段批量升级所有用户的年级（中断后重跑会从上次进度继续）
+            upgraded_count = await grade_service.upgrade_all_users_grade(db, progress=_log_progress)
             
             if upgraded_count > 0:
                 logger.info(f"年级升级任务完成，共升级了 {upgraded_count} 个用户的年级")
@@ -54,5 +68,10 @@ async def check_and_run_grade_upgrade():
 
 
 if __name__ == "__main__":
+    import argparse
+    
     # 可以直接运行此脚本来手动执行年级升级
-    asyncio.run(run_grade_upgrade_task())
+    parser = argparse.ArgumentParser(description="年级升级任务")
+    parser.add_argument("--dry-run", action="store_true", help="只统计待升级的用户数，不修改数据")
+    args = parser.parse_args()
+    asyncio.run(run_grade_upgrade_task(dry_run=args.dry_run))
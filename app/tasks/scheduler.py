@@ -0,0 +1,57 @@
+"""
+进程内定时任务调度
+在应用生命周期内按固定间隔运行后台维护任务
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicScheduler:
+    """定时任务调度器"""
+    
+    def __init__(self):
+        self._jobs: Dict[str, tuple] = {}
+        self._tasks: List[asyncio.Task] = []
+    
+    def register(self, name: str, interval: float, func: Callable[[], Awaitable], initial_delay: Optional[float] = None):
+        """
+        注册定时任务
+        
+        Args:
+            name: 任务名称
+            interval: 执行间隔（秒）
+            func: 无参数的异步函数
+            initial_delay: 首次执行前的等待时间（默认等于间隔）
+        """
+        self._jobs[name] = (interval, func, interval if initial_delay is None else initial_delay)
+    
+    async def _run(self, name: str, interval: float, func: Callable[[], Awaitable], initial_delay: float):
+        await asyncio.sleep(initial_delay)
+        while True:
+            try:
+                await func()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 单次失败不影响后续执行
+                logger.error(f"定时任务 {name} 执行失败: {e}")
+            await asyncio.sleep(interval)
+    
+    def start(self):
+        """启动全部定时任务（在应用启动时调用）"""
+        for name, (interval, func, initial_delay) in self._jobs.items():
+            self._tasks.append(asyncio.create_task(self._run(name, interval, func, initial_delay)))
+    
+    async def stop(self):
+        """停止全部定时任务（在应用关闭时调用）"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+# 创建全局调度器实例
+scheduler = PeriodicScheduler()
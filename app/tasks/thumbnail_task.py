@@ -0,0 +1,61 @@
+"""
+缩略图补生成任务
+为状态为pending的资源（如升级前上传的资源）生成缩略图
+"""
+import asyncio
+import logging
+from sqlalchemy import select
+
+from app.core.database import AsyncSessionLocal
+from app.models.resource import Resource
+from app.services.preview_service import generate_thumbnail
+from app.services.worker_pool import shutdown_process_pool
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def run_thumbnail_backfill_task(batch_size: int = 100):
+    """
+    运行缩略图补生成任务
+    """
+    logger.info("开始执行缩略图补生成任务...")
+    
+    last_id = 0
+    processed = 0
+    try:
+        while True:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(Resource.id, Resource.file_path, Resource.file_type)
+                    .where(
+                        Resource.id > last_id,
+                        Resource.is_active == True,
+                        Resource.thumbnail_status == "pending"
+                    )
+                    .order_by(Resource.id)
+                    .limit(batch_size)
+                )
+                rows = result.all()
+            
+            if not rows:
+                break
+            
+            await asyncio.gather(*[
+                generate_thumbnail(row.id, row.file_path, row.file_type) for row in rows
+            ])
+            last_id = rows[-1].id
+            processed += len(rows)
+            logger.info(f"已处理 {processed} 个资源")
+        
+        logger.info(f"缩略图补生成任务完成，共处理 {processed} 个资源")
+        
+    except Exception as e:
+        logger.error(f"缩略图补生成任务执行失败: {e}")
+    finally:
+        shutdown_process_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_thumbnail_backfill_task())
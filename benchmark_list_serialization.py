@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+资源列表序列化性能对比
+旧路径：加载完整ORM实体 -> ResourceResponse逐条校验 -> 标准json编码
+新路径：只查询卡片列 -> 由行数据构造字典 -> orjson编码
+
+用法：python benchmark_list_serialization.py [资源数量] [每页数量]
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.core.database import Base
+from app.core.responses import DefaultJSONResponse
+from app.models.user import User
+from app.models.resource import Resource
+from app.schemas.resource import ResourceResponse
+from app.services.listing_service import RESOURCE_CARD_COLUMNS, resource_cards
+
+ROUNDS = 20
+
+
+async def prepare(session_factory, total: int) -> None:
+    """写入测试数据（描述为较长文本，模拟真实资源）"""
+    async with session_factory() as db:
+        await db.execute(insert(User), [{"phone": "13800000000", "password_hash": "x", "nickname": "bench"}])
+        now = datetime.utcnow()
+        await db.execute(insert(Resource), [
+            {
+                "uploader_id": 1,
+                "title": f"三年级数学第{i}单元测试卷",
+                "description": "本资料包含单元知识点梳理、典型例题讲解与分层练习。" * 40,
+                "file_name": f"{i:08x}.pdf",
+                "file_path": f"uploads/resources/{i:08x}.pdf",
+                "file_size": 1024 * (i + 1),
+                "file_type": "pdf",
+                "grade": "小学3年级",
+                "subject": "数学",
+                "resource_type": "试卷",
+                "download_count": i % 100,
+                "thumbnail_status": "ready" if i % 2 else "pending",
+                "is_active": True,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i in range(total)
+        ])
+        await db.commit()
+
+
+async def orm_path(db, size: int) -> int:
+    """旧路径"""
+    result = await db.execute(
+        select(Resource).where(Resource.is_active == True).order_by(Resource.created_at.desc()).limit(size)
+    )
+    items = [ResourceResponse.model_validate(resource) for resource in result.scalars().all()]
+    body = json.dumps(jsonable_encoder({"items": items, "total": len(items)}), ensure_ascii=False).encode("utf-8")
+    return len(body)
+
+
+async def projection_path(db, size: int) -> int:
+    """新路径"""
+    result = await db.execute(
+        select(*RESOURCE_CARD_COLUMNS).where(Resource.is_active == True).order_by(Resource.created_at.desc()).limit(size)
+    )
+    items = resource_cards(result.all())
+    body = DefaultJSONResponse({"items": items, "total": len(items)}).body
+    return len(body)
+
+
+async def measure(session_factory, func, size: int):
+    async with session_factory() as db:
+        await func(db, size)  # 预热
+        start = time.perf_counter()
+        body_size = 0
+        for _ in range(ROUNDS):
+            body_size = await func(db, size)
+        elapsed = time.perf_counter() - start
+    return ROUNDS * size / elapsed, body_size
+
+
+async def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        await prepare(session_factory, total)
+
+        print(f"资源数: {total}  每页: {size}  轮数: {ROUNDS}  响应类: {DefaultJSONResponse.__name__}")
+        for name, func in (("ORM + Pydantic + json", orm_path), ("列投影 + 行字典 + orjson", projection_path)):
+            rate, body_size = await measure(session_factory, func, size)
+            print(f"{name:<28} {rate:>10.0f} 行/秒   响应体 {body_size / 1024:.1f} KB")
+
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
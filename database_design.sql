@@ -12,7 +12,7 @@ CREATE TABLE users (
     child_grade VARCHAR(20), -- 孩子年级：小学1-6年级，初中1-3年级，高中1-3年级
     points INTEGER DEFAULT 100, -- 积分，新用户默认100
     level VARCHAR(20) DEFAULT '新手用户', -- 用户等级
-    daily_downloads INTEGER DEFAULT 0, -- 当日下载次数
+    daily_downloads INTEGER DEFAULT 0, -- 当日下载次数（已弃用，由下载配额服务计数）
     last_download_date DATE, -- 最后下载日期
     last_signin_date DATE, -- 最后签到日期
     is_active BOOLEAN DEFAULT TRUE,
@@ -20,6 +20,19 @@ CREATE TABLE users (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- 用户统计表（由上传、下载、积分流水和悬赏写入路径增量维护，可用 rebuild_user_stats.py 重算）
+CREATE TABLE user_stats (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    total_uploads INTEGER NOT NULL DEFAULT 0, -- 总上传数
+    total_downloads INTEGER NOT NULL DEFAULT 0, -- 总下载数
+    total_points_earned INTEGER NOT NULL DEFAULT 0, -- 总获得积分
+    total_points_spent INTEGER NOT NULL DEFAULT 0, -- 总消耗积分
+    contribution_points INTEGER NOT NULL DEFAULT 0, -- 贡献积分（上传奖励和资源被下载奖励，用于积分榜）
+    bounties_created INTEGER NOT NULL DEFAULT 0, -- 创建的悬赏数
+    bounties_won INTEGER NOT NULL DEFAULT 0, -- 获胜的悬赏数
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- 资源表
 CREATE TABLE resources (
     id SERIAL PRIMARY KEY,
@@ -27,14 +40,22 @@ CREATE TABLE resources (
     title VARCHAR(200) NOT NULL,
     description TEXT,
     file_name VARCHAR(255) NOT NULL,
-    file_path VARCHAR(500) NOT NULL,
+    file_path VARCHAR(500) NOT NULL, -- 存储键（如 resources/xxx.pdf）
     file_size BIGINT NOT NULL, -- 文件大小（字节）
     file_type VARCHAR(50) NOT NULL, -- 文件类型：pdf, doc, docx, ppt, pptx, xls, xlsx, jpg, png
+    file_hash VARCHAR(64), -- 文件SHA-256（后台计算）
+    mime_type VARCHAR(100), -- 文件MIME类型（后台识别）
     grade VARCHAR(20) NOT NULL, -- 年级
     subject VARCHAR(20) NOT NULL, -- 科目
     resource_type VARCHAR(20) NOT NULL, -- 资源类型：试卷、教辅、课件、笔记、其他
     download_count INTEGER DEFAULT 0, -- 下载次数
+    favorite_count INTEGER DEFAULT 0, -- 收藏数（增量维护）
+    thumbnail_status VARCHAR(20) DEFAULT 'pending', -- 缩略图状态：pending, ready, failed, unsupported
+    storage_tier VARCHAR(10) DEFAULT 'hot', -- 存储层级：hot（热存储）, cold（已归档）, purged（删除后文件已清理）
+    archive_key VARCHAR(500), -- 归档存储键（cold时有值，恢复后保留到宽限期结束）
+    tier_changed_at TIMESTAMP, -- 冷热层切换时间（旧层副本待垃圾回收清理，清理后清空）
     is_active BOOLEAN DEFAULT TRUE,
+    deleted_at TIMESTAMP, -- 软删除时间（超过保留期后清理文件）
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -53,7 +74,7 @@ CREATE TABLE downloads (
 CREATE TABLE point_transactions (
     id SERIAL PRIMARY KEY,
     user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-    transaction_type VARCHAR(20) NOT NULL, -- 交易类型：register, upload, download, signin, bounty_create, bounty_reward
+    transaction_type VARCHAR(20) NOT NULL, -- 交易类型：register, upload, download, download_reward, signin, bounty_create, bounty_reward, bounty_refund, reconcile
     points_change INTEGER NOT NULL, -- 积分变化（正数为获得，负数为消耗）
     related_resource_id INTEGER REFERENCES resources(id) ON DELETE SET NULL,
     related_bounty_id INTEGER, -- 关联悬赏ID
@@ -61,6 +82,18 @@ CREATE TABLE point_transactions (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- 积分期初余额快照表（流水按月归档后保留每个用户已归档部分的合计）
+CREATE TABLE point_balance_snapshots (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    opening_balance INTEGER NOT NULL DEFAULT 0, -- 已归档流水的积分变化合计
+    archived_earned INTEGER NOT NULL DEFAULT 0, -- 已归档流水中获得的积分合计
+    archived_spent INTEGER NOT NULL DEFAULT 0, -- 已归档流水中消耗的积分合计
+    archived_contribution INTEGER NOT NULL DEFAULT 0, -- 已归档流水中的贡献积分合计
+    archived_count INTEGER NOT NULL DEFAULT 0, -- 已归档的流水条数
+    archived_through TIMESTAMP, -- 早于该时间的流水已归档
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- 悬赏表
 CREATE TABLE bounties (
     id SERIAL PRIMARY KEY,
@@ -73,6 +106,8 @@ CREATE TABLE bounties (
     status VARCHAR(20) DEFAULT 'active', -- 状态：active, completed, expired
     winner_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
     winning_resource_id INTEGER REFERENCES resources(id) ON DELETE SET NULL,
+    response_count INTEGER DEFAULT 0, -- 响应数（增量维护）
+    award_idempotency_key VARCHAR(64), -- 采纳请求的幂等键
     expires_at TIMESTAMP NOT NULL, -- 过期时间
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -89,6 +124,16 @@ CREATE TABLE bounty_responses (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- 悬赏候选资源表（自动匹配结果）
+CREATE TABLE bounty_matches (
+    id SERIAL PRIMARY KEY,
+    bounty_id INTEGER REFERENCES bounties(id) ON DELETE CASCADE,
+    resource_id INTEGER REFERENCES resources(id) ON DELETE CASCADE,
+    score INTEGER NOT NULL, -- 匹配得分
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(bounty_id, resource_id)
+);
+
 -- 收藏表
 CREATE TABLE favorites (
     id SERIAL PRIMARY KEY,
@@ -98,6 +143,54 @@ CREATE TABLE favorites (
     UNIQUE(user_id, resource_id)
 );
 
+-- 资源正文表（从上传文件中提取，用于搜索）
+CREATE TABLE resource_texts (
+    resource_id INTEGER PRIMARY KEY REFERENCES resources(id) ON DELETE CASCADE,
+    content TEXT, -- 规范化后的纯文本
+    status VARCHAR(20) NOT NULL, -- 提取状态：ready, empty, unsupported, failed
+    char_count INTEGER DEFAULT 0, -- 文本长度
+    truncated BOOLEAN DEFAULT FALSE, -- 是否因超出上限被截断
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 可续传上传会话表
+CREATE TABLE upload_sessions (
+    id VARCHAR(32) PRIMARY KEY, -- 会话ID（uuid hex）
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    file_name VARCHAR(255) NOT NULL, -- 原始文件名
+    file_type VARCHAR(50) NOT NULL,
+    file_size BIGINT NOT NULL, -- 文件总大小（字节）
+    received_bytes BIGINT DEFAULT 0, -- 已接收字节数（当前偏移量）
+    temp_path VARCHAR(500) NOT NULL, -- 临时文件路径
+    title VARCHAR(200) NOT NULL,
+    description TEXT,
+    grade VARCHAR(20),
+    subject VARCHAR(20),
+    resource_type VARCHAR(20) NOT NULL,
+    expires_at TIMESTAMP NOT NULL, -- 过期时间（无活动后自动清理）
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 站内通知表（收件箱）
+CREATE TABLE notifications (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    notification_type VARCHAR(30) NOT NULL, -- 类型：bounty_new, bounty_response, bounty_selected
+    title VARCHAR(200) NOT NULL,
+    content VARCHAR(500),
+    related_bounty_id INTEGER, -- 关联悬赏ID
+    related_resource_id INTEGER, -- 关联资源ID
+    is_read BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 未读通知计数表（增量维护，单独成表避免与用户表上的积分更新争用同一行）
+CREATE TABLE notification_counters (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    unread_count INTEGER NOT NULL DEFAULT 0 -- 未读通知数
+);
+
 -- 举报表
 CREATE TABLE reports (
     id SERIAL PRIMARY KEY,
@@ -141,17 +234,32 @@ CREATE INDEX idx_resources_uploader ON resources(uploader_id);
 CREATE INDEX idx_resources_grade_subject ON resources(grade, subject);
 CREATE INDEX idx_resources_created_at ON resources(created_at);
 CREATE INDEX idx_resources_download_count ON resources(download_count);
+CREATE INDEX idx_resources_file_path ON resources(file_path);
+CREATE INDEX idx_resources_archive_key ON resources(archive_key);
 CREATE INDEX idx_downloads_user_id ON downloads(user_id);
 CREATE INDEX idx_downloads_resource_id ON downloads(resource_id);
+CREATE UNIQUE INDEX uq_downloads_user_resource ON downloads(user_id, resource_id);
+CREATE INDEX idx_downloads_resource_created ON downloads(resource_id, created_at);
 CREATE INDEX idx_point_transactions_user_id ON point_transactions(user_id);
+CREATE INDEX idx_point_transactions_user_created ON point_transactions(user_id, created_at, id);
 CREATE INDEX idx_bounties_creator_id ON bounties(creator_id);
-CREATE INDEX idx_bounties_status ON bounties(status);
+CREATE INDEX idx_bounties_status_expires ON bounties(status, expires_at);
+CREATE INDEX idx_bounties_status_id ON bounties(status, id);
 CREATE INDEX idx_bounty_responses_bounty_id ON bounty_responses(bounty_id);
-CREATE INDEX idx_favorites_user_id ON favorites(user_id);
+CREATE INDEX idx_bounty_matches_bounty_score ON bounty_matches(bounty_id, score);
+CREATE INDEX idx_favorites_user_created ON favorites(user_id, created_at);
+CREATE INDEX idx_upload_sessions_user_id ON upload_sessions(user_id);
+CREATE INDEX idx_notifications_user_id_id ON notifications(user_id, id);
+CREATE INDEX idx_users_child_grade ON users(child_grade);
+CREATE INDEX idx_upload_sessions_expires_at ON upload_sessions(expires_at);
 CREATE INDEX idx_reports_status ON reports(status);
 CREATE INDEX idx_user_actions_user_id ON user_actions(user_id);
 CREATE INDEX idx_user_actions_created_at ON user_actions(created_at);
 
+-- 资源正文全文索引（三元组，支持中文子串检索，关键词至少3个字符）
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX idx_resource_texts_content_trgm ON resource_texts USING gin (content gin_trgm_ops);
+
 -- 插入系统配置初始数据
 INSERT INTO system_configs (config_key, config_value, description) VALUES
 ('max_file_size', '52428800', '最大文件大小（字节），默认50MB'),
@@ -175,3 +283,4 @@ CREATE TRIGGER update_resources_updated_at BEFORE UPDATE ON resources FOR EACH R
 CREATE TRIGGER update_bounties_updated_at BEFORE UPDATE ON bounties FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_reports_updated_at BEFORE UPDATE ON reports FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_system_configs_updated_at BEFORE UPDATE ON system_configs FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
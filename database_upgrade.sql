@@ -0,0 +1,59 @@
+-- K12家校学习资料共享平台 - 已有数据库升级
+-- 数据库：PostgreSQL
+-- 可重复执行；应用启动时也会自动补齐缺少的字段和索引（app/core/schema_upgrade.py）
+-- 新增的表（user_stats、point_balance_snapshots、bounty_matches、resource_texts、upload_sessions、notifications、notification_counters）
+-- 由应用启动时创建，或从 database_design.sql 中单独执行对应的 CREATE TABLE
+
+-- 资源表新增字段
+ALTER TABLE resources ADD COLUMN IF NOT EXISTS file_hash VARCHAR(64);
+ALTER TABLE resources ADD COLUMN IF NOT EXISTS mime_type VARCHAR(100);
+ALTER TABLE resources ADD COLUMN IF NOT EXISTS thumbnail_status VARCHAR(20) DEFAULT 'pending';
+ALTER TABLE resources ADD COLUMN IF NOT EXISTS storage_tier VARCHAR(10) DEFAULT 'hot';
+ALTER TABLE resources ADD COLUMN IF NOT EXISTS archive_key VARCHAR(500);
+ALTER TABLE resources ADD COLUMN IF NOT EXISTS tier_changed_at TIMESTAMP;
+ALTER TABLE resources ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP;
+ALTER TABLE resources ADD COLUMN IF NOT EXISTS favorite_count INTEGER DEFAULT 0;
+UPDATE resources SET favorite_count = (SELECT COUNT(*) FROM favorites WHERE favorites.resource_id = resources.id);
+
+-- 悬赏表新增字段
+ALTER TABLE bounties ADD COLUMN IF NOT EXISTS response_count INTEGER DEFAULT 0;
+ALTER TABLE bounties ADD COLUMN IF NOT EXISTS award_idempotency_key VARCHAR(64);
+UPDATE bounties SET response_count = (SELECT COUNT(*) FROM bounty_responses WHERE bounty_responses.bounty_id = bounties.id);
+
+-- 未读通知计数表按通知表回填（已有计数行跳过）
+INSERT INTO notification_counters (user_id, unread_count)
+SELECT user_id, COUNT(*) FROM notifications WHERE NOT is_read GROUP BY user_id
+ON CONFLICT (user_id) DO NOTHING;
+
+-- 积分期初余额快照表新增字段（已归档部分的获得/消耗积分，重算用户统计时加回）
+ALTER TABLE point_balance_snapshots ADD COLUMN IF NOT EXISTS archived_earned INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE point_balance_snapshots ADD COLUMN IF NOT EXISTS archived_spent INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE point_balance_snapshots ADD COLUMN IF NOT EXISTS archived_contribution INTEGER NOT NULL DEFAULT 0;
+
+-- 用户统计表新增贡献积分（积分榜只统计上传奖励和资源被下载奖励）
+ALTER TABLE user_stats ADD COLUMN IF NOT EXISTS contribution_points INTEGER NOT NULL DEFAULT 0;
+UPDATE user_stats SET contribution_points = (
+    SELECT COALESCE(SUM(points_change), 0) FROM point_transactions
+    WHERE point_transactions.user_id = user_stats.user_id
+    AND transaction_type IN ('upload', 'download_reward') AND points_change > 0
+);
+
+-- 下载记录唯一索引（同一用户同一资源只结算一次），先清理并发购买产生的重复记录
+DELETE FROM downloads WHERE id NOT IN (SELECT MIN(id) FROM downloads GROUP BY user_id, resource_id);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_downloads_user_resource ON downloads(user_id, resource_id);
+
+-- 新增索引
+CREATE INDEX IF NOT EXISTS idx_resources_file_path ON resources(file_path);
+CREATE INDEX IF NOT EXISTS idx_resources_archive_key ON resources(archive_key);
+CREATE INDEX IF NOT EXISTS idx_downloads_resource_created ON downloads(resource_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_point_transactions_user_created ON point_transactions(user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_bounties_status_expires ON bounties(status, expires_at);
+CREATE INDEX IF NOT EXISTS idx_bounties_status_id ON bounties(status, id);
+CREATE INDEX IF NOT EXISTS idx_favorites_user_created ON favorites(user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_users_child_grade ON users(child_grade);
+
+-- 资源正文全文索引（三元组，支持中文子串检索，关键词至少3个字符）
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_resource_texts_content_trgm ON resource_texts USING gin (content gin_trgm_ops);
+
+-- user_stats 表由应用启动时创建并自动回填历史统计；手动执行 CREATE TABLE 建表时再执行 python rebuild_user_stats.py 回填
@@ -3,6 +3,7 @@
 数据库初始化脚本
 """
 import asyncio
+import json
 import sys
 from pathlib import Path
 
@@ -11,6 +12,7 @@ project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
 from app.core.database import engine, Base
+from app.core.schema_upgrade import upgrade_schema
 from app.models.user import User
 from app.models.resource import Resource, Download, PointTransaction, Favorite
 from app.models.bounty import Bounty, BountyResponse
@@ -26,7 +28,7 @@ async def init_database():
         # 创建所有表
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.drop_all)  # 删除所有表（开发环境）
-            await conn.run_sync(Base.metadata.create_all)  # 创建所有表
+            await conn.run_sync(upgrade_schema)  # 创建所有表和全文索引
         
         print("✅ 数据库表创建成功")
         
@@ -59,12 +61,12 @@ async def insert_system_configs():
             ),
             SystemConfig(
                 config_key="point_rules",
-                config_value=str(settings.POINTS_CONFIG),
+                config_value=json.dumps(settings.POINTS_CONFIG, ensure_ascii=False),
                 description="积分规则配置"
             ),
             SystemConfig(
                 config_key="user_levels",
-                config_value=str(settings.USER_LEVELS),
+                config_value=json.dumps(settings.USER_LEVELS, ensure_ascii=False),
                 description="用户等级配置"
             )
         ]
@@ -8,26 +8,64 @@ from contextlib import asynccontextmanager
 import os
 
 from app.core.config import settings
-from app.core.database import engine, Base
-from app.api.v1 import auth, users, resources, downloads, bounties, search, admin
+from app.core.database import engine
+from app.core.schema_upgrade import upgrade_schema
+from app.api.v1 import auth, users, resources, downloads, bounties, search, admin, uploads, notifications, leaderboards
 from app.core.security import get_current_user
+from app.core.responses import DefaultJSONResponse
+from app.services.counter_service import download_counter
+from app.services.worker_pool import shutdown_process_pool
+from app.services.storage_service import storage, LocalStorage
+from app.services.tiering_service import run_tiering
+from app.services.gc_service import collect_garbage
+from app.services.bounty_service import expire_bounties
+from app.services.ledger_archive_service import archive_ledger
+from app.services.reconcile_service import reconcile_ledger
+from app.services.notification_service import broker
+from app.services.leaderboard_service import leaderboard_service
+from app.services.config_service import config_service
+from app.services.upload_service import purge_expired_upload_sessions
+from app.tasks.scheduler import scheduler
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
-    # 启动时创建数据库表
+    # 启动时创建数据库表，并为已有数据库补齐新增字段和索引
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
     
-    # 创建上传目录
+    # 创建上传目录（对象存储时只用于上传中的临时文件）
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
     os.makedirs(os.path.join(settings.UPLOAD_DIR, "resources"), exist_ok=True)
     os.makedirs(os.path.join(settings.UPLOAD_DIR, "avatars"), exist_ok=True)
     
+    # 加载运行时配置（积分规则、用户等级）
+    await config_service.load()
+    
+    # 启动下载次数写缓冲
+    download_counter.start()
+    
+    # 启动定时维护任务
+    scheduler.register("refresh_config", settings.CONFIG_REFRESH_INTERVAL, config_service.refresh)
+    scheduler.register("purge_expired_uploads", 3600, purge_expired_upload_sessions)
+    scheduler.register("cold_tiering", settings.COLD_TIER_INTERVAL, run_tiering)
+    scheduler.register("storage_gc", settings.GC_INTERVAL, collect_garbage)
+    scheduler.register("expire_bounties", settings.BOUNTY_EXPIRY_INTERVAL, expire_bounties)
+    scheduler.register("archive_ledger", settings.LEDGER_ARCHIVE_INTERVAL, archive_ledger)
+    scheduler.register("reconcile_ledger", settings.LEDGER_RECONCILE_INTERVAL, reconcile_ledger)
+    scheduler.register("rebuild_leaderboards", settings.LEADERBOARD_REBUILD_INTERVAL, leaderboard_service.rebuild, initial_delay=0)
+    scheduler.start()
+    
     yield
     
-    # 关闭时清理资源
+    # 关闭时停止定时任务、写回缓冲中的下载次数，再清理资源
+    await scheduler.stop()
+    await download_counter.stop()
+    shutdown_process_pool()
+    await storage.close()
+    await broker.close()
+    await leaderboard_service.close()
     await engine.dispose()
 
 
@@ -36,6 +74,7 @@ app = FastAPI(
     title="K12家校学习资料共享平台",
     description="基于积分机制的K12学习资料共享平台API",
     version="1.0.0",
+    default_response_class=DefaultJSONResponse,
     lifespan=lifespan
 )
 
@@ -50,15 +89,20 @@ app.add_middleware(
 
 # 静态文件服务
 app.mount("/static", StaticFiles(directory="static"), name="static")
-app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
+if isinstance(storage, LocalStorage):
+    # 对象存储时文件通过预签名地址直接从存储下载，应用节点不提供文件
+    app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
 
 # 注册路由
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["认证"])
 app.include_router(users.router, prefix="/api/v1/users", tags=["用户"])
 app.include_router(resources.router, prefix="/api/v1/resources", tags=["资源"])
+app.include_router(uploads.router, prefix="/api/v1/uploads", tags=["上传"])
 app.include_router(downloads.router, prefix="/api/v1/downloads", tags=["下载"])
 app.include_router(bounties.router, prefix="/api/v1/bounties", tags=["悬赏"])
 app.include_router(search.router, prefix="/api/v1/search", tags=["搜索"])
+app.include_router(notifications.router, prefix="/api/v1/notifications", tags=["通知"])
+app.include_router(leaderboards.router, prefix="/api/v1/leaderboards", tags=["排行榜"])
 app.include_router(admin.router, prefix="/api/v1", tags=["管理员"])
 
 
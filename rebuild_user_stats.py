@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+用户统计重算脚本
+按资源、下载、积分流水和悬赏表一次分组重算所有用户的 user_stats
+（首次上线回填历史数据，或统计出现偏差时使用）
+
+    python rebuild_user_stats.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from app.core.database import engine, Base
+from app.models.user_stats import UserStatistics
+from app.services.user_stats_service import rebuild_user_stats
+
+
+async def main():
+    # 已有数据库中可能还没有 user_stats 表
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[UserStatistics.__table__])
+
+    print("正在重算用户统计...")
+    rows = await rebuild_user_stats()
+    print(f"✅ 已重算 {rows} 位用户的统计")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
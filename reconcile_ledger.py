@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+积分对账脚本
+比对每个用户的积分余额与“期初余额快照 + 积分流水合计”，输出不一致的用户
+
+    python reconcile_ledger.py                    # 只报告
+    python reconcile_ledger.py --csv diff.csv     # 导出全部不一致明细
+    python reconcile_ledger.py --fix              # 写入调整流水（以用户余额为准）
+"""
+import argparse
+import asyncio
+import csv
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from app.core.config import settings
+from app.services.reconcile_service import reconcile_ledger
+
+
+async def main(args):
+    if args.chunk_size:
+        settings.LEDGER_RECONCILE_CHUNK_SIZE = args.chunk_size
+
+    print(f"正在对账{'（将写入调整流水）' if args.fix else ''}...")
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["user_id", "balance", "ledger_balance", "difference"])
+            writer.writeheader()
+            report = await reconcile_ledger(fix=args.fix, on_discrepancy=writer.writerow)
+    else:
+        report = await reconcile_ledger(fix=args.fix)
+
+    for detail in report["details"][:20]:
+        print(f"   用户 {detail['user_id']}: 余额 {detail['balance']}，"
+              f"流水 {detail['ledger_balance']}，差额 {detail['difference']}")
+    if report["discrepancies"] > 20:
+        print(f"   ...（共 {report['discrepancies']} 个）")
+
+    elapsed = (report["finished_at"] - report["started_at"]).total_seconds()
+    print(f"✅ 检查用户 {report['users_checked']} 个，不一致 {report['discrepancies']} 个，"
+          f"差额合计 {report['total_difference']}，已调整 {report['corrected']} 个，耗时 {elapsed:.1f} 秒")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="积分对账脚本")
+    parser.add_argument("--fix", action="store_true", help="为不一致的用户写入调整流水")
+    parser.add_argument("--csv", help="导出全部不一致明细到CSV文件")
+    parser.add_argument("--chunk-size", type=int, help="每批核对的用户数")
+    asyncio.run(main(parser.parse_args()))
@@ -13,7 +13,8 @@ project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import engine
+from app.core.schema_upgrade import upgrade_schema
 
 
 async def create_tables():
@@ -21,7 +22,7 @@ async def create_tables():
     print("正在创建数据库表...")
     try:
         async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(upgrade_schema)
         print("✅ 数据库表创建成功")
     except Exception as e:
         print(f"❌ 数据库表创建失败: {e}")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+悬赏采纳并发测试脚本
+对同一个悬赏并发发起多次采纳请求，检查只结算一次、积分不重复发放
+
+    python start.py  # 先启动服务
+    python test_bounty_concurrency.py [并发数]
+
+BASE_URL 环境变量可指定服务地址（默认 http://localhost:8000）
+"""
+import asyncio
+import os
+import random
+import sys
+import uuid
+
+import httpx
+
+
+BASE_URL = os.environ.get("BASE_URL", "http://localhost:8000")
+PASSWORD = "test123456"
+POINTS_REWARD = 50
+
+
+def random_phone() -> str:
+    return "139" + "".join(random.choice("0123456789") for _ in range(8))
+
+
+async def create_user(client: httpx.AsyncClient, nickname: str) -> dict:
+    """注册并登录，返回带认证头的用户信息"""
+    phone = random_phone()
+    resp = await client.post("/api/v1/auth/register", json={
+        "phone": phone,
+        "password": PASSWORD,
+        "confirm_password": PASSWORD,
+        "nickname": nickname,
+        "child_grade": "小学3年级"
+    })
+    assert resp.status_code == 200, f"注册失败: {resp.text}"
+    resp = await client.post("/api/v1/auth/login", json={"phone": phone, "password": PASSWORD})
+    assert resp.status_code == 200, f"登录失败: {resp.text}"
+    token = resp.json()["access_token"]
+    return {"nickname": nickname, "headers": {"Authorization": f"Bearer {token}"}}
+
+
+async def get_points(client: httpx.AsyncClient, user: dict) -> int:
+    resp = await client.get("/api/v1/users/me", headers=user["headers"])
+    return resp.json()["points"]
+
+
+async def create_bounty(client: httpx.AsyncClient, creator: dict, title: str) -> int:
+    resp = await client.post("/api/v1/bounties/", headers=creator["headers"], json={
+        "title": title,
+        "description": "并发测试",
+        "grade": "小学3年级",
+        "subject": "数学",
+        "points_reward": POINTS_REWARD
+    })
+    assert resp.status_code == 200, f"创建悬赏失败: {resp.text}"
+    return resp.json()["id"]
+
+
+async def respond(client: httpx.AsyncClient, responder: dict, bounty_id: int) -> None:
+    """上传一个资源并用它响应悬赏"""
+    resp = await client.post(
+        "/api/v1/resources/",
+        headers=responder["headers"],
+        data={
+            "title": f"{responder['nickname']}的试卷",
+            "grade": "小学3年级",
+            "subject": "数学",
+            "resource_type": "试卷",
+            "description": "并发测试"
+        },
+        files={"file": ("test.pdf", b"%PDF-1.4 concurrency test")}
+    )
+    assert resp.status_code == 200, f"上传失败: {resp.text}"
+    resp = await client.post(
+        f"/api/v1/bounties/{bounty_id}/respond",
+        params={"resource_id": resp.json()["id"]},
+        headers=responder["headers"]
+    )
+    assert resp.status_code == 200, f"响应悬赏失败: {resp.text}"
+
+
+async def get_response_ids(client: httpx.AsyncClient, creator: dict, bounty_id: int) -> list:
+    resp = await client.get(f"/api/v1/bounties/{bounty_id}/responses", headers=creator["headers"])
+    return [response["id"] for response in resp.json()["responses"]]
+
+
+async def select_response(client: httpx.AsyncClient, creator: dict, bounty_id: int,
+                          response_id: int, idempotency_key: str = None) -> int:
+    headers = dict(creator["headers"])
+    if idempotency_key:
+        headers["Idempotency-Key"] = idempotency_key
+    resp = await client.post(f"/api/v1/bounties/{bounty_id}/select/{response_id}", headers=headers)
+    return resp.status_code
+
+
+async def run_tests(client: httpx.AsyncClient, concurrency: int):
+    print("🚀 开始悬赏采纳并发测试")
+    print("=" * 50)
+
+    creator = await create_user(client, "悬赏发布者")
+    responders = [await create_user(client, f"响应者{i}") for i in range(3)]
+
+    bounty_id = await create_bounty(client, creator, "并发测试悬赏")
+    for responder in responders:
+        await respond(client, responder, bounty_id)
+    response_ids = await get_response_ids(client, creator, bounty_id)
+    print(f"✅ 悬赏创建成功: ID {bounty_id}，{len(response_ids)} 个响应")
+
+    creator_points = await get_points(client, creator)
+    responder_points = [await get_points(client, responder) for responder in responders]
+
+    # 并发采纳：多个请求同时选择不同（或相同）的响应
+    print(f"⚡ 并发发起 {concurrency} 次采纳请求")
+    statuses = await asyncio.gather(*[
+        select_response(client, creator, bounty_id, random.choice(response_ids))
+        for _ in range(concurrency)
+    ])
+    succeeded = statuses.count(200)
+    print(f"   成功 {succeeded} 次，其余状态码: {sorted(set(statuses) - {200})}")
+    assert succeeded == 1, f"应当只有一次采纳成功，实际 {succeeded} 次"
+
+    # 积分检查：发布者不再扣分，只有一位响应者收到一次奖励
+    assert await get_points(client, creator) == creator_points, "发布者积分被重复扣除"
+    gained = [
+        await get_points(client, responder) - before
+        for responder, before in zip(responders, responder_points)
+    ]
+    assert sorted(gained) == [0] * (len(responders) - 1) + [POINTS_REWARD], f"奖励发放异常: {gained}"
+    print(f"✅ 只结算一次，响应者积分变化: {gained}")
+
+    # 幂等键：同一个键并发重试都返回成功，但只结算一次
+    bounty_id = await create_bounty(client, creator, "幂等测试悬赏")
+    responder = responders[0]
+    await respond(client, responder, bounty_id)
+    response_id = (await get_response_ids(client, creator, bounty_id))[0]
+
+    before = await get_points(client, responder)
+    key = uuid.uuid4().hex
+    statuses = await asyncio.gather(*[
+        select_response(client, creator, bounty_id, response_id, key)
+        for _ in range(concurrency)
+    ])
+    assert statuses.count(200) == concurrency, f"同一幂等键的重试应全部成功: {statuses}"
+    assert await select_response(client, creator, bounty_id, response_id) == 400, "不带幂等键的重复采纳应被拒绝"
+    assert await get_points(client, responder) - before == POINTS_REWARD, "幂等重试重复发放了奖励"
+    print(f"✅ 幂等键重试 {concurrency} 次，只结算一次")
+
+    print("=" * 50)
+    print("✅ 所有测试完成！")
+
+
+async def main(concurrency: int):
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=30) as client:
+        await run_tests(client, concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
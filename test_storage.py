@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+存储后端测试脚本
+默认测试本地存储；设置 STORAGE_BACKEND=s3 及 S3_* 环境变量后测试S3兼容存储（如本地MinIO）
+
+    docker run -p 9000:9000 -e MINIO_ROOT_USER=minio -e MINIO_ROOT_PASSWORD=minio123 minio/minio server /data
+    STORAGE_BACKEND=s3 S3_ACCESS_KEY=minio S3_SECRET_KEY=minio123 python test_storage.py
+"""
+import asyncio
+import os
+
+import httpx
+
+from app.core.config import settings
+from app.services.storage_service import create_storage, S3Storage
+
+
+async def chunks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def run_tests():
+    storage = create_storage()
+    print(f"🗄️ 存储后端: {type(storage).__name__}")
+    if isinstance(storage, S3Storage):
+        await storage.ensure_bucket()
+
+    small = os.urandom(100 * 1024)
+    large = os.urandom(20 * 1024 * 1024 + 123)  # 超过分片大小，走分片上传
+
+    try:
+        for key, data in (("test/小文件 1.bin", small), ("test/large.bin", large)):
+            size = await storage.put(key, chunks(data, 1024 * 1024), "application/octet-stream")
+            assert size == len(data), f"写入字节数不符: {size}"
+
+            stored = await storage.stat(key)
+            assert stored is not None and stored.size == len(data), "stat结果不符"
+
+            received = bytearray()
+            async for piece in storage.get(key):
+                received += piece
+            assert bytes(received) == data, "读取内容不符"
+
+            async with storage.local_copy(key) as local_path:
+                with open(local_path, "rb") as f:
+                    assert f.read() == data, "本地副本内容不符"
+
+            url = storage.presigned_url(key, filename="下载.bin")
+            print(f"✅ {key}: {len(data)} 字节，读写一致")
+            print(f"   下载地址: {url[:120]}...")
+            if url.startswith("http"):
+                async with httpx.AsyncClient() as client:
+                    response = await client.get(url)
+                    assert response.status_code == 200 and response.content == data, \
+                        f"预签名下载失败: HTTP {response.status_code}"
+                print("   预签名地址下载成功")
+
+            assert await storage.delete(key) is True
+            assert await storage.stat(key) is None
+            assert await storage.delete(key) is False
+            print("   删除成功")
+
+        print("=" * 50)
+        print("✅ 所有测试完成！")
+    finally:
+        await storage.close()
+
+
+if __name__ == "__main__":
+    print(f"UPLOAD_DIR={settings.UPLOAD_DIR}")
+    asyncio.run(run_tests())